@@ -6,3 +6,9 @@ class ApiConfig(AppConfig):
     """Приложение для API"""
 
     name = "api"
+
+    def ready(self):
+        import api.signals  # noqa: F401
+        from api.metrics import install
+
+        install()
@@ -0,0 +1,105 @@
+"""
+Асинхронные представления для горячих эндпоинтов чтения под ASGI.
+
+В Django 3.2 нет асинхронного ORM, поэтому работа с БД, фильтрация
+и сериализация выполняются в отдельном ограниченном пуле потоков
+(ASYNC_DB_THREADS). Цикл событий при этом не блокируется, а число
+одновременных обращений к БД на процесс не превышает размер пула.
+Задача пула получает копию контекста запроса (contextvars), поэтому
+её SQL-запросы попадают в метрики своего запроса. Соединения с БД
+в потоках пула закрываются по CONN_MAX_AGE, как после обычного запроса.
+
+Django 3.2 перебирает потоковый ответ прямо в цикле событий, где
+запросы к БД запрещены. Поэтому генератор выполняется в пуле и пишется
+во временный файл (в памяти до SHOPPING_LIST_SPOOL_SIZE байт), а цикл
+событий отдаёт уже готовые строки.
+
+Запись (POST, PUT, PATCH, DELETE) на тех же адресах идёт мимо пула:
+синхронное представление вызывается так же, как Django вызывает его
+под ASGI без обёртки, через sync_to_async(thread_sensitive=True).
+
+Оборачиваются представления, которые строит роутер из api.urls: у них
+те же initkwargs (basename, detail, permission_classes действий), что
+и под WSGI.
+"""
+import asyncio
+import contextvars
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial, wraps
+from tempfile import SpooledTemporaryFile
+
+from asgiref.sync import sync_to_async
+from django.conf import settings
+from django.db import close_old_connections
+from django.http import FileResponse
+
+from .urls import router
+
+READ_METHODS = ("GET", "HEAD")
+
+executor = ThreadPoolExecutor(
+    max_workers=settings.ASYNC_DB_THREADS, thread_name_prefix="foodgram-db"
+)
+
+
+def call_with_connections(func, *args, **kwargs):
+    """Вызов в потоке пула с закрытием устаревших соединений до и после"""
+    close_old_connections()
+    try:
+        return func(*args, **kwargs)
+    finally:
+        close_old_connections()
+
+
+async def run_in_pool(func, *args, **kwargs):
+    context = contextvars.copy_context()
+    return await asyncio.get_running_loop().run_in_executor(
+        executor,
+        context.run,
+        partial(call_with_connections, func, *args, **kwargs),
+    )
+
+
+def spool(chunks):
+    buffer = SpooledTemporaryFile(max_size=settings.SHOPPING_LIST_SPOOL_SIZE)
+    for chunk in chunks:
+        buffer.write(chunk)
+    buffer.seek(0)
+    return buffer
+
+
+def render(view, request, *args, **kwargs):
+    """Ответ рендерится в пуле, а не в цикле событий"""
+    response = view(request, *args, **kwargs)
+    if hasattr(response, "render"):
+        response.render()
+    if response.streaming and not isinstance(response, FileResponse):
+        response.streaming_content = spool(response.streaming_content)
+    return response
+
+
+def async_view(view):
+    """Асинхронная обёртка чтения синхронного представления DRF"""
+
+    @wraps(view)
+    async def wrapper(request, *args, **kwargs):
+        if request.method in READ_METHODS:
+            return await run_in_pool(render, view, request, *args, **kwargs)
+        return await sync_to_async(view, thread_sensitive=True)(
+            request, *args, **kwargs
+        )
+
+    return wrapper
+
+
+router_views = {url.name: url.callback for url in router.urls}
+
+recipe_list = async_view(router_views["recipes-list"])
+recipe_detail = async_view(router_views["recipes-detail"])
+download_shopping_cart = async_view(
+    router_views["recipes-download-shopping-cart"]
+)
+ingredient_list = async_view(router_views["ingredients-list"])
+tag_list = async_view(router_views["tags-list"])
+tag_detail = async_view(router_views["tags-detail"])
+subscription_list = async_view(router_views["subscriptions-list"])
@@ -0,0 +1,71 @@
+"""
+Аутентификация по токену с кэшем token -> пользователь.
+
+Кэш берётся из CACHES по TOKEN_CACHE_ALIAS и должен быть общим для
+всех воркеров (memcached, redis, файловый): выход, смена пароля или
+блокировка удаляют запись только в этом кэше, и токен перестаёт
+действовать сразу во всех процессах. Кэш процесса (LocMemCache) другие
+воркеры не видят, поэтому с ним, как и с DummyCache по умолчанию,
+каждый запрос проверяет токен в БД. Записи удаляются сигналами при
+выходе (удаление токена) и при любом сохранении пользователя.
+"""
+import hashlib
+
+from django.conf import settings
+from django.core.cache import caches
+from django.core.cache.backends.dummy import DummyCache
+from django.core.cache.backends.locmem import LocMemCache
+from django.utils.translation import gettext_lazy as _
+from rest_framework import exceptions
+from rest_framework.authentication import TokenAuthentication
+from rest_framework.authtoken.models import Token
+
+# счётчики меняются UPDATE в обход модели: в кэше их нет, и полное
+# сохранение закэшированного пользователя их не перезапишет
+DEFERRED_FIELDS = ("followers_count", "recipes_count")
+
+# удаление записи в таком кэше не видно другим процессам
+UNSHARED_CACHES = (DummyCache, LocMemCache)
+
+
+def get_cache():
+    """Общий кэш токенов или None, если кэш не общий"""
+    cache = caches[settings.TOKEN_CACHE_ALIAS]
+    if isinstance(cache, UNSHARED_CACHES):
+        return None
+    return cache
+
+
+def get_cache_key(key):
+    """Сам токен в ключ кэша не попадает"""
+    return "auth-token:" + hashlib.sha256(key.encode()).hexdigest()
+
+
+def forget_tokens(*keys):
+    cache = get_cache()
+    if cache is not None and keys:
+        cache.delete_many([get_cache_key(key) for key in keys])
+
+
+class CachedTokenAuthentication(TokenAuthentication):
+    """TokenAuthentication без запроса к БД при повторных обращениях"""
+
+    def authenticate_credentials(self, key):
+        cache = get_cache()
+        cache_key = get_cache_key(key)
+        user = cache.get(cache_key) if cache is not None else None
+        if user is None:
+            try:
+                token = Token.objects.select_related("user").defer(
+                    *(f"user__{field}" for field in DEFERRED_FIELDS)
+                ).get(key=key)
+            except Token.DoesNotExist:
+                raise exceptions.AuthenticationFailed(_("Invalid token."))
+            user = token.user
+            if cache is not None:
+                cache.set(cache_key, user)
+        if not user.is_active:
+            raise exceptions.AuthenticationFailed(
+                _("User inactive or deleted.")
+            )
+        return user, Token(key=key, user=user)
@@ -0,0 +1,405 @@
+"""
+Замеры времени ответа и числа SQL-запросов для маршрутов API.
+
+Данные создаются пакетно через ORM (bulk_create), производные таблицы —
+лента, счётчики, списки покупок и индекс ингредиентов — пересчитываются
+теми же функциями, что и в рабочем коде. Каждый маршрут вызывается через
+APIClient без сети, поэтому замер показывает стоимость Django, DRF и БД.
+"""
+import csv
+import io
+import os
+import random
+import statistics
+import tempfile
+import time
+from collections import namedtuple
+from contextlib import contextmanager
+from pathlib import Path
+
+from core.models import ContentVersion
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.core.cache import caches
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import connection
+from django.test.utils import CaptureQueriesContext, override_settings
+from PIL import Image
+from recipes.ingredient_index import build_index
+from recipes.models import (FeedItem, Favorite, Ingredient, IngredientRecipe,
+                            Recipe, ShoppingCart, ShoppingListItem, Tag,
+                            TagRecipe)
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+from users.models import Subscriptions
+
+User = get_user_model()
+
+BATCH_SIZE = 1000
+BENCHMARK_PASSWORD = "benchmark-password"
+INGREDIENTS_FILE = Path(settings.BASE_DIR).parent / "data" / "ingredients.csv"
+TAGS = (
+    ("Завтрак", "#E26C2D", "breakfast"),
+    ("Обед", "#49B64E", "lunch"),
+    ("Ужин", "#8775D2", "dinner"),
+    ("Десерт", "#F2C94C", "dessert"),
+    ("Выпечка", "#2F80ED", "bakery"),
+)
+
+DatasetSize = namedtuple(
+    "DatasetSize",
+    (
+        "users",
+        "recipes",
+        "ingredients_per_recipe",
+        "subscriptions",
+        "favorites",
+        "shopping_cart",
+    ),
+)
+DEFAULT_SIZE = DatasetSize(200, 2000, 8, 15, 30, 5)
+
+Route = namedtuple(
+    "Route",
+    ("name", "method", "path", "anonymous", "cleanup"),
+    defaults=(False, None),
+)
+
+
+def read_ingredients():
+    """Ингредиенты проекта из data/ingredients.csv или сгенерированные"""
+    if INGREDIENTS_FILE.exists():
+        with open(INGREDIENTS_FILE, encoding="utf-8") as csv_file:
+            return [tuple(row[:2]) for row in csv.reader(csv_file) if row]
+    return [(f"ингредиент {number}", "г") for number in range(2000)]
+
+
+def make_image():
+    """Одно изображение на все рецепты: содержимое файла на замер не влияет"""
+    buffer = io.BytesIO()
+    Image.new("RGB", (1200, 800), "#E26C2D").save(buffer, "JPEG")
+    return default_storage.save(
+        "recipe_images/benchmark.jpg", ContentFile(buffer.getvalue())
+    )
+
+
+def seed_dataset(size=DEFAULT_SIZE, seed=0):
+    """Заполнение пустой базы; возвращает число созданных строк по таблицам"""
+    rng = random.Random(seed)
+    Tag.objects.bulk_create(
+        (
+            Tag(name=name, color=color, slug=slug, bit_index=bit_index)
+            for bit_index, (name, color, slug) in enumerate(TAGS)
+        ),
+        ignore_conflicts=True,
+    )
+    tags = list(Tag.objects.all())
+    Ingredient.objects.bulk_create(
+        (
+            Ingredient(name=name, measurement_unit=unit)
+            for name, unit in read_ingredients()
+        ),
+        batch_size=BATCH_SIZE,
+        ignore_conflicts=True,
+    )
+    ingredient_ids = list(Ingredient.objects.values_list("id", flat=True))
+    password = make_password(BENCHMARK_PASSWORD)
+    User.objects.bulk_create(
+        (
+            User(
+                username=f"user{number}",
+                email=f"user{number}@example.com",
+                first_name="Имя",
+                last_name="Фамилия",
+                password=password,
+            )
+            for number in range(size.users)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    user_ids = list(User.objects.order_by("id").values_list("id", flat=True))
+    Token.objects.bulk_create(
+        Token(user_id=user_id, key=Token.generate_key())
+        for user_id in user_ids
+    )
+    image = make_image()
+    Recipe.objects.bulk_create(
+        (
+            Recipe(
+                name=f"Рецепт {number}",
+                author_id=user_ids[number % len(user_ids)],
+                image=image,
+                text="Описание рецепта. " * 20,
+                cooking_time=rng.randint(5, 180),
+            )
+            for number in range(size.recipes)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    recipe_ids = list(Recipe.objects.values_list("id", flat=True))
+    TagRecipe.objects.bulk_create(
+        (
+            TagRecipe(recipe_id=recipe_id, tag=tag)
+            for recipe_id in recipe_ids
+            for tag in rng.sample(tags, rng.randint(1, 2))
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    IngredientRecipe.objects.bulk_create(
+        (
+            IngredientRecipe(
+                recipe_id=recipe_id,
+                ingredient_id=ingredient_id,
+                amount=rng.randint(1, 500),
+            )
+            for recipe_id in recipe_ids
+            for ingredient_id in rng.sample(
+                ingredient_ids, size.ingredients_per_recipe
+            )
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    subscriptions = [
+        (user_id, author_id)
+        for user_id in user_ids
+        for author_id in rng.sample(user_ids, size.subscriptions + 1)
+        if author_id != user_id
+    ]
+    Subscriptions.objects.bulk_create(
+        (
+            Subscriptions(user_id=user_id, author_id=author_id)
+            for user_id, author_id in subscriptions
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    Favorite.objects.bulk_create(
+        (
+            Favorite(user_id=user_id, favorite_recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in rng.sample(recipe_ids, size.favorites)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    ShoppingCart.objects.bulk_create(
+        (
+            ShoppingCart(user_id=user_id, recipe_id=recipe_id)
+            for user_id in user_ids
+            for recipe_id in rng.sample(recipe_ids, size.shopping_cart)
+        ),
+        batch_size=BATCH_SIZE,
+    )
+    # bulk_create не вызывает сигналы: производные данные строятся отдельно
+    for user_id, author_id in subscriptions:
+        FeedItem.objects.backfill(user_id, author_id)
+    ShoppingListItem.objects.rebuild(user_ids)
+    Recipe.objects.refresh_tags_mask()
+    call_command("recount_counters", stdout=io.StringIO())
+    build_index()
+    for key in ("recipes", "tags", "ingredients", "users"):
+        ContentVersion.objects.bump(key)
+    return {
+        model._meta.db_table: model.objects.count()
+        for model in (
+            User,
+            Recipe,
+            Ingredient,
+            IngredientRecipe,
+            Subscriptions,
+            Favorite,
+            ShoppingCart,
+            FeedItem,
+        )
+    }
+
+
+@contextmanager
+def benchmark_environment(verbosity=0):
+    """
+    Тестовая база рядом с рабочей (для SQLite — в памяти), свои каталог
+    медиа, файл индекса ингредиентов и кэши: рабочие данные
+    не затрагиваются, после замеров всё удаляется.
+    """
+    with tempfile.TemporaryDirectory() as directory, override_settings(
+        MEDIA_ROOT=directory,
+        INGREDIENT_INDEX_PATH=os.path.join(directory, "ingredients.idx"),
+        CACHES={
+            "default": {
+                "BACKEND": "django.core.cache.backends.locmem.LocMemCache",
+                "LOCATION": "benchmark",
+            },
+            # общий для процессов, как кэш токенов в рабочем окружении
+            settings.TOKEN_CACHE_ALIAS: {
+                "BACKEND": "django.core.cache.backends.filebased."
+                "FileBasedCache",
+                "LOCATION": os.path.join(directory, "tokens"),
+            },
+        },
+    ):
+        old_name = connection.settings_dict["NAME"]
+        connection.creation.create_test_db(
+            verbosity=verbosity, autoclobber=True
+        )
+        try:
+            yield
+        finally:
+            connection.creation.destroy_test_db(
+                old_name, verbosity=verbosity
+            )
+
+
+def get_routes():
+    """Маршруты api/urls.py с параметрами из заполненной базы"""
+    user = User.objects.order_by("id").first()
+    recipe = Recipe.objects.order_by("id").first()
+    other = (
+        Recipe.objects.exclude(favorite_recipes__user=user)
+        .exclude(shopping_cart_recipe__user=user)
+        .order_by("-id")
+        .first()
+    )
+    author = (
+        User.objects.exclude(pk=user.pk)
+        .exclude(subscription__user=user)
+        .order_by("id")
+        .first()
+    )
+    slugs = Tag.objects.order_by("id").values_list("slug", flat=True)[:2]
+    tags = "&".join(f"tags={slug}" for slug in slugs)
+    prefix = Ingredient.objects.order_by("id").first().name[:2]
+    download = "/api/recipes/download_shopping_cart/"
+    return (
+        Route("recipes_list", "get", "/api/recipes/"),
+        Route("recipes_list_anonymous", "get", "/api/recipes/", True),
+        Route("recipes_list_tags", "get", f"/api/recipes/?{tags}"),
+        Route("recipes_list_cursor", "get", "/api/recipes/?cursor="),
+        Route("recipes_is_favorited", "get", "/api/recipes/?is_favorited=1"),
+        Route(
+            "recipes_is_in_shopping_cart",
+            "get",
+            "/api/recipes/?is_in_shopping_cart=1",
+        ),
+        Route(
+            "recipes_author", "get", f"/api/recipes/?author={recipe.author_id}"
+        ),
+        Route("recipe_detail", "get", f"/api/recipes/{recipe.pk}/"),
+        Route("recipes_feed", "get", "/api/recipes/feed/"),
+        Route("download_shopping_cart_txt", "get", download),
+        Route("download_shopping_cart_csv", "get", f"{download}?format=csv"),
+        Route(
+            "favorite_add",
+            "post",
+            f"/api/recipes/{other.pk}/favorite/",
+            cleanup="delete",
+        ),
+        Route(
+            "shopping_cart_add",
+            "post",
+            f"/api/recipes/{other.pk}/shopping_cart/",
+            cleanup="delete",
+        ),
+        Route("subscriptions", "get", "/api/users/subscriptions/"),
+        Route(
+            "subscriptions_recipes_limit",
+            "get",
+            "/api/users/subscriptions/?recipes_limit=3",
+        ),
+        Route(
+            "subscribe",
+            "post",
+            f"/api/users/{author.pk}/subscribe/",
+            cleanup="delete",
+        ),
+        Route("users_list", "get", "/api/users/"),
+        Route("user_me", "get", "/api/users/me/"),
+        Route("user_detail", "get", f"/api/users/{author.pk}/"),
+        Route("tags_list", "get", "/api/tags/", True),
+        Route("ingredients_list", "get", "/api/ingredients/", True),
+        Route(
+            "ingredients_search",
+            "get",
+            f"/api/ingredients/?name={prefix}",
+            anonymous=True,
+        ),
+    ), user
+
+
+def consume(response):
+    """Потоковые ответы читаются целиком, чтобы попасть в замер"""
+    if response.streaming:
+        return sum(len(chunk) for chunk in response.streaming_content)
+    return len(response.content)
+
+
+def measure(client, route, repeat):
+    """Медиана, минимум и максимум времени ответа и число запросов"""
+    timings, queries, status_code = [], 0, None
+    for _ in range(repeat + 1):
+        caches[settings.RECIPES_CACHE_ALIAS].clear()
+        with CaptureQueriesContext(connection) as context:
+            start = time.perf_counter()
+            response = getattr(client, route.method)(route.path)
+            consume(response)
+            elapsed = time.perf_counter() - start
+        # список запросов очищается в начале каждого запроса к API
+        count = len(context.captured_queries)
+        if route.cleanup:
+            getattr(client, route.cleanup)(route.path)
+        if status_code is None:
+            # первый вызов прогревает кэши процесса и в замер не входит
+            status_code = response.status_code
+            continue
+        timings.append(elapsed * 1000)
+        queries = count
+    return {
+        "method": route.method.upper(),
+        "path": route.path,
+        "status": status_code,
+        "queries": queries,
+        "median_ms": round(statistics.median(timings), 3),
+        "min_ms": round(min(timings), 3),
+        "max_ms": round(max(timings), 3),
+    }
+
+
+def run_benchmark(repeat=10, names=None):
+    """Замер всех маршрутов от имени первого пользователя и анонима"""
+    routes, user = get_routes()
+    client = APIClient()
+    client.force_authenticate(user)
+    anonymous = APIClient()
+    results = {}
+    for route in routes:
+        if names and route.name not in names:
+            continue
+        results[route.name] = measure(
+            anonymous if route.anonymous else client, route, repeat
+        )
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Сравнение с базовым прогоном. Регрессия — рост числа запросов
+    или медианы времени больше чем на tolerance (доля).
+    """
+    rows, regressions = [], []
+    for name, result in results.items():
+        previous = baseline.get(name)
+        if previous is None:
+            rows.append((name, result, None))
+            continue
+        rows.append((name, result, previous))
+        if result["queries"] > previous["queries"]:
+            regressions.append(
+                f"{name}: запросов {previous['queries']} -> "
+                f"{result['queries']}"
+            )
+        if result["median_ms"] > previous["median_ms"] * (1 + tolerance):
+            regressions.append(
+                f"{name}: медиана {previous['median_ms']} -> "
+                f"{result['median_ms']} мс"
+            )
+    return rows, regressions
@@ -17,6 +17,7 @@ class RecipeFilter(filters.FilterSet):
         field_name='tags__slug',
         to_field_name='slug',
         queryset=Tag.objects.all(),
+        method='get_tags',
     )
     is_favorited = filters.CharFilter(
         method='get_is_favorited',
@@ -24,10 +25,23 @@ class RecipeFilter(filters.FilterSet):
     is_in_shopping_cart = filters.CharFilter(
         method='get_is_in_shopping_cart',
     )
+    search = filters.CharFilter(method='get_search')
 
     class Meta:
         model = Recipe
-        fields = ('author', 'tags', 'is_favorited', 'is_in_shopping_cart')
+        fields = (
+            'author',
+            'tags',
+            'is_favorited',
+            'is_in_shopping_cart',
+            'search',
+        )
+
+    def get_tags(self, queryset, name, tags):
+        """Любой из тегов: проверка маски рецепта без JOIN и DISTINCT"""
+        if tags:
+            return queryset.with_any_tags(tags)
+        return queryset
 
     def get_is_favorited(self, queryset, name, value):
         user = self.request.user
@@ -40,3 +54,9 @@ class RecipeFilter(filters.FilterSet):
         if value and user.is_authenticated:
             return queryset.filter(shopping_cart_recipe__user=user)
         return queryset
+
+    def get_search(self, queryset, name, value):
+        """Полнотекстовый поиск, сначала самые релевантные рецепты"""
+        if value.strip():
+            return queryset.search(value)
+        return queryset
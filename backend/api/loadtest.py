@@ -0,0 +1,285 @@
+"""
+Нагрузочный драйвер: виртуальные пользователи повторяют запросы фронтенда.
+
+Каждый поток — отдельный пользователь со своим keep-alive соединением.
+Сценарий выбирается случайно с весами из SCENARIOS: анонимный просмотр,
+вход по токену, избранное и корзина, создание рецепта с изображением,
+выгрузка списка покупок. Время ответа копится по шаблону адреса, чтобы
+рецепты с разными id попадали в одну строку отчёта.
+"""
+import http.client
+import io
+import json
+import random
+import threading
+import time
+from collections import defaultdict
+from urllib.parse import urlsplit
+
+from PIL import Image
+
+from .benchmarks import BENCHMARK_PASSWORD
+
+
+def percentile(values, share):
+    """Перцентиль методом ближайшего ранга по отсортированному списку"""
+    if not values:
+        return None
+    rank = max(int(round(share * len(values) + 0.5)) - 1, 0)
+    return values[min(rank, len(values) - 1)]
+
+
+def make_image():
+    buffer = io.BytesIO()
+    Image.new("RGB", (1200, 800), "#49B64E").save(buffer, "JPEG")
+    return buffer.getvalue()
+
+
+class Stats:
+    """Время ответов по адресам, общее для всех потоков"""
+
+    def __init__(self):
+        self.timings = defaultdict(list)
+        self.rejected = defaultdict(int)
+        self.errors = defaultdict(int)
+        self.lock = threading.Lock()
+
+    def add(self, name, elapsed, status):
+        """Ответы 4xx считаются отдельно: гонки за один рецепт ожидаемы"""
+        with self.lock:
+            self.timings[name].append(elapsed)
+            if 400 <= status < 500:
+                self.rejected[name] += 1
+            elif not 0 < status < 400:
+                self.errors[name] += 1
+
+    def report(self, duration):
+        rows = {}
+        for name, timings in sorted(self.timings.items()):
+            timings = sorted(timings)
+            rows[name] = {
+                "requests": len(timings),
+                "rejected": self.rejected[name],
+                "errors": self.errors[name],
+                "rps": round(len(timings) / duration, 2),
+                "p50_ms": round(percentile(timings, 0.50) * 1000, 2),
+                "p95_ms": round(percentile(timings, 0.95) * 1000, 2),
+                "p99_ms": round(percentile(timings, 0.99) * 1000, 2),
+            }
+        total = sum(len(timings) for timings in self.timings.values())
+        return {
+            "duration_s": round(duration, 2),
+            "requests": total,
+            "rejected": sum(self.rejected.values()),
+            "errors": sum(self.errors.values()),
+            "rps": round(total / duration, 2),
+            "endpoints": rows,
+        }
+
+
+class VirtualUser:
+    """Клиент API поверх одного HTTP-соединения"""
+
+    def __init__(self, base_url, stats, rng, email=None):
+        parts = urlsplit(base_url)
+        self.host, self.port = parts.hostname, parts.port or 80
+        self.prefix = parts.path.rstrip("/")
+        self.stats = stats
+        self.rng = rng
+        self.email = email
+        self.token = None
+        self.connection = None
+
+    def request(self, name, method, path, body=None, content_type=None):
+        """Запрос с замером; name — шаблон адреса для отчёта"""
+        headers = {"Accept": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Token {self.token}"
+        if isinstance(body, (dict, list)):
+            body, content_type = json.dumps(body), "application/json"
+        if content_type:
+            headers["Content-Type"] = content_type
+        start = time.perf_counter()
+        try:
+            if self.connection is None:
+                self.connection = http.client.HTTPConnection(
+                    self.host, self.port, timeout=30
+                )
+            self.connection.request(
+                method, self.prefix + path, body=body, headers=headers
+            )
+            response = self.connection.getresponse()
+            data = response.read()
+            status = response.status
+        except (OSError, http.client.HTTPException):
+            self.connection.close()
+            self.connection = None
+            data, status = b"", 0
+        self.stats.add(f"{method} {name}", time.perf_counter() - start, status)
+        if status and "json" in response.getheader("Content-Type", ""):
+            return status, json.loads(data or b"null")
+        return status, data
+
+    def login(self):
+        status, data = self.request(
+            "/api/auth/token/login/",
+            "POST",
+            "/api/auth/token/login/",
+            {"email": self.email, "password": BENCHMARK_PASSWORD},
+        )
+        if status == 200:
+            self.token = data["auth_token"]
+
+    def recipe_ids(self):
+        page = self.rng.randint(1, 5)
+        status, data = self.request(
+            "/api/recipes/?page=", "GET", f"/api/recipes/?page={page}"
+        )
+        if status != 200:
+            return []
+        return [recipe["id"] for recipe in data["results"]]
+
+    def browse(self, catalog):
+        """Анонимный просмотр: лента рецептов, теги, рецепт, поиск"""
+        self.request("/api/tags/", "GET", "/api/tags/")
+        ids = self.recipe_ids()
+        if catalog["tags"]:
+            slug = self.rng.choice(catalog["tags"])
+            self.request(
+                "/api/recipes/?tags=", "GET", f"/api/recipes/?tags={slug}"
+            )
+        for recipe_id in self.rng.sample(ids, min(len(ids), 2)):
+            self.request(
+                "/api/recipes/{id}/", "GET", f"/api/recipes/{recipe_id}/"
+            )
+
+    def toggle(self, catalog):
+        """Добавление в избранное и корзину и удаление обратно"""
+        ids = self.recipe_ids()
+        if not ids:
+            return
+        recipe_id = self.rng.choice(ids)
+        for action in ("favorite", "shopping_cart"):
+            name = f"/api/recipes/{{id}}/{action}/"
+            path = f"/api/recipes/{recipe_id}/{action}/"
+            status, _ = self.request(name, "POST", path)
+            if status == 400:
+                # рецепт уже был добавлен: тогда сначала удаляем
+                self.request(name, "DELETE", path)
+                self.request(name, "POST", path)
+            self.request(name, "DELETE", path)
+
+    def subscriptions(self, catalog):
+        self.request(
+            "/api/users/subscriptions/",
+            "GET",
+            "/api/users/subscriptions/?recipes_limit=3",
+        )
+        self.request("/api/recipes/feed/", "GET", "/api/recipes/feed/")
+
+    def create_recipe(self, catalog):
+        """Загрузка изображения, создание рецепта и его удаление"""
+        status, data = self.request(
+            "/api/recipes/upload_image/",
+            "POST",
+            "/api/recipes/upload_image/",
+            catalog["image"],
+            "image/jpeg",
+        )
+        if status != 201 or not catalog["ingredients"]:
+            return
+        ingredients = self.rng.sample(
+            catalog["ingredients"], min(len(catalog["ingredients"]), 6)
+        )
+        status, recipe = self.request(
+            "/api/recipes/",
+            "POST",
+            "/api/recipes/",
+            {
+                "name": f"Нагрузка {self.rng.getrandbits(64):x}",
+                "text": "Рецепт из нагрузочного теста",
+                "cooking_time": self.rng.randint(5, 120),
+                "image_token": data["image_token"],
+                "tags": [self.rng.choice(catalog["tag_ids"])],
+                "ingredients": [
+                    {"id": ingredient_id, "amount": self.rng.randint(1, 300)}
+                    for ingredient_id in ingredients
+                ],
+            },
+        )
+        if status == 201:
+            self.request(
+                "/api/recipes/{id}/", "DELETE", f"/api/recipes/{recipe['id']}/"
+            )
+
+    def download(self, catalog):
+        file_format = self.rng.choice(("txt", "csv", "pdf"))
+        self.request(
+            f"/api/recipes/download_shopping_cart/?format={file_format}",
+            "GET",
+            f"/api/recipes/download_shopping_cart/?format={file_format}",
+        )
+
+
+# (сценарий, вес, нужен ли вход)
+SCENARIOS = (
+    (VirtualUser.browse, 50, False),
+    (VirtualUser.toggle, 20, True),
+    (VirtualUser.subscriptions, 15, True),
+    (VirtualUser.download, 10, True),
+    (VirtualUser.create_recipe, 5, True),
+)
+
+
+def load_catalog(base_url):
+    """Теги и ингредиенты, которые фронтенд получает при старте"""
+    stats = Stats()
+    user = VirtualUser(base_url, stats, random.Random())
+    _, tags = user.request("/api/tags/", "GET", "/api/tags/")
+    _, ingredients = user.request(
+        "/api/ingredients/", "GET", "/api/ingredients/"
+    )
+    tags = tags if isinstance(tags, list) else []
+    ingredients = ingredients if isinstance(ingredients, list) else []
+    return {
+        "tags": [tag["slug"] for tag in tags],
+        "tag_ids": [tag["id"] for tag in tags],
+        "ingredients": [ingredient["id"] for ingredient in ingredients],
+        "image": make_image(),
+    }
+
+
+def run_load(base_url, emails, concurrency, duration, seed=0):
+    """Запуск concurrency пользователей на duration секунд; отчёт по адресам"""
+    catalog = load_catalog(base_url)
+    stats = Stats()
+    deadline = time.monotonic() + duration
+    scenarios = [scenario for scenario, _, _ in SCENARIOS]
+    weights = [weight for _, weight, _ in SCENARIOS]
+    needs_login = {scenario: login for scenario, _, login in SCENARIOS}
+
+    def worker(number):
+        rng = random.Random(seed + number)
+        user = VirtualUser(
+            base_url, stats, rng, emails[number % len(emails)]
+        )
+        anonymous = VirtualUser(base_url, stats, rng)
+        while time.monotonic() < deadline:
+            scenario = rng.choices(scenarios, weights)[0]
+            if not needs_login[scenario]:
+                scenario(anonymous, catalog)
+                continue
+            if user.token is None:
+                user.login()
+            scenario(user, catalog)
+
+    threads = [
+        threading.Thread(target=worker, args=(number,), daemon=True)
+        for number in range(concurrency)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return stats.report(time.monotonic() - started)
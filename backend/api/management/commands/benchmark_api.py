@@ -0,0 +1,94 @@
+"""Замеры времени ответа и числа запросов для маршрутов API"""
+import json
+import platform
+
+import django
+from api.benchmarks import (DEFAULT_SIZE, benchmark_environment, compare,
+                            run_benchmark, seed_dataset)
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    """Команда для поиска регрессий: N+1 запросы и замедление ответов"""
+
+    help = (
+        "Заполняем временную базу и замеряем время ответа и число "
+        "SQL-запросов для каждого маршрута API"
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--repeat", type=int, default=10, help="Повторов на маршрут"
+        )
+        parser.add_argument(
+            "--users", type=int, default=DEFAULT_SIZE.users
+        )
+        parser.add_argument(
+            "--recipes", type=int, default=DEFAULT_SIZE.recipes
+        )
+        parser.add_argument(
+            "--route",
+            action="append",
+            dest="routes",
+            help="Замерить только указанные маршруты",
+        )
+        parser.add_argument(
+            "--output", help="Файл для результатов JSON, по умолчанию stdout"
+        )
+        parser.add_argument(
+            "--baseline", help="JSON предыдущего прогона для сравнения"
+        )
+        parser.add_argument(
+            "--tolerance",
+            type=float,
+            default=0.2,
+            help="Допустимый рост медианы времени, доля",
+        )
+
+    def handle(self, **options):
+        baseline = None
+        if options["baseline"]:
+            with open(options["baseline"], encoding="utf-8") as baseline_file:
+                baseline = json.load(baseline_file)["results"]
+        size = DEFAULT_SIZE._replace(
+            users=options["users"], recipes=options["recipes"]
+        )
+        with benchmark_environment():
+            dataset = seed_dataset(size)
+            results = run_benchmark(options["repeat"], options["routes"])
+            vendor = connection.vendor
+        report = {
+            "environment": {
+                "python": platform.python_version(),
+                "django": django.get_version(),
+                "database": vendor,
+                "repeat": options["repeat"],
+            },
+            "dataset": dataset,
+            "results": results,
+        }
+        output = json.dumps(report, ensure_ascii=False, indent=2)
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as out_file:
+                out_file.write(output)
+        else:
+            self.stdout.write(output)
+        if baseline is None:
+            return
+        rows, regressions = compare(results, baseline, options["tolerance"])
+        for name, result, previous in rows:
+            before = (
+                f"{previous['queries']:>4} {previous['median_ms']:>9.2f}"
+                if previous
+                else f"{'-':>4} {'-':>9}"
+            )
+            self.stderr.write(
+                f"{name:<32} {before} -> "
+                f"{result['queries']:>4} {result['median_ms']:>9.2f} мс"
+            )
+        if regressions:
+            raise CommandError(
+                "Регрессии относительно базового прогона:\n"
+                + "\n".join(regressions)
+            )
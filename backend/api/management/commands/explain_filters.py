@@ -0,0 +1,74 @@
+"""Проверка планов запросов для всех сочетаний фильтров рецептов"""
+from api.benchmarks import DEFAULT_SIZE, benchmark_environment, seed_dataset
+from api.query_plans import advise_indexes, explain_filters
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connection
+
+
+class Command(BaseCommand):
+    """
+    Команда выполняет EXPLAIN для каждого сочетания фильтров RecipeFilter
+    на заполненной временной базе и отмечает полные просмотры и сортировки.
+    """
+
+    help = "EXPLAIN для сочетаний фильтров рецептов и подсказки по индексам"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=DEFAULT_SIZE.users)
+        parser.add_argument(
+            "--recipes", type=int, default=DEFAULT_SIZE.recipes
+        )
+        parser.add_argument(
+            "--current-db",
+            action="store_true",
+            help="Проверять рабочую базу без заполнения временной",
+        )
+        parser.add_argument(
+            "--verbose-plans", action="store_true", help="Печатать планы"
+        )
+        parser.add_argument(
+            "--strict",
+            action="store_true",
+            help="Завершаться с ошибкой, если есть подсказки по индексам",
+        )
+
+    def handle(self, **options):
+        if options["current_db"]:
+            self.check_plans(options)
+            return
+        size = DEFAULT_SIZE._replace(
+            users=options["users"], recipes=options["recipes"]
+        )
+        with benchmark_environment():
+            seed_dataset(size)
+            # статистика для планировщика, как после autovacuum в рабочей базе
+            with connection.cursor() as cursor:
+                cursor.execute("ANALYZE")
+            self.check_plans(options)
+
+    def check_plans(self, options):
+        reports = explain_filters()
+        for report in reports:
+            names = ", ".join(report.params) or "без фильтров"
+            status = "OK" if not report.problems else "!!"
+            self.stdout.write(f"[{status}] {names}")
+            for problem in report.problems:
+                self.stdout.write(f"     {problem.kind}: {problem.line}")
+            if options["verbose_plans"]:
+                self.stdout.write(report.plan)
+        advice = advise_indexes(reports)
+        if not advice:
+            if any(report.problems for report in reports):
+                # например, сортировка рецептов, отобранных по избранному
+                self.stdout.write(
+                    "Недостающих индексов не найдено: отмеченные строки "
+                    "планов индексы по условиям и сортировке не уберут."
+                )
+            else:
+                self.stdout.write("Недостающих индексов не найдено.")
+            return
+        self.stdout.write("Предлагаемые индексы:")
+        for table, definition in advice:
+            self.stdout.write(f"  {table}: {definition}")
+        if options["strict"]:
+            raise CommandError("Найдены запросы без подходящих индексов.")
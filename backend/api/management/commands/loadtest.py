@@ -0,0 +1,167 @@
+"""Нагрузочное тестирование API запросами, как у фронтенда"""
+import http.client
+import json
+import os
+import subprocess
+import sys
+import tempfile
+import time
+
+from api.loadtest import SCENARIOS, run_load
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+SERVERS = {
+    "wsgi": ("backend.wsgi:application",),
+    "asgi": (
+        "backend.asgi:application",
+        "--worker-class",
+        "uvicorn.workers.UvicornWorker",
+    ),
+}
+
+
+def get_rss(pid):
+    """Резидентная память процесса и его потомков в байтах (Linux /proc)"""
+    try:
+        with open(f"/proc/{pid}/status") as status:
+            rss = next(
+                int(line.split()[1]) * 1024
+                for line in status
+                if line.startswith("VmRSS:")
+            )
+        with open(f"/proc/{pid}/task/{pid}/children") as children:
+            child_pids = children.read().split()
+    except (OSError, StopIteration):
+        return 0
+    return rss + sum(get_rss(child) for child in child_pids)
+
+
+class Command(BaseCommand):
+    """
+    Команда запускает gunicorn (WSGI или ASGI) на свободном порту
+    или нагружает уже запущенный сервер по --url. База должна быть
+    заполнена командой seed_dataset. Запущенный командой сервер пишет
+    загруженные изображения во временный MEDIA_ROOT, а в отчёт
+    попадает его память в конце прогона, всего и на воркер: WSGI
+    и ASGI сравнивают при одинаковом --workers и с учётом памяти.
+    """
+
+    help = "Нагружаем API смесью запросов фронтенда и считаем перцентили"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--url", help="Адрес запущенного сервера")
+        parser.add_argument(
+            "--server", choices=tuple(SERVERS), default="wsgi"
+        )
+        parser.add_argument("--workers", type=int, default=2)
+        parser.add_argument("--port", type=int, default=8765)
+        parser.add_argument(
+            "--concurrency", type=int, default=10, help="Число пользователей"
+        )
+        parser.add_argument(
+            "--duration", type=float, default=30, help="Длительность, с"
+        )
+        parser.add_argument(
+            "--users",
+            type=int,
+            default=50,
+            help="Сколько пользователей seed_dataset использовать для входа",
+        )
+        parser.add_argument("--seed", type=int, default=0)
+        parser.add_argument("--output", help="Файл для отчёта в JSON")
+
+    def start_server(self, options, media_root):
+        command = (
+            sys.executable,
+            "-m",
+            "gunicorn",
+            *SERVERS[options["server"]],
+            "--bind",
+            f"127.0.0.1:{options['port']}",
+            "--workers",
+            str(options["workers"]),
+        )
+        server = subprocess.Popen(
+            command,
+            cwd=settings.BASE_DIR,
+            env={**os.environ, "MEDIA_ROOT": media_root},
+        )
+        deadline = time.monotonic() + 30
+        while time.monotonic() < deadline:
+            if server.poll() is not None:
+                raise CommandError("Сервер не запустился.")
+            try:
+                connection = http.client.HTTPConnection(
+                    "127.0.0.1", options["port"], timeout=1
+                )
+                connection.request("GET", "/api/tags/")
+                if connection.getresponse().status == 200:
+                    return server
+            except OSError:
+                time.sleep(0.2)
+        server.terminate()
+        raise CommandError("Сервер не ответил за 30 секунд.")
+
+    def handle(self, **options):
+        emails = [
+            f"user{number}@example.com" for number in range(options["users"])
+        ]
+        server = None
+        base_url = options["url"]
+        media_root = tempfile.TemporaryDirectory()
+        if base_url is None:
+            server = self.start_server(options, media_root.name)
+            base_url = f"http://127.0.0.1:{options['port']}"
+        try:
+            report = run_load(
+                base_url,
+                emails,
+                options["concurrency"],
+                options["duration"],
+                options["seed"],
+            )
+        finally:
+            if server is not None:
+                memory = get_rss(server.pid)
+                server.terminate()
+                server.wait()
+            media_root.cleanup()
+        report["concurrency"] = options["concurrency"]
+        if server is not None:
+            report["server"] = options["server"]
+            report["workers"] = options["workers"]
+            report["memory_mb"] = round(memory / 1024 / 1024, 1)
+            # память мастера gunicorn делится поровну между воркерами
+            report["memory_per_worker_mb"] = round(
+                report["memory_mb"] / options["workers"], 1
+            )
+        report["scenarios"] = {
+            scenario.__name__: weight for scenario, weight, _ in SCENARIOS
+        }
+        if options["output"]:
+            with open(options["output"], "w", encoding="utf-8") as out_file:
+                json.dump(report, out_file, ensure_ascii=False, indent=2)
+        self.stdout.write(
+            f"{'Адрес':<60} {'запр.':>6} {'4xx':>5} {'ошиб.':>5} {'rps':>8} "
+            f"{'p50':>8} {'p95':>8} {'p99':>8}"
+        )
+        for name, row in report["endpoints"].items():
+            self.stdout.write(
+                f"{name:<60} {row['requests']:>6} {row['rejected']:>5} "
+                f"{row['errors']:>5} "
+                f"{row['rps']:>8} {row['p50_ms']:>8} {row['p95_ms']:>8} "
+                f"{row['p99_ms']:>8}"
+            )
+        self.stdout.write(
+            f"Всего: {report['requests']} запросов, "
+            f"{report['rejected']} отказов 4xx, {report['errors']} ошибок, "
+            f"{report['rps']} запросов/с "
+            f"за {report['duration_s']} с"
+        )
+        if server is not None:
+            self.stdout.write(
+                f"Сервер {report['server']}, воркеров {report['workers']}, "
+                f"память {report['memory_mb']} МБ "
+                f"({report['memory_per_worker_mb']} МБ на воркер)"
+            )
@@ -0,0 +1,44 @@
+"""Заполняем базу тестовыми данными для нагрузочного тестирования"""
+import tempfile
+
+from api.benchmarks import BENCHMARK_PASSWORD, DEFAULT_SIZE, seed_dataset
+from django.core.management.base import BaseCommand, CommandError
+from django.db import transaction
+from django.test.utils import override_settings
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """
+    Команда для заполнения пустой базы пользователями и рецептами.
+    Общее изображение рецептов пишется во временный MEDIA_ROOT:
+    нагрузочному тесту нужны только записи в базе.
+    """
+
+    help = "Заполняем пустую базу пользователями, рецептами и подписками"
+
+    def add_arguments(self, parser):
+        parser.add_argument("--users", type=int, default=DEFAULT_SIZE.users)
+        parser.add_argument(
+            "--recipes", type=int, default=DEFAULT_SIZE.recipes
+        )
+        parser.add_argument("--seed", type=int, default=0)
+
+    @transaction.atomic
+    def handle(self, **options):
+        if Recipe.objects.exists():
+            raise CommandError("База уже содержит рецепты.")
+        size = DEFAULT_SIZE._replace(
+            users=options["users"], recipes=options["recipes"]
+        )
+        with tempfile.TemporaryDirectory() as directory, override_settings(
+            MEDIA_ROOT=directory
+        ):
+            counts = seed_dataset(size, options["seed"])
+        for table, count in counts.items():
+            self.stdout.write(f"{table}: {count}")
+        self.stdout.write(
+            "Пользователи user0..user{} с паролем {}".format(
+                size.users - 1, BENCHMARK_PASSWORD
+            )
+        )
@@ -0,0 +1,65 @@
+"""
+Подписки, избранное и корзина текущего пользователя в пределах запроса.
+
+Сериализаторы не проверяют каждую связь отдельным exists(): списки
+заранее сообщают id своих элементов, и для каждого вида связи
+выполняется один запрос по всем ещё не проверенным id. Результаты
+хранятся на объекте запроса и доступны вложенным сериализаторам.
+"""
+from django.contrib.auth.models import AnonymousUser
+from recipes.models import Favorite, ShoppingCart
+from rest_framework import serializers
+from users.models import Subscriptions
+
+# вид связи -> (модель, поле с id объекта)
+RELATIONS = {
+    "subscriptions": (Subscriptions, "author_id"),
+    "favorites": (Favorite, "favorite_recipe_id"),
+    "shopping_cart": (ShoppingCart, "recipe_id"),
+}
+
+
+class Membership:
+    """Уже проверенные id и найденные среди них для каждой связи"""
+
+    def __init__(self, user):
+        self.user = user
+        self.checked = {name: set() for name in RELATIONS}
+        self.found = {name: set() for name in RELATIONS}
+
+    def prime(self, name, ids):
+        """Загрузка связи для id, которые ещё не проверялись"""
+        ids = set(ids) - self.checked[name]
+        if not ids:
+            return
+        if self.user.is_authenticated:
+            model, field = RELATIONS[name]
+            self.found[name].update(
+                model.objects.filter(
+                    user=self.user, **{f"{field}__in": ids}
+                ).values_list(field, flat=True)
+            )
+        self.checked[name].update(ids)
+
+    def contains(self, name, pk):
+        self.prime(name, (pk,))
+        return pk in self.found[name]
+
+
+def get_membership(context):
+    """Membership текущего запроса, создаётся при первом обращении"""
+    request = context.get("request")
+    if request is None:
+        return Membership(AnonymousUser())
+    if not hasattr(request, "membership"):
+        request.membership = Membership(request.user)
+    return request.membership
+
+
+class MembershipListSerializer(serializers.ListSerializer):
+    """Перед выводом списка связи загружаются сразу для всех элементов"""
+
+    def to_representation(self, data):
+        items = list(data.all() if hasattr(data, "all") else data)
+        self.child.prime_membership(items)
+        return super().to_representation(items)
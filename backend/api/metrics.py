@@ -0,0 +1,276 @@
+"""
+Метрики запросов: число и время SQL-запросов, время сериализаторов,
+представления и размер ответа с разбивкой по ViewSet и action, а также
+состояние пула соединений с БД.
+
+Данные текущего запроса лежат в ContextVar, поэтому запросы к БД
+из потоков sync_to_async и пула потоков учитываются в своём запросе.
+Метрики ведёт prometheus_client. Под gunicorn все воркеры слушают
+один порт, и опрос попадает в случайный воркер, поэтому значения
+пишутся в файлы каталога PROMETHEUS_MULTIPROC_DIR (его задаёт
+gunicorn.conf.py), а /api/metrics/ отдаёт сумму по всем воркерам.
+Без этой переменной (runserver, тесты) метрики живут в процессе.
+"""
+import asyncio
+import os
+import threading
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+
+from core.db.pool import get_pools_stats
+from django.db.backends.signals import connection_created
+from django.utils.decorators import sync_and_async_middleware
+from prometheus_client import (REGISTRY, CollectorRegistry, Counter, Gauge,
+                               Histogram, generate_latest, multiprocess)
+
+current_metrics = ContextVar("current_metrics", default=None)
+
+DURATION_BUCKETS = (
+    0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10,
+)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100, 200)
+SIZE_BUCKETS = (
+    512, 1024, 4096, 16384, 65536, 262144, 1048576, 4194304,
+)
+HISTOGRAMS = {
+    "foodgram_request_duration_seconds": (
+        "Время обработки запроса",
+        DURATION_BUCKETS,
+    ),
+    "foodgram_db_queries": ("Число SQL-запросов", QUERY_BUCKETS),
+    "foodgram_db_duration_seconds": (
+        "Суммарное время SQL-запросов",
+        DURATION_BUCKETS,
+    ),
+    "foodgram_serializer_duration_seconds": (
+        "Время работы сериализаторов",
+        DURATION_BUCKETS,
+    ),
+    "foodgram_response_size_bytes": ("Размер ответа", SIZE_BUCKETS),
+}
+# поле статистики пула -> (метрика, тип, описание)
+POOL_METRICS = {
+    "size": ("foodgram_db_pool_size", "gauge", "Открытые соединения"),
+    "idle": ("foodgram_db_pool_idle", "gauge", "Свободные соединения"),
+    "in_use": ("foodgram_db_pool_in_use", "gauge", "Выданные соединения"),
+    "max_size": (
+        "foodgram_db_pool_max_size",
+        "gauge",
+        "Предельный размер пула",
+    ),
+    "checkouts": (
+        "foodgram_db_pool_checkouts_total",
+        "counter",
+        "Выдачи соединений из пула",
+    ),
+    "created": (
+        "foodgram_db_pool_connections_created_total",
+        "counter",
+        "Открытые пулом соединения",
+    ),
+    "closed": (
+        "foodgram_db_pool_connections_closed_total",
+        "counter",
+        "Закрытые пулом соединения: сбой, истёкший срок жизни",
+    ),
+    "waits": (
+        "foodgram_db_pool_waits_total",
+        "counter",
+        "Ожидания свободного соединения",
+    ),
+    "wait_seconds": (
+        "foodgram_db_pool_wait_seconds_total",
+        "counter",
+        "Суммарное время ожидания соединения",
+    ),
+    "timeouts": (
+        "foodgram_db_pool_timeouts_total",
+        "counter",
+        "Отказы по DB_POOL_TIMEOUT",
+    ),
+}
+
+
+LABELS = ("view", "action")
+histograms = {
+    name: Histogram(name, help_text, LABELS, buckets=buckets)
+    for name, (help_text, buckets) in HISTOGRAMS.items()
+}
+# состояние пула — сумма по живым воркерам, счётчики копятся
+# и за завершившиеся воркеры
+pool_metrics = {
+    key: (
+        Gauge(name, help_text, ("alias",), multiprocess_mode="livesum")
+        if metric_type == "gauge"
+        else Counter(name, help_text, ("alias",))
+    )
+    for key, (name, metric_type, help_text) in POOL_METRICS.items()
+}
+# уже учтённые значения счётчиков пулов: (pid, alias, поле) -> значение
+pool_totals = {}
+pool_totals_lock = threading.Lock()
+
+
+class RequestMetrics:
+    """Замеры одного запроса"""
+
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.serializer_time = 0.0
+        self.serializer_depth = 0
+
+
+def sync_pool_metrics():
+    """Статистика пулов процесса в метриках; счётчики — приращением"""
+    pid = os.getpid()
+    with pool_totals_lock:
+        for alias, stats in get_pools_stats().items():
+            for key, metric in pool_metrics.items():
+                value = stats[key]
+                if isinstance(metric, Gauge):
+                    metric.labels(alias=alias).set(value)
+                    continue
+                total_key = (pid, alias, key)
+                metric.labels(alias=alias).inc(
+                    value - pool_totals.get(total_key, 0)
+                )
+                pool_totals[total_key] = value
+
+
+def render_metrics():
+    """Текстовый формат Prometheus; сумма по воркерам, если их несколько"""
+    sync_pool_metrics()
+    if os.environ.get("PROMETHEUS_MULTIPROC_DIR"):
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry)
+
+
+def execute_wrapper(execute, sql, params, many, context):
+    """Обёртка курсора: учитывает запрос в метриках текущего запроса"""
+    metrics = current_metrics.get()
+    if metrics is None:
+        return execute(sql, params, many, context)
+    start = time.perf_counter()
+    try:
+        return execute(sql, params, many, context)
+    finally:
+        metrics.db_time += time.perf_counter() - start
+        metrics.queries += 1
+
+
+def install_execute_wrapper(sender, connection, **kwargs):
+    if execute_wrapper not in connection.execute_wrappers:
+        connection.execute_wrappers.append(execute_wrapper)
+
+
+@contextmanager
+def serializer_timer():
+    """Время сериализатора без двойного учёта вложенных вызовов"""
+    metrics = current_metrics.get()
+    if metrics is None or metrics.serializer_depth:
+        yield
+        return
+    metrics.serializer_depth += 1
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        metrics.serializer_time += time.perf_counter() - start
+        metrics.serializer_depth -= 1
+
+
+class SerializerTimingMixin:
+    """
+    Время вывода и проверки данных сериализатора в метриках запроса.
+    Вложенные сериализаторы и элементы many=True вызывают те же методы.
+    """
+
+    def to_representation(self, instance):
+        with serializer_timer():
+            return super().to_representation(instance)
+
+    def run_validation(self, *args, **kwargs):
+        with serializer_timer():
+            return super().run_validation(*args, **kwargs)
+
+
+def install():
+    """Подключение замеров; вызывается из ApiConfig.ready"""
+    connection_created.connect(
+        install_execute_wrapper, dispatch_uid="api_metrics"
+    )
+
+
+def get_view_labels(request):
+    """Класс представления и action DRF для маршрута запроса"""
+    match = getattr(request, "resolver_match", None)
+    if match is None:
+        return "unresolved", ""
+    view = getattr(match.func, "cls", None)
+    actions = getattr(match.func, "actions", None) or {}
+    action = actions.get(request.method.lower(), request.method.lower())
+    name = view.__name__ if view else match.func.__name__
+    return name, action
+
+
+def finish(request, response, metrics, started):
+    """Заголовок Server-Timing и запись в гистограммы"""
+    total = time.perf_counter() - started
+    if response.streaming:
+        size = int(response.get("Content-Length", 0))
+    else:
+        size = len(response.content)
+    response["Server-Timing"] = ", ".join(
+        (
+            f'db;dur={metrics.db_time * 1000:.2f};desc="{metrics.queries}"',
+            f"serializer;dur={metrics.serializer_time * 1000:.2f}",
+            f"view;dur={total * 1000:.2f}",
+        )
+    )
+    view, action = get_view_labels(request)
+    values = {
+        "foodgram_request_duration_seconds": total,
+        "foodgram_db_queries": metrics.queries,
+        "foodgram_db_duration_seconds": metrics.db_time,
+        "foodgram_serializer_duration_seconds": metrics.serializer_time,
+        "foodgram_response_size_bytes": size,
+    }
+    for name, value in values.items():
+        histograms[name].labels(view=view, action=action).observe(value)
+    sync_pool_metrics()
+    return response
+
+
+@sync_and_async_middleware
+def metrics_middleware(get_response):
+    """Замеры каждого запроса; работает и под WSGI, и под ASGI"""
+    if asyncio.iscoroutinefunction(get_response):
+
+        async def middleware(request):
+            metrics = RequestMetrics()
+            token = current_metrics.set(metrics)
+            started = time.perf_counter()
+            try:
+                response = await get_response(request)
+            finally:
+                current_metrics.reset(token)
+            return finish(request, response, metrics, started)
+
+        return middleware
+
+    def middleware(request):
+        metrics = RequestMetrics()
+        token = current_metrics.set(metrics)
+        started = time.perf_counter()
+        try:
+            response = get_response(request)
+        finally:
+            current_metrics.reset(token)
+        return finish(request, response, metrics, started)
+
+    return middleware
@@ -1,5 +1,13 @@
 """Custom mixins"""
-from rest_framework import mixins, viewsets
+import hashlib
+
+from core.models import ContentVersion
+from django.conf import settings
+from django.core.cache import caches
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
+from rest_framework import mixins, status, viewsets
+from rest_framework.response import Response
 
 
 class CreateDestroyViewSet(
@@ -10,3 +18,87 @@ class CreateDestroyViewSet(
 
 class ListSubscriptionViewSet(mixins.ListModelMixin, viewsets.GenericViewSet):
     """Вазовый класс для представления списка подписок"""
+
+
+class ConditionalGetMixin:
+    """
+    Условные GET-запросы для справочников: ETag и Last-Modified
+    из ContentVersion по ключу version_key. Если клиент прислал
+    актуальные If-None-Match/If-Modified-Since, ответ 304 отдаётся
+    до выборки из БД и работы сериализатора.
+    """
+
+    version_key = None
+    cache_max_age = settings.CATALOG_CACHE_MAX_AGE
+
+    def list(self, request, *args, **kwargs):
+        return self.get_conditional(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_conditional(
+            super().retrieve, request, *args, **kwargs
+        )
+
+    def get_conditional(self, handler, request, *args, **kwargs):
+        version, updated = ContentVersion.objects.get_version(
+            self.version_key
+        )
+        etag = quote_etag(f"{self.version_key}-{version}")
+        last_modified = int(updated.timestamp())
+        response = get_conditional_response(
+            request, etag=etag, last_modified=last_modified
+        )
+        if response is None:
+            response = handler(request, *args, **kwargs)
+        response["ETag"] = etag
+        response["Last-Modified"] = http_date(last_modified)
+        patch_cache_control(
+            response, public=True, max_age=self.cache_max_age
+        )
+        return response
+
+
+class AnonymousCacheMixin:
+    """
+    Кэш ответов list/retrieve для анонимных пользователей.
+    Ключ — нормализованные параметры запроса и версии cache_version_keys
+    из ContentVersion: после изменения данных старые ключи просто
+    перестают запрашиваться и вытесняются по таймауту.
+    """
+
+    cache_version_keys = ()
+    cache_timeout = settings.RECIPES_CACHE_TIMEOUT
+
+    def list(self, request, *args, **kwargs):
+        return self.get_cached(super().list, request, *args, **kwargs)
+
+    def retrieve(self, request, *args, **kwargs):
+        return self.get_cached(super().retrieve, request, *args, **kwargs)
+
+    def get_cache_key(self, request, versions):
+        query = sorted(
+            (key, sorted(values))
+            for key, values in request.query_params.lists()
+        )
+        raw = (
+            f"{self.action}:{versions}:{request.get_host()}:"
+            f"{request.path}:{query}"
+        )
+        digest = hashlib.md5(raw.encode("utf-8")).hexdigest()
+        return f"{self.basename}:{digest}"
+
+    def get_cached(self, handler, request, *args, **kwargs):
+        if not request.user.is_anonymous:
+            return handler(request, *args, **kwargs)
+        cache = caches[settings.RECIPES_CACHE_ALIAS]
+        key = self.get_cache_key(
+            request,
+            ContentVersion.objects.get_versions(self.cache_version_keys),
+        )
+        data = cache.get(key)
+        if data is not None:
+            return Response(data)
+        response = handler(request, *args, **kwargs)
+        if response.status_code == status.HTTP_200_OK:
+            cache.set(key, response.data, self.cache_timeout)
+        return response
@@ -1,10 +1,116 @@
 """Custom пагинатор"""
+import base64
+import binascii
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+from rest_framework.exceptions import ParseError
 from rest_framework.pagination import PageNumberPagination
+from rest_framework.response import Response
+from rest_framework.utils.urls import replace_query_param
 
 
 class PageLimitPagination(PageNumberPagination):
-    """Пагинатор для вывода запрошенного количества страниц"""
+    """
+    Пагинатор для вывода запрошенного количества страниц.
+    Если в запросе есть параметр cursor, а у представления задан
+    cursor_ordering, страница выбирается по ключу сортировки (keyset):
+    без OFFSET и без отдельного запроса COUNT.
+    Пустой cursor означает первую страницу. Запрос со своей сортировкой
+    (поиск по релевантности) курсором не листается: ответ 400, как
+    и на повреждённый курсор.
+    """
 
     page_size = 6
     page_size_query_param = 'limit'
     max_page_size = 15
+    cursor_query_param = 'cursor'
+    invalid_cursor_message = 'Неверный курсор.'
+    ordered_queryset_message = (
+        'Курсор нельзя сочетать с сортировкой запроса, например с поиском.'
+    )
+
+    def paginate_queryset(self, queryset, request, view=None):
+        self.ordering = getattr(view, 'cursor_ordering', None)
+        self.cursor_mode = bool(
+            self.ordering and self.cursor_query_param in request.query_params
+        )
+        if not self.cursor_mode:
+            return super().paginate_queryset(queryset, request, view)
+
+        if queryset.query.order_by:
+            raise ParseError(self.ordered_queryset_message)
+        self.request = request
+        page_size = self.get_page_size(request)
+        queryset = queryset.order_by(*self.ordering)
+        position = self.decode_cursor(request)
+        if position is not None:
+            try:
+                queryset = queryset.filter(self.get_position_filter(position))
+            except (TypeError, ValueError, ValidationError):
+                raise ParseError(self.invalid_cursor_message)
+        results = list(queryset[: page_size + 1])
+        self.has_next = len(results) > page_size
+        self.page = results[:page_size]
+        return self.page
+
+    def get_paginated_response(self, data):
+        if not self.cursor_mode:
+            return super().get_paginated_response(data)
+        return Response({'next': self.get_next_cursor_link(), 'results': data})
+
+    def get_fields(self):
+        """Поля ключа сортировки и направление: (поле, по убыванию)"""
+        return [
+            (field.lstrip('-'), field.startswith('-'))
+            for field in self.ordering
+        ]
+
+    def get_position_filter(self, position):
+        """Условие «строго после position» в порядке cursor_ordering"""
+        fields = self.get_fields()
+        if len(position) != len(fields):
+            raise ValueError(position)
+        condition = Q()
+        for index, (field, descending) in enumerate(fields):
+            lookup = 'lt' if descending else 'gt'
+            step = Q(**{f'{field}__{lookup}': position[index]})
+            for (previous, _), value in zip(fields[:index], position):
+                step &= Q(**{previous: value})
+            condition |= step
+        return condition
+
+    def decode_cursor(self, request):
+        cursor = request.query_params.get(self.cursor_query_param)
+        if not cursor:
+            return None
+        try:
+            position = json.loads(
+                base64.urlsafe_b64decode(cursor.encode('ascii'))
+            )
+        except (binascii.Error, UnicodeError, ValueError):
+            raise ParseError(self.invalid_cursor_message)
+        if not isinstance(position, list):
+            raise ParseError(self.invalid_cursor_message)
+        return position
+
+    def encode_cursor(self, obj):
+        position = []
+        for field, _ in self.get_fields():
+            value = getattr(obj, field)
+            if hasattr(value, 'isoformat'):
+                value = value.isoformat()
+            position.append(value)
+        return base64.urlsafe_b64encode(
+            json.dumps(position).encode('utf-8')
+        ).decode('ascii')
+
+    def get_next_cursor_link(self):
+        if not self.has_next:
+            return None
+        return replace_query_param(
+            self.request.build_absolute_uri(),
+            self.cursor_query_param,
+            self.encode_cursor(self.page[-1]),
+        )
@@ -0,0 +1,265 @@
+"""
+Планы запросов RecipeFilter: EXPLAIN для каждого сочетания фильтров,
+поиск полных просмотров таблиц и сортировок, подсказки по индексам
+из таблиц этих строк плана и условий и сортировки самого запроса.
+"""
+import re
+from collections import namedtuple
+from itertools import combinations
+
+from django.apps import apps
+from django.contrib.auth import get_user_model
+from django.db import connection
+from django.db.models.expressions import Col
+from django.db.models.lookups import Lookup
+from django.db.models.sql import Query
+from django.db.models.sql.where import WhereNode
+from recipes.models import Recipe, Tag
+from rest_framework.test import APIRequestFactory, force_authenticate
+
+from .filters import RecipeFilter
+
+User = get_user_model()
+
+PAGE_SIZE = 6
+ORDERING = ("-pub_date", "-id")
+FILTERS = ("author", "tags", "is_favorited", "is_in_shopping_cart", "search")
+
+# (регулярное выражение, вид проблемы, только при фильтрах)
+PROBLEMS = {
+    "postgresql": (
+        (
+            re.compile(r"Seq Scan on (?P<table>\w+)"),
+            "полный просмотр",
+            False,
+        ),
+        # маска тегов проверяется по строкам, а не по recipe_tag_bits_gin
+        (
+            re.compile(r"^Filter: .*recipe_tag_bits\("),
+            "проверка маски тегов",
+            True,
+        ),
+        (
+            re.compile(r"^(?:->\s+)?(?:Incremental )?Sort\b"),
+            "сортировка",
+            False,
+        ),
+    ),
+    "sqlite": (
+        (
+            re.compile(r"\bSCAN (?P<table>\w+)\b(?! USING| VIRTUAL TABLE)"),
+            "полный просмотр",
+            False,
+        ),
+        # просмотр всего индекса по дате с отбором строк по фильтру
+        (
+            re.compile(r"\bSCAN (?P<table>\w+) USING INDEX"),
+            "просмотр индекса",
+            True,
+        ),
+        (re.compile(r"USE TEMP B-TREE FOR ORDER BY"), "сортировка", False),
+    ),
+}
+# сортировка по релевантности при поиске ожидаема; маска тегов
+# в SQLite не индексируется, такой просмотр отчёт показывает
+EXPECTED = {"search": "сортировка"}
+
+# столбцы условий, под которые подбирается индекс
+EQUALITY_LOOKUPS = ("exact", "in")
+
+PlanReport = namedtuple(
+    "PlanReport", ("params", "plan", "problems", "query")
+)
+# table — таблица из строки плана; для сортировки и проверки маски
+# тегов это основная таблица запроса
+Problem = namedtuple("Problem", ("kind", "line", "table"))
+
+
+def get_filter_params(user):
+    """Значения фильтров для заполненной базы"""
+    author = (
+        Recipe.objects.exclude(author=user)
+        .values_list("author_id", flat=True)
+        .first()
+    )
+    slugs = list(Tag.objects.order_by("id").values_list("slug", flat=True))
+    word = Recipe.objects.values_list("name", flat=True).first().split()[0]
+    return {
+        "author": [str(author)],
+        "tags": slugs[:2],
+        "is_favorited": ["1"],
+        "is_in_shopping_cart": ["1"],
+        "search": [word],
+    }
+
+
+def get_combinations():
+    for size in range(len(FILTERS) + 1):
+        yield from combinations(FILTERS, size)
+
+
+def get_queryset(user, params):
+    """Запрос первой страницы списка рецептов, как в RecipesViewSet"""
+    request = APIRequestFactory().get("/api/recipes/", params)
+    force_authenticate(request, user)
+    request.user = user
+    queryset = RecipeFilter(
+        request.GET,
+        queryset=Recipe.objects.all(),
+        request=request,
+    ).qs
+    if "search" not in params:
+        queryset = queryset.order_by(*ORDERING)
+    return queryset[:PAGE_SIZE]
+
+
+def find_problems(plan, vendor, params, table):
+    """Строки плана с полными просмотрами и сортировками"""
+    expected = {EXPECTED[name] for name in params if name in EXPECTED}
+    problems = []
+    for line in plan.splitlines():
+        line = line.strip()
+        for pattern, kind, filtered_only in PROBLEMS.get(vendor, ()):
+            if filtered_only and not params or kind in expected:
+                continue
+            match = pattern.search(line)
+            if match:
+                problems.append(
+                    Problem(kind, line, match.groupdict().get("table", table))
+                )
+    return problems
+
+
+def explain_filters(user=None):
+    """EXPLAIN для каждого сочетания фильтров RecipeFilter"""
+    user = user or User.objects.order_by("id").first()
+    values = get_filter_params(user)
+    reports = []
+    for names in get_combinations():
+        params = {name: values[name] for name in names}
+        queryset = get_queryset(user, params)
+        plan = queryset.explain()
+        problems = find_problems(
+            plan, connection.vendor, params, Recipe._meta.db_table
+        )
+        reports.append(PlanReport(params, plan, problems, queryset.query))
+    return reports
+
+
+def get_filter_columns(where, columns=None):
+    """
+    Столбцы условий равенства и IN по таблицам {таблица: [столбцы]},
+    включая подзапросы. Условие IN с подзапросом — это соединение:
+    его столбец в индекс не берётся, берутся условия подзапроса.
+    Сравнение с выражением (поисковый запрос к tsvector) B-tree
+    индексом не ускоряется и тоже пропускается.
+    """
+    columns = {} if columns is None else columns
+    for child in where.children:
+        if isinstance(child, WhereNode):
+            get_filter_columns(child, columns)
+        elif isinstance(getattr(child, "rhs", None), Query):
+            get_filter_columns(child.rhs.where, columns)
+        elif isinstance(getattr(child, "query", None), Query):
+            # Exists и Subquery
+            get_filter_columns(child.query.where, columns)
+        elif (
+            isinstance(child, Lookup)
+            and isinstance(child.lhs, Col)
+            and child.lookup_name in EQUALITY_LOOKUPS
+            and not hasattr(child.rhs, "resolve_expression")
+        ):
+            field = child.lhs.target
+            table = columns.setdefault(field.model._meta.db_table, [])
+            if field.column not in table:
+                table.append(field.column)
+    return columns
+
+
+def get_order_fields(query):
+    """Поля сортировки запроса с направлением: [(поле, по убыванию)]"""
+    meta = query.model._meta
+    fields = []
+    for name in query.order_by:
+        if not isinstance(name, str) or name.lstrip("-") in query.annotations:
+            # сортировка выражением, например по релевантности поиска
+            return []
+        fields.append((meta.get_field(name.lstrip("-")), name[0] == "-"))
+    return fields
+
+
+def suggest_index(query, table):
+    """
+    Индекс под строку плана: сначала столбцы условий равенства на её
+    таблице, затем столбцы сортировки, если сортируется эта таблица.
+    Первичный ключ не добавляется: он и так есть в каждом индексе
+    SQLite и уже упорядочивает строки с равными значениями.
+    Возвращает (таблица, столбцы, определение) или None.
+    """
+    models_by_table = {
+        model._meta.db_table: model
+        for model in apps.get_models(include_auto_created=True)
+    }
+    model = models_by_table.get(table)
+    if model is None:
+        return None
+    fields_by_column = {
+        field.column: field for field in model._meta.concrete_fields
+    }
+    fields = [
+        (fields_by_column[column], False)
+        for column in get_filter_columns(query.where).get(table, ())
+    ]
+    if table == query.model._meta.db_table:
+        fields += get_order_fields(query)
+    fields = [
+        (field, descending)
+        for field, descending in fields
+        if not field.primary_key
+    ]
+    if not fields:
+        return None
+    names = [
+        f"-{field.name}" if descending else field.name
+        for field, descending in fields
+    ]
+    name = "_".join(
+        [model._meta.model_name, *(field.name for field, _ in fields), "idx"]
+    )
+    # Django ограничивает имя индекса 30 символами
+    definition = (
+        f"models.Index(fields={tuple(names)!r}, name={name[:30]!r})"
+    ).replace("'", '"')
+    return table, tuple(field.column for field, _ in fields), definition
+
+
+def get_index_columns(table):
+    with connection.cursor() as cursor:
+        constraints = connection.introspection.get_constraints(cursor, table)
+    return [
+        tuple(constraint["columns"])
+        for constraint in constraints.values()
+        if constraint["index"] or constraint["unique"]
+    ]
+
+
+def advise_indexes(reports):
+    """
+    Индексы под найденные просмотры и сортировки, которых ещё нет:
+    для каждой строки плана столбцы берутся из самого запроса (условия
+    и сортировка таблицы из этой строки). Индекс с теми же первыми
+    столбцами считается подходящим.
+    """
+    advice = {}
+    for report in reports:
+        for problem in report.problems:
+            suggestion = suggest_index(report.query, problem.table)
+            if suggestion is None:
+                continue
+            table, columns, definition = suggestion
+            if not any(
+                index[: len(columns)] == columns
+                for index in get_index_columns(table)
+            ):
+                advice[table, columns] = definition
+    return [(table, definition) for (table, _), definition in advice.items()]
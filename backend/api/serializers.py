@@ -2,23 +2,32 @@
 from django.contrib.auth import get_user_model
 from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import transaction
+from django.db import IntegrityError, transaction
+from django.http import Http404
 from djoser.serializers import (PasswordSerializer, UserCreateSerializer,
                                 UserSerializer)
 from drf_extra_fields.fields import Base64ImageField
+from recipes.images import get_variant_urls
 from recipes.models import (Favorite, Ingredient, IngredientRecipe, Recipe,
-                            ShoppingCart, Tag)
+                            ShoppingCart, ShoppingListItem, Tag)
+from recipes.uploads import claim_upload, upload_exists
 from rest_framework import serializers
-from rest_framework.validators import UniqueTogetherValidator
+from rest_framework.settings import api_settings
 from users.models import Subscriptions
 
-from backend.settings import (MAX_AMOUNT, MAX_COOKING_TIME, MIN_AMOUNT,
-                              MIN_COOKING_TIME)
+from backend.settings import (BULK_RECIPES_LIMIT, MAX_AMOUNT,
+                              MAX_COOKING_TIME, MIN_AMOUNT, MIN_COOKING_TIME)
+
+from .membership import MembershipListSerializer, get_membership
+from .metrics import SerializerTimingMixin
 
 User = get_user_model()
 
+# SQLSTATE foreign_key_violation
+FOREIGN_KEY_VIOLATION = "23503"
+
 
-class CustomUserSerializer(UserSerializer):
+class CustomUserSerializer(SerializerTimingMixin, UserSerializer):
     """Сериализатор для CustomUser, выдача, добавлено поле is_subscribed"""
 
     is_subscribed = serializers.SerializerMethodField()
@@ -33,21 +42,22 @@ class CustomUserSerializer(UserSerializer):
             "last_name",
             "is_subscribed",
         )
+        list_serializer_class = MembershipListSerializer
+
+    def prime_membership(self, users):
+        get_membership(self.context).prime(
+            "subscriptions", [user.pk for user in users]
+        )
 
     def get_is_subscribed(self, obj):
         """
         Проверка подписки пользователей, проверяем подписан ли
         текущий пользователь на просматриваемого пользователя.
         """
-
-        user = self.context["request"].user
-        return (
-            user.is_authenticated
-            and user.subscriber.filter(author=obj).exists()
-        )
+        return get_membership(self.context).contains("subscriptions", obj.pk)
 
 
-class CustomUserCreateSerializer(UserCreateSerializer):
+class CustomUserCreateSerializer(SerializerTimingMixin, UserCreateSerializer):
     """Сериализатор для создания пользователей"""
 
     class Meta:
@@ -62,19 +72,22 @@ class CustomUserCreateSerializer(UserCreateSerializer):
         )
 
 
-class CustomPasswordSerializer(PasswordSerializer):
+class CustomPasswordSerializer(SerializerTimingMixin, PasswordSerializer):
     """Сериализатор для смены пароля"""
 
     current_password = serializers.CharField(required=True)
 
 
-class ShortRecipeSerializer(serializers.ModelSerializer):
+class ShortRecipeSerializer(
+    SerializerTimingMixin, serializers.ModelSerializer
+):
     """
     Сериализатор модели Recipe,
     укороченный набор полей для эндпоинтов: списка покупок и подписок.
     """
 
     image = Base64ImageField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -82,16 +95,23 @@ class ShortRecipeSerializer(serializers.ModelSerializer):
             "id",
             "name",
             "image",
+            "image_variants",
             "cooking_time",
         )
         read_only_fields = ("id", "name", "image", "cooking_time")
 
+    def get_image_variants(self, obj):
+        """Адреса уменьшенных копий изображения в JPEG и WebP"""
+        return get_variant_urls(
+            obj.image_variants, self.context.get("request")
+        )
+
 
 class UserSubscribeSerializer(CustomUserSerializer):
     """Сериализатор вывода авторов на которых подписан текущий пользователь"""
 
     recipes = serializers.SerializerMethodField()
-    recipes_count = serializers.SerializerMethodField()
+    recipes_count = serializers.ReadOnlyField()
 
     class Meta:
         model = User
@@ -118,6 +138,10 @@ class UserSubscribeSerializer(CustomUserSerializer):
 
     def get_recipes(self, obj):
         """Определение поля recipes, передача параметра recipes_limit"""
+        if hasattr(obj, "latest_recipes"):
+            return ShortRecipeSerializer(
+                obj.latest_recipes, many=True, context=self.context
+            ).data
         request = self.context.get("request")
         if request is not None:
             limit = request.GET.get("recipes_limit")
@@ -126,39 +150,83 @@ class UserSubscribeSerializer(CustomUserSerializer):
         recipes = obj.recipes.all()
         if limit:
             recipes = recipes[: int(limit)]
-        return ShortRecipeSerializer(recipes, many=True).data
+        return ShortRecipeSerializer(
+            recipes, many=True, context=self.context
+        ).data
+
+
+class UniqueCreateMixin:
+    """
+    Создание одним INSERT: повтор отсекает уникальное ограничение БД,
+    а не предварительная проверка exists(), а ссылка на несуществующий
+    объект даёт 404 по ограничению внешнего ключа. Другие ошибки
+    целостности не скрываются. Транзакция здесь внешняя: отложенная
+    проверка внешнего ключа срабатывает при её COMMIT.
+    """
 
-    def get_recipes_count(self, obj):
-        """Показывает общее кол-во рецептов у каждого автора"""
-        return obj.recipes.count()
+    unique_constraint = None
+    unique_message = None
+
+    def is_unique_violation(self, error):
+        diag = getattr(error.__cause__, "diag", None)
+        if diag is not None:
+            return diag.constraint_name == self.unique_constraint
+        # SQLite называет не ограничение, а его столбцы
+        model = self.Meta.model
+        constraint = next(
+            constraint
+            for constraint in model._meta.constraints
+            if constraint.name == self.unique_constraint
+        )
+        columns = ", ".join(
+            f"{model._meta.db_table}.{model._meta.get_field(field).column}"
+            for field in constraint.fields
+        )
+        return str(error) == f"UNIQUE constraint failed: {columns}"
+
+    @staticmethod
+    def is_foreign_key_violation(error):
+        pgcode = getattr(error.__cause__, "pgcode", None)
+        if pgcode is not None:
+            return pgcode == FOREIGN_KEY_VIOLATION
+        return str(error) == "FOREIGN KEY constraint failed"
+
+    def create(self, validated_data):
+        try:
+            with transaction.atomic():
+                return super().create(validated_data)
+        except IntegrityError as error:
+            if self.is_unique_violation(error):
+                raise serializers.ValidationError(
+                    {api_settings.NON_FIELD_ERRORS_KEY: [self.unique_message]}
+                )
+            if self.is_foreign_key_violation(error):
+                raise Http404
+            raise
 
 
-class SubscribeSerializer(serializers.ModelSerializer):
+class SubscribeSerializer(
+    SerializerTimingMixin, UniqueCreateMixin, serializers.ModelSerializer
+):
     """Управления подписками"""
 
+    unique_constraint = "unique_subscription"
+    unique_message = "Вы уже подписаны на этого автора!"
+
     class Meta:
         model = Subscriptions
         fields = ("user", "author")
-        validators = (
-            UniqueTogetherValidator(
-                queryset=Subscriptions.objects.all(),
-                fields=(
-                    "user",
-                    "author",
-                ),
-                message="Вы уже подписаны на этого автора!",
-            ),
-        )
+        read_only_fields = ("user", "author")
 
     def validate(self, data):
-        if data.get("user") == data.get("author"):
+        if self.context["user"] == self.context["author"]:
             raise serializers.ValidationError(
                 "Нельзя подписаться на самого себя!"
             )
         return data
 
 
-class TagSerializer(serializers.ModelSerializer):
+class TagSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     """Сериалайзер для получения тега или списка тегов"""
 
     class Meta:
@@ -166,7 +234,7 @@ class TagSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "color", "slug")
 
 
-class IngredientSerializer(serializers.ModelSerializer):
+class IngredientSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     """Сериалайзер для получения ингредиента или списка ингредиентов"""
 
     class Meta:
@@ -174,7 +242,9 @@ class IngredientSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "measurement_unit")
 
 
-class IngredientInRecipeSerializer(serializers.ModelSerializer):
+class IngredientInRecipeSerializer(
+    SerializerTimingMixin, serializers.ModelSerializer
+):
     """Сериализатор для отображения ингредиентов в рецепте"""
 
     id = serializers.IntegerField(
@@ -192,7 +262,9 @@ class IngredientInRecipeSerializer(serializers.ModelSerializer):
         fields = ("id", "name", "measurement_unit", "amount")
 
 
-class AddIngredientToRecipeSerializer(serializers.ModelSerializer):
+class AddIngredientToRecipeSerializer(
+    SerializerTimingMixin, serializers.ModelSerializer
+):
     """Сериалайзер для добавления ингредиентов в рецепт"""
 
     id = serializers.PrimaryKeyRelatedField(queryset=Ingredient.objects.all())
@@ -214,7 +286,7 @@ class AddIngredientToRecipeSerializer(serializers.ModelSerializer):
         fields = ("id", "amount")
 
 
-class GetRecipeSerializer(serializers.ModelSerializer):
+class GetRecipeSerializer(SerializerTimingMixin, serializers.ModelSerializer):
     """Сериалайзер для получения рецепта или списка рецептов"""
 
     tags = TagSerializer(read_only=True, many=True)
@@ -223,6 +295,7 @@ class GetRecipeSerializer(serializers.ModelSerializer):
     ingredients = serializers.SerializerMethodField()
     is_favorited = serializers.SerializerMethodField()
     is_in_shopping_cart = serializers.SerializerMethodField()
+    image_variants = serializers.SerializerMethodField()
 
     class Meta:
         model = Recipe
@@ -235,29 +308,43 @@ class GetRecipeSerializer(serializers.ModelSerializer):
             "is_in_shopping_cart",
             "name",
             "image",
+            "image_variants",
             "text",
             "cooking_time",
         )
+        list_serializer_class = MembershipListSerializer
+
+    def prime_membership(self, recipes):
+        """Избранное, корзина и подписки на авторов для всех рецептов"""
+        membership = get_membership(self.context)
+        recipe_ids = [recipe.pk for recipe in recipes]
+        membership.prime("favorites", recipe_ids)
+        membership.prime("shopping_cart", recipe_ids)
+        membership.prime(
+            "subscriptions", [recipe.author_id for recipe in recipes]
+        )
+
+    def to_representation(self, instance):
+        """Отдельный рецепт загружает все связи сразу, список — заранее"""
+        self.prime_membership((instance,))
+        return super().to_representation(instance)
+
+    def get_image_variants(self, obj):
+        """Адреса уменьшенных копий изображения в JPEG и WebP"""
+        return get_variant_urls(
+            obj.image_variants, self.context.get("request")
+        )
 
     def get_ingredients(self, obj):
-        ingredients = IngredientRecipe.objects.filter(recipe=obj)
-        return IngredientInRecipeSerializer(ingredients, many=True).data
+        return IngredientInRecipeSerializer(
+            obj.ingredient.all(), many=True
+        ).data
 
     def get_is_favorited(self, obj):
-        request = self.context.get("request")
-        if request.user:
-            return (
-                (request is not None) and request.user.is_authenticated
-            ) and Favorite.objects.filter(
-                favorite_recipe=obj, user=request.user
-            ).exists()
+        return get_membership(self.context).contains("favorites", obj.pk)
 
     def get_is_in_shopping_cart(self, obj):
-        request = self.context.get("request")
-        if request is None or request.user.is_anonymous:
-            return False
-        user = request.user
-        return ShoppingCart.objects.filter(recipe=obj, user=user).exists()
+        return get_membership(self.context).contains("shopping_cart", obj.pk)
 
 
 class CreateRecipeSerializer(GetRecipeSerializer):
@@ -279,7 +366,8 @@ class CreateRecipeSerializer(GetRecipeSerializer):
     tags = serializers.PrimaryKeyRelatedField(
         queryset=Tag.objects.all(), many=True
     )
-    image = Base64ImageField(max_length=None, use_url=True)
+    image = Base64ImageField(max_length=None, use_url=True, required=False)
+    image_token = serializers.CharField(write_only=True, required=False)
 
     class Meta:
         model = Recipe
@@ -290,6 +378,7 @@ class CreateRecipeSerializer(GetRecipeSerializer):
             "ingredients",
             "name",
             "image",
+            "image_token",
             "text",
             "cooking_time",
         )
@@ -304,6 +393,15 @@ class CreateRecipeSerializer(GetRecipeSerializer):
             and Recipe.objects.filter(author=user, name=name).exists()
         ):
             raise ValidationError("Рецепт с таким именем уже существует!")
+        if "image" in data and "image_token" in data:
+            raise ValidationError("Передайте либо image, либо image_token!")
+        if request.method == "POST" and not (
+            data.get("image") or data.get("image_token")
+        ):
+            raise ValidationError("Необходимо изображение рецепта!")
+        token = data.get("image_token")
+        if token is not None and not upload_exists(user.id, token):
+            raise ValidationError("Загруженное изображение не найдено!")
 
         ingredients = data["ingredients"]
         if not ingredients:
@@ -329,12 +427,66 @@ class CreateRecipeSerializer(GetRecipeSerializer):
             ]
         )
 
+    def update_ingredients(self, ingredients, recipe):
+        """
+        Изменение ингредиентов рецепта разницей: вставка новых,
+        обновление изменившихся количеств и удаление лишних строк.
+        Массовые вставка и обновление не шлют сигналов, поэтому их
+        разница для списков покупок передаётся явно.
+        """
+        current = {
+            row.ingredient_id: row
+            for row in IngredientRecipe.objects.filter(recipe=recipe)
+        }
+        amounts = {
+            ingredient["id"].id: ingredient["amount"]
+            for ingredient in ingredients
+        }
+        removed = [
+            row.pk
+            for ingredient_id, row in current.items()
+            if ingredient_id not in amounts
+        ]
+        deltas = {}
+        changed = []
+        for ingredient_id, row in current.items():
+            amount = amounts.get(ingredient_id)
+            if amount is not None and amount != row.amount:
+                deltas[ingredient_id] = amount - row.amount
+                row.amount = amount
+                changed.append(row)
+        added = [
+            IngredientRecipe(
+                recipe=recipe, ingredient_id=ingredient_id, amount=amount
+            )
+            for ingredient_id, amount in amounts.items()
+            if ingredient_id not in current
+        ]
+        deltas.update((row.ingredient_id, row.amount) for row in added)
+        if removed:
+            # delete() шлёт post_delete для каждой строки
+            IngredientRecipe.objects.filter(pk__in=removed).delete()
+        if changed:
+            IngredientRecipe.objects.bulk_update(changed, ("amount",))
+        if added:
+            IngredientRecipe.objects.bulk_create(added)
+        ShoppingListItem.objects.change_amounts_on_commit(recipe.id, deltas)
+
+    def claim_image(self, validated_data):
+        """Изображение, загруженное заранее, подставляется по токену"""
+        token = validated_data.pop("image_token", None)
+        if token is not None:
+            validated_data["image"] = claim_upload(
+                self.context.get("request").user.id, token
+            )
+
     @transaction.atomic
     def create(self, validated_data):
         """Создание рецепта"""
         ingredients = validated_data.pop("ingredients")
         tags = validated_data.pop("tags")
         user = self.context.get("request").user
+        self.claim_image(validated_data)
         recipe = Recipe.objects.create(author=user, **validated_data)
         recipe.tags.set(tags)
         self.create_ingredients(ingredients, recipe)
@@ -349,26 +501,33 @@ class CreateRecipeSerializer(GetRecipeSerializer):
             "cooking_time",
             instance.cooking_time,
         )
+        self.claim_image(validated_data)
         instance.image = validated_data.pop("image", instance.image)
         ingredients = validated_data.pop("ingredients")
-        IngredientRecipe.objects.filter(recipe=instance).delete()
-        self.create_ingredients(ingredients, instance)
+        self.update_ingredients(ingredients, instance)
         tags = validated_data.pop("tags")
+        # set() сам сравнивает с текущими связями и меняет только разницу
         instance.tags.set(tags)
         instance.text = validated_data.pop("text", instance.text)
         return super().update(instance, validated_data)
 
     def to_representation(self, instance):
         """ "Отображение рецепта"""
-        serializer = GetRecipeSerializer(
-            instance, context={"request": self.context.get("request")}
-        )
-        return serializer.data
+        request = self.context.get("request")
+        instance = Recipe.objects.with_related().get(pk=instance.pk)
+        return GetRecipeSerializer(
+            instance, context={"request": request}
+        ).data
 
 
-class FavoriteSerializer(serializers.ModelSerializer):
+class FavoriteSerializer(
+    SerializerTimingMixin, UniqueCreateMixin, serializers.ModelSerializer
+):
     """Сериализатор для добавления и удаления избранных рецептов"""
 
+    unique_constraint = "unique_user_favorite_recipe"
+    unique_message = "Данный рецепт уже в избранном!"
+
     id = serializers.IntegerField(source="favorite_recipe.id", read_only=True)
     name = serializers.CharField(source="favorite_recipe.name", read_only=True)
     image = Base64ImageField(
@@ -385,20 +544,15 @@ class FavoriteSerializer(serializers.ModelSerializer):
         model = Favorite
         fields = ("id", "name", "image", "cooking_time")
 
-    def validate(self, data):
-        """Проверка валидации"""
-        user = User.objects.get(id=self.context["request"].user.id)
-        favorite_recipe = Recipe.objects.get(id=self.context["recipe_id"])
-        if Favorite.objects.filter(
-            user=user, favorite_recipe=favorite_recipe
-        ).exists():
-            raise serializers.ValidationError("Данный рецепт уже в избранном!")
-        return data
-
 
-class ShoppingCartSerializer(serializers.ModelSerializer):
+class ShoppingCartSerializer(
+    SerializerTimingMixin, UniqueCreateMixin, serializers.ModelSerializer
+):
     """Сериализатор для добавления и удаления рецептов в список покупок"""
 
+    unique_constraint = "unique_shopping_cart_recipe"
+    unique_message = "Рецепт уже добавлен в список покупок."
+
     id = serializers.IntegerField(source="recipe.id", read_only=True)
     name = serializers.CharField(source="recipe.name", read_only=True)
     image = Base64ImageField(
@@ -412,12 +566,12 @@ class ShoppingCartSerializer(serializers.ModelSerializer):
         model = ShoppingCart
         fields = ("id", "name", "image", "cooking_time")
 
-    def validate(self, data):
-        """Валидация"""
-        user = User.objects.get(id=self.context["request"].user.id)
-        recipe = Recipe.objects.get(id=self.context["recipe_id"])
-        if ShoppingCart.objects.filter(user=user, recipe=recipe).exists():
-            raise serializers.ValidationError(
-                "Рецепт уже добавлен в список покупок."
-            )
-        return data
+
+class BulkRecipesSerializer(SerializerTimingMixin, serializers.Serializer):
+    """Список id рецептов для массового добавления и удаления"""
+
+    recipes = serializers.ListField(
+        child=serializers.IntegerField(min_value=1),
+        allow_empty=False,
+        max_length=BULK_RECIPES_LIMIT,
+    )
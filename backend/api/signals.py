@@ -0,0 +1,24 @@
+"""Сигналы для кэша аутентификации"""
+from django.contrib.auth import get_user_model
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+from rest_framework.authtoken.models import Token
+
+from .authentication import forget_tokens
+
+User = get_user_model()
+
+
+@receiver(post_delete, sender=Token)
+def forget_deleted_token(sender, instance, **kwargs):
+    """Выход из системы: токен сразу перестаёт действовать"""
+    forget_tokens(instance.key)
+
+
+@receiver(post_save, sender=User)
+def forget_user_tokens(sender, instance, created, **kwargs):
+    """Смена пароля, блокировка и правка профиля сбрасывают кэш"""
+    if not created:
+        forget_tokens(
+            *Token.objects.filter(user=instance).values_list("key", flat=True)
+        )
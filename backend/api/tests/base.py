@@ -0,0 +1,83 @@
+"""Общие данные и клиенты для тестов API"""
+import shutil
+import tempfile
+from io import BytesIO
+
+from django.contrib.auth import get_user_model
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.test import override_settings
+from PIL import Image
+from recipes.models import Ingredient, IngredientRecipe, Recipe, Tag
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APIClient
+
+User = get_user_model()
+
+
+def make_image(name="image.png", size=(64, 48)):
+    buffer = BytesIO()
+    Image.new("RGB", size, "red").save(buffer, "PNG")
+    return SimpleUploadedFile(name, buffer.getvalue(), "image/png")
+
+
+def create_user(username):
+    return User.objects.create_user(
+        email=f"{username}@example.com",
+        username=username,
+        first_name="Имя",
+        last_name="Фамилия",
+        password="Pass-12345",
+    )
+
+
+def get_client(user=None):
+    """Клиент с токеном пользователя; без пользователя — анонимный"""
+    client = APIClient()
+    if user is not None:
+        token, _ = Token.objects.get_or_create(user=user)
+        client.credentials(HTTP_AUTHORIZATION=f"Token {token.key}")
+    return client
+
+
+def create_recipe(author, ingredients=(), tags=(), name="Рецепт"):
+    """Рецепт через ORM; ingredients — пары (ингредиент, количество)"""
+    recipe = Recipe.objects.create(
+        author=author,
+        name=name,
+        text="Описание",
+        cooking_time=10,
+        image=make_image(),
+    )
+    recipe.tags.set(tags)
+    for ingredient, amount in ingredients:
+        IngredientRecipe.objects.create(
+            recipe=recipe, ingredient=ingredient, amount=amount
+        )
+    return recipe
+
+
+def create_tag(slug, color):
+    return Tag.objects.create(name=slug, color=color, slug=slug)
+
+
+def create_ingredient(name, measurement_unit="г"):
+    return Ingredient.objects.create(
+        name=name, measurement_unit=measurement_unit
+    )
+
+
+class MediaRootMixin:
+    """Файлы тестов пишутся во временный MEDIA_ROOT"""
+
+    @classmethod
+    def setUpClass(cls):
+        cls.media_root = tempfile.mkdtemp()
+        cls.media_settings = override_settings(MEDIA_ROOT=cls.media_root)
+        cls.media_settings.enable()
+        super().setUpClass()
+
+    @classmethod
+    def tearDownClass(cls):
+        super().tearDownClass()
+        cls.media_settings.disable()
+        shutil.rmtree(cls.media_root, ignore_errors=True)
@@ -0,0 +1,74 @@
+"""Одинаковые ответы асинхронных и синхронных представлений"""
+from asgiref.sync import async_to_sync
+from django.test import AsyncClient, override_settings
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITransactionTestCase
+
+from .base import (MediaRootMixin, create_ingredient, create_recipe,
+                   create_tag, create_user, get_client)
+
+
+class AsgiParityTest(MediaRootMixin, APITransactionTestCase):
+    """
+    Под backend.urls_asgi статусы ответов те же, что под backend.urls.
+    Пул потоков работает со своими соединениями, поэтому данные
+    фиксируются (TransactionTestCase), а не живут в транзакции теста.
+    """
+
+    def setUp(self):
+        self.user = create_user("cook")
+        tag = create_tag("breakfast", "#E26C2D")
+        ingredient = create_ingredient("мука")
+        self.recipe = create_recipe(
+            self.user, ingredients=((ingredient, 100),), tags=(tag,)
+        )
+        self.paths = (
+            "/api/recipes/",
+            f"/api/recipes/{self.recipe.id}/",
+            "/api/recipes/download_shopping_cart/",
+            "/api/ingredients/",
+            "/api/tags/",
+            f"/api/tags/{tag.id}/",
+            "/api/users/subscriptions/",
+        )
+
+    def get_asgi_status(self, method, path, user=None):
+        headers = {}
+        if user is not None:
+            token, _ = Token.objects.get_or_create(user=user)
+            headers["authorization"] = f"Token {token.key}"
+        client = AsyncClient(raise_request_exception=False)
+
+        async def request():
+            return await getattr(client, method)(path, **headers)
+
+        with override_settings(ROOT_URLCONF="backend.urls_asgi"):
+            return async_to_sync(request)().status_code
+
+    def assert_same_status(self, method, path, user=None):
+        expected = getattr(get_client(user), method)(path).status_code
+        self.assertEqual(
+            self.get_asgi_status(method, path, user),
+            expected,
+            f"{method.upper()} {path}",
+        )
+
+    def test_anonymous_reads(self):
+        for path in self.paths:
+            with self.subTest(path=path):
+                self.assert_same_status("get", path)
+
+    def test_authenticated_reads(self):
+        for path in self.paths:
+            with self.subTest(path=path):
+                self.assert_same_status("get", path, self.user)
+
+    def test_anonymous_download_shopping_cart_is_unauthorized(self):
+        path = "/api/recipes/download_shopping_cart/"
+        self.assertEqual(self.get_asgi_status("get", path), 401)
+
+    def test_anonymous_writes(self):
+        for path in self.paths[:2]:
+            for method in ("post", "delete"):
+                with self.subTest(method=method, path=path):
+                    self.assert_same_status(method, path)
@@ -0,0 +1,87 @@
+"""Кэш токенов и немедленный отзыв токена во всех воркерах"""
+import shutil
+import tempfile
+
+from django.conf import settings
+from django.core.cache.backends.filebased import FileBasedCache
+from django.db import connection
+from django.test import override_settings
+from django.test.utils import CaptureQueriesContext
+from rest_framework.authtoken.models import Token
+from rest_framework.test import APITestCase
+
+from api.authentication import get_cache, get_cache_key
+
+from .base import create_user, get_client
+
+ME = "/api/users/me/"
+
+
+class TokenCacheTest(APITestCase):
+    def setUp(self):
+        self.cache_dir = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.cache_dir, ignore_errors=True)
+        cache_settings = override_settings(
+            CACHES={
+                **settings.CACHES,
+                settings.TOKEN_CACHE_ALIAS: {
+                    "BACKEND": "django.core.cache.backends.filebased."
+                    "FileBasedCache",
+                    "LOCATION": self.cache_dir,
+                },
+            }
+        )
+        cache_settings.enable()
+        self.addCleanup(cache_settings.disable)
+        self.user = create_user("cook")
+        self.client = get_client(self.user)
+        self.key = Token.objects.get(user=self.user).key
+        # тот же кэш глазами другого воркера
+        self.other_worker = FileBasedCache(self.cache_dir, {})
+
+    def test_second_request_skips_token_query(self):
+        self.assertEqual(self.client.get(ME).status_code, 200)
+        self.assertIsNotNone(self.other_worker.get(get_cache_key(self.key)))
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get(ME).status_code, 200)
+        self.assertFalse(
+            any(
+                Token._meta.db_table in query["sql"]
+                for query in queries.captured_queries
+            )
+        )
+
+    def test_logout_revokes_token_everywhere(self):
+        self.client.get(ME)
+        response = self.client.post("/api/auth/token/logout/")
+        self.assertEqual(response.status_code, 204)
+        self.assertIsNone(self.other_worker.get(get_cache_key(self.key)))
+        self.assertEqual(self.client.get(ME).status_code, 401)
+
+    def test_password_change_drops_cached_user(self):
+        self.client.get(ME)
+        response = self.client.post(
+            "/api/users/set_password/",
+            {"current_password": "Pass-12345", "new_password": "New-pass-1"},
+        )
+        self.assertEqual(response.status_code, 204, response.data)
+        self.assertIsNone(self.other_worker.get(get_cache_key(self.key)))
+
+    def test_deactivated_user_is_rejected(self):
+        self.client.get(ME)
+        self.user.is_active = False
+        self.user.save()
+        self.assertEqual(self.client.get(ME).status_code, 401)
+
+    def test_process_local_cache_is_not_used(self):
+        with override_settings(
+            CACHES={
+                **settings.CACHES,
+                settings.TOKEN_CACHE_ALIAS: {
+                    "BACKEND": "django.core.cache.backends.locmem."
+                    "LocMemCache",
+                },
+            }
+        ):
+            self.assertIsNone(get_cache())
+            self.assertEqual(self.client.get(ME).status_code, 200)
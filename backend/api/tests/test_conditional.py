@@ -0,0 +1,49 @@
+"""Условные GET-запросы справочников: ETag, Last-Modified и 304"""
+from rest_framework.test import APITestCase
+
+from .base import create_ingredient, create_tag
+
+
+class ConditionalGetTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.tag = create_tag("breakfast", "#E26C2D")
+        cls.ingredient = create_ingredient("мука")
+
+    def test_matching_etag_gives_304(self):
+        for url in (
+            "/api/tags/",
+            f"/api/tags/{self.tag.id}/",
+            "/api/ingredients/",
+            f"/api/ingredients/{self.ingredient.id}/",
+        ):
+            with self.subTest(url=url):
+                response = self.client.get(url)
+                self.assertEqual(response.status_code, 200)
+                etag = response["ETag"]
+                response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+                self.assertEqual(response.status_code, 304)
+                self.assertEqual(response["ETag"], etag)
+                self.assertFalse(response.content)
+
+    def test_last_modified_gives_304(self):
+        response = self.client.get("/api/tags/")
+        response = self.client.get(
+            "/api/tags/",
+            HTTP_IF_MODIFIED_SINCE=response["Last-Modified"],
+        )
+        self.assertEqual(response.status_code, 304)
+
+    def test_304_skips_queryset(self):
+        etag = self.client.get("/api/tags/")["ETag"]
+        with self.assertNumQueries(1):
+            self.client.get("/api/tags/", HTTP_IF_NONE_MATCH=etag)
+
+    def test_change_gives_new_etag(self):
+        etag = self.client.get("/api/tags/")["ETag"]
+        with self.captureOnCommitCallbacks(execute=True):
+            create_tag("dinner", "#8775D2")
+        response = self.client.get("/api/tags/", HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response["ETag"], etag)
+        self.assertEqual(len(response.data), 2)
@@ -0,0 +1,83 @@
+"""Денормализованные счётчики рецептов и пользователей"""
+from io import StringIO
+
+from django.core.management import call_command
+from recipes.models import Recipe
+from rest_framework.test import APITestCase
+from users.models import User
+
+from .base import MediaRootMixin, create_recipe, create_user, get_client
+
+
+class CountersTest(MediaRootMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user("author")
+        cls.reader = create_user("reader")
+        cls.recipe = create_recipe(cls.author)
+        cls.other = create_recipe(cls.author, name="Другой рецепт")
+
+    def setUp(self):
+        self.client = get_client(self.reader)
+
+    def assert_counters(self, recipe, favorites, cart):
+        recipe = Recipe.objects.get(pk=recipe.pk)
+        self.assertEqual(recipe.favorites_count, favorites)
+        self.assertEqual(recipe.shopping_cart_count, cart)
+
+    def test_recipes_count(self):
+        self.assertEqual(User.objects.get(pk=self.author.pk).recipes_count, 2)
+        self.other.delete()
+        self.assertEqual(User.objects.get(pk=self.author.pk).recipes_count, 1)
+
+    def test_favorite_and_cart(self):
+        for url in ("favorite", "shopping_cart"):
+            path = f"/api/recipes/{self.recipe.id}/{url}/"
+            self.assertEqual(self.client.post(path).status_code, 201)
+        self.assert_counters(self.recipe, 1, 1)
+        self.client.post(f"/api/recipes/{self.recipe.id}/favorite/")
+        self.assert_counters(self.recipe, 1, 1)
+        for url in ("favorite", "shopping_cart"):
+            self.client.delete(f"/api/recipes/{self.recipe.id}/{url}/")
+        self.assert_counters(self.recipe, 0, 0)
+
+    def test_bulk_changes(self):
+        ids = [self.recipe.id, self.other.id]
+        self.client.post(
+            "/api/recipes/favorite/", {"recipes": ids[:1]}, format="json"
+        )
+        response = self.client.post(
+            "/api/recipes/favorite/", {"recipes": ids}, format="json"
+        )
+        self.assertEqual(
+            response.data["recipes"],
+            [
+                {"id": self.recipe.id, "status": "exists"},
+                {"id": self.other.id, "status": "added"},
+            ],
+        )
+        self.assert_counters(self.recipe, 1, 0)
+        self.assert_counters(self.other, 1, 0)
+        self.client.delete(
+            "/api/recipes/favorite/", {"recipes": ids}, format="json"
+        )
+        self.assert_counters(self.recipe, 0, 0)
+        self.assert_counters(self.other, 0, 0)
+
+    def test_followers_count(self):
+        self.client.post(f"/api/users/{self.author.id}/subscribe/")
+        self.assertEqual(
+            User.objects.get(pk=self.author.pk).followers_count, 1
+        )
+        self.client.delete(f"/api/users/{self.author.id}/subscribe/")
+        self.assertEqual(
+            User.objects.get(pk=self.author.pk).followers_count, 0
+        )
+
+    def test_recount_fixes_drift(self):
+        self.client.post(f"/api/recipes/{self.recipe.id}/favorite/")
+        Recipe.objects.filter(pk=self.recipe.pk).update(favorites_count=7)
+        User.objects.filter(pk=self.author.pk).update(recipes_count=0)
+        call_command("recount_counters", stdout=StringIO())
+        self.assert_counters(self.recipe, 1, 0)
+        self.assertEqual(User.objects.get(pk=self.author.pk).recipes_count, 2)
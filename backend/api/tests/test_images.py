@@ -0,0 +1,72 @@
+"""Копии изображений рецептов и их перечень в Recipe.image_variants"""
+import os
+from unittest import mock
+
+from django.conf import settings
+from django.core.files.storage import FileSystemStorage, default_storage
+from recipes.models import Recipe
+from rest_framework.test import APITestCase
+
+from .base import MediaRootMixin, create_recipe, create_user, make_image
+
+
+class ImageVariantsTest(MediaRootMixin, APITestCase):
+    def setUp(self):
+        self.author = create_user("cook")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe = create_recipe(self.author)
+        self.recipe.refresh_from_db()
+
+    def test_variants_listed_after_commit(self):
+        variants = self.recipe.image_variants
+        self.assertEqual(set(variants), set(settings.RECIPE_IMAGE_VARIANTS))
+        for names in variants.values():
+            self.assertEqual(set(names), {"jpeg", "webp"})
+            for name in names.values():
+                self.assertTrue(default_storage.exists(name))
+
+    def test_urls_need_no_storage_calls(self):
+        with mock.patch.object(
+            FileSystemStorage, "exists", side_effect=AssertionError
+        ):
+            response = self.client.get(f"/api/recipes/{self.recipe.id}/")
+        self.assertEqual(response.status_code, 200)
+        card = response.data["image_variants"]["card"]["webp"]
+        self.assertTrue(card.endswith(".webp"))
+
+    def test_save_without_new_image_keeps_variants(self):
+        with mock.patch("recipes.signals.build_variants") as build:
+            with self.captureOnCommitCallbacks(execute=True):
+                self.recipe.name = "Новое название"
+                self.recipe.save()
+        build.assert_not_called()
+
+    def test_new_image_replaces_variants(self):
+        old_names = [
+            name
+            for names in self.recipe.image_variants.values()
+            for name in names.values()
+        ]
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.image = make_image("other.png", (300, 200))
+            self.recipe.save()
+        recipe = Recipe.objects.get(pk=self.recipe.pk)
+        new_names = [
+            name
+            for names in recipe.image_variants.values()
+            for name in names.values()
+        ]
+        self.assertEqual(len(new_names), len(old_names))
+        self.assertTrue(all(default_storage.exists(n) for n in new_names))
+        self.assertFalse(any(default_storage.exists(n) for n in old_names))
+
+    def test_unreadable_image_has_no_variants(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            recipe = create_recipe(self.author, name="Без копий")
+            with open(recipe.image.path, "wb") as image_file:
+                image_file.write(b"not an image")
+        recipe.refresh_from_db()
+        self.assertEqual(recipe.image_variants, {})
+        response = self.client.get(f"/api/recipes/{recipe.id}/")
+        self.assertIsNone(response.data["image_variants"])
+        self.assertTrue(os.path.exists(recipe.image.path))
@@ -0,0 +1,59 @@
+"""
+Ошибки ограничений БД при добавлении в избранное, корзину и подписки:
+повтор — 400, несуществующий объект — 404. Транзакции настоящие:
+отложенная проверка внешнего ключа срабатывает только при COMMIT.
+"""
+from recipes.models import Favorite, ShoppingCart
+from rest_framework.test import APITransactionTestCase
+from users.models import Subscriptions
+
+from .base import MediaRootMixin, create_recipe, create_user, get_client
+
+
+class IntegrityErrorTest(MediaRootMixin, APITransactionTestCase):
+    def setUp(self):
+        self.author = create_user("author")
+        self.reader = create_user("reader")
+        self.recipe = create_recipe(self.author)
+        self.client = get_client(self.reader)
+
+    def test_recipe_relations(self):
+        for url, model in (
+            ("favorite", Favorite),
+            ("shopping_cart", ShoppingCart),
+        ):
+            with self.subTest(url=url):
+                path = f"/api/recipes/{self.recipe.id}/{url}/"
+                self.assertEqual(self.client.post(path).status_code, 201)
+                response = self.client.post(path)
+                self.assertEqual(response.status_code, 400)
+                self.assertIn("non_field_errors", response.data)
+                response = self.client.post(
+                    f"/api/recipes/{self.recipe.id + 100}/{url}/"
+                )
+                self.assertEqual(response.status_code, 404)
+                self.assertEqual(model.objects.count(), 1)
+
+    def test_subscribe(self):
+        path = f"/api/users/{self.author.id}/subscribe/"
+        self.assertEqual(self.client.post(path).status_code, 201)
+        self.assertEqual(self.client.post(path).status_code, 400)
+        response = self.client.post(f"/api/users/{self.reader.id}/subscribe/")
+        self.assertEqual(response.status_code, 400)
+        response = self.client.post(
+            f"/api/users/{self.author.id + 100}/subscribe/"
+        )
+        self.assertEqual(response.status_code, 404)
+        self.assertEqual(Subscriptions.objects.count(), 1)
+
+    def test_missing_relation_delete(self):
+        for url in ("favorite", "shopping_cart"):
+            with self.subTest(url=url):
+                response = self.client.delete(
+                    f"/api/recipes/{self.recipe.id}/{url}/"
+                )
+                self.assertEqual(response.status_code, 404)
+        response = self.client.delete(
+            f"/api/users/{self.author.id}/subscribe/"
+        )
+        self.assertEqual(response.status_code, 400)
@@ -0,0 +1,50 @@
+"""Метрики запросов и заголовок Server-Timing"""
+from prometheus_client import REGISTRY
+from rest_framework.serializers import BaseSerializer
+from rest_framework.test import APITestCase
+
+from .base import create_tag, create_user, get_client
+
+LABELS = {"view": "TagViewSet", "action": "list"}
+
+
+def get_sample(name):
+    return REGISTRY.get_sample_value(name, LABELS) or 0
+
+
+class MetricsTest(APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.admin = create_user("admin")
+        cls.admin.is_staff = True
+        cls.admin.save()
+        for number in range(3):
+            create_tag(f"tag{number}", f"#00000{number}")
+
+    def test_request_is_observed(self):
+        count = get_sample("foodgram_request_duration_seconds_count")
+        spent = get_sample("foodgram_serializer_duration_seconds_sum")
+        response = self.client.get("/api/tags/")
+        self.assertIn("serializer;dur=", response["Server-Timing"])
+        self.assertEqual(
+            get_sample("foodgram_request_duration_seconds_count"), count + 1
+        )
+        self.assertGreater(
+            get_sample("foodgram_serializer_duration_seconds_sum"), spent
+        )
+
+    def test_metrics_view(self):
+        self.client.get("/api/tags/")
+        self.assertEqual(self.client.get("/api/metrics/").status_code, 401)
+        response = get_client(self.admin).get("/api/metrics/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(
+            b'foodgram_request_duration_seconds_count{action="list",'
+            b'view="TagViewSet"}',
+            response.content,
+        )
+
+    def test_drf_serializers_are_not_patched(self):
+        self.assertFalse(hasattr(BaseSerializer.is_valid, "__wrapped__"))
+        self.assertIsInstance(BaseSerializer.data, property)
+        self.assertFalse(hasattr(BaseSerializer.data.fget, "__wrapped__"))
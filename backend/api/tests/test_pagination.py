@@ -0,0 +1,81 @@
+"""Постраничный вывод курсором (keyset) и номером страницы"""
+import base64
+import json
+
+from rest_framework.test import APITestCase
+from users.models import Subscriptions
+
+from .base import MediaRootMixin, create_recipe, create_user, get_client
+
+
+def make_cursor(position):
+    return base64.urlsafe_b64encode(json.dumps(position).encode()).decode()
+
+
+class CursorPaginationTest(MediaRootMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user("author")
+        cls.recipes = [
+            create_recipe(cls.author, name=f"Рецепт {number}")
+            for number in range(7)
+        ]
+
+    def walk(self, url, client=None):
+        """id всех страниц по ссылкам next"""
+        client = client or self.client
+        ids = []
+        while url:
+            response = client.get(url)
+            self.assertEqual(response.status_code, 200)
+            self.assertNotIn("count", response.data)
+            ids.extend(item["id"] for item in response.data["results"])
+            url = response.data["next"]
+        return ids
+
+    def test_pages_follow_ordering_without_gaps(self):
+        ids = self.walk("/api/recipes/?cursor=&limit=3")
+        expected = sorted(
+            self.recipes, key=lambda recipe: (recipe.pub_date, recipe.id)
+        )
+        self.assertEqual(ids, [recipe.id for recipe in reversed(expected)])
+
+    def test_new_recipe_does_not_shift_pages(self):
+        first = self.client.get("/api/recipes/?cursor=&limit=3").data
+        create_recipe(self.author, name="Новый рецепт")
+        rest = self.walk(first["next"])
+        page_ids = [item["id"] for item in first["results"]]
+        self.assertEqual(len(page_ids + rest), len(self.recipes))
+        self.assertFalse(set(page_ids) & set(rest))
+
+    def test_page_number_mode_unchanged(self):
+        response = self.client.get("/api/recipes/?page=2&limit=3")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data["count"], len(self.recipes))
+        self.assertEqual(len(response.data["results"]), 3)
+
+    def test_invalid_cursor(self):
+        for cursor in (
+            "not-base64!",
+            make_cursor({"pub_date": 1}),
+            make_cursor(["2023-01-01T00:00:00+00:00"]),
+            make_cursor(["не дата", 1]),
+        ):
+            with self.subTest(cursor=cursor):
+                response = self.client.get(f"/api/recipes/?cursor={cursor}")
+                self.assertEqual(response.status_code, 400)
+
+    def test_cursor_with_search_ordering(self):
+        response = self.client.get("/api/recipes/?cursor=&search=рецепт")
+        self.assertEqual(response.status_code, 400)
+
+    def test_subscriptions_cursor(self):
+        reader = create_user("reader")
+        authors = [create_user(f"writer{number}") for number in range(4)]
+        Subscriptions.objects.bulk_create(
+            Subscriptions(user=reader, author=author) for author in authors
+        )
+        ids = self.walk(
+            "/api/users/subscriptions/?cursor=&limit=3", get_client(reader)
+        )
+        self.assertEqual(ids, [author.id for author in authors])
@@ -0,0 +1,153 @@
+"""Пул соединений core.db.pool на поддельных соединениях, без БД"""
+import threading
+import time
+from unittest import mock
+
+from core.db import pool
+from core.db.pool import ConnectionPool, PoolTimeout, close_pool, get_pool
+from django.test import SimpleTestCase
+
+
+class FakeCursor:
+    def __init__(self, connection):
+        self.connection = connection
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        return False
+
+    def execute(self, sql):
+        if self.connection.broken:
+            raise OSError("server closed the connection")
+        self.connection.queries.append(sql)
+
+
+class FakeConnection:
+    def __init__(self):
+        self.closed = False
+        self.broken = False
+        self.queries = []
+
+    def cursor(self):
+        return FakeCursor(self)
+
+    def rollback(self):
+        if self.broken:
+            raise OSError("server closed the connection")
+
+    def close(self):
+        self.closed = True
+
+
+class ConnectionPoolTest(SimpleTestCase):
+    def make_pool(self, **options):
+        options.setdefault("check_interval", 60)
+        return ConnectionPool(**options)
+
+    def test_connection_reused(self):
+        connection_pool = self.make_pool()
+        connection = connection_pool.getconn(FakeConnection)
+        connection_pool.putconn(connection)
+        self.assertIs(connection_pool.getconn(FakeConnection), connection)
+        stats = connection_pool.get_stats()
+        self.assertEqual(stats["created"], 1)
+        self.assertEqual(stats["checkouts"], 2)
+
+    def test_min_size_filled(self):
+        connection_pool = self.make_pool(min_size=3)
+        connection_pool.getconn(FakeConnection)
+        stats = connection_pool.get_stats()
+        self.assertEqual((stats["size"], stats["idle"]), (3, 2))
+
+    def test_timeout_when_exhausted(self):
+        connection_pool = self.make_pool(max_size=1, timeout=0.05)
+        connection_pool.getconn(FakeConnection)
+        with self.assertRaises(PoolTimeout):
+            connection_pool.getconn(FakeConnection)
+        self.assertEqual(connection_pool.get_stats()["timeouts"], 1)
+
+    def test_waiter_gets_returned_connection(self):
+        connection_pool = self.make_pool(max_size=1, timeout=5)
+        connection = connection_pool.getconn(FakeConnection)
+        received = []
+        waiter = threading.Thread(
+            target=lambda: received.append(
+                connection_pool.getconn(FakeConnection)
+            )
+        )
+        waiter.start()
+        time.sleep(0.05)
+        connection_pool.putconn(connection)
+        waiter.join(5)
+        self.assertEqual(received, [connection])
+        self.assertEqual(connection_pool.get_stats()["waits"], 1)
+
+    def test_closed_connection_replaced(self):
+        connection_pool = self.make_pool()
+        connection = connection_pool.getconn(FakeConnection)
+        connection_pool.putconn(connection)
+        connection.closed = True
+        replacement = connection_pool.getconn(FakeConnection)
+        self.assertIsNot(replacement, connection)
+        self.assertEqual(connection_pool.get_stats()["size"], 1)
+
+    def test_idle_connection_checked(self):
+        connection_pool = self.make_pool(check_interval=0)
+        connection = connection_pool.getconn(FakeConnection)
+        connection_pool.putconn(connection)
+        self.assertIs(connection_pool.getconn(FakeConnection), connection)
+        self.assertEqual(connection.queries, ["SELECT 1"])
+        connection_pool.putconn(connection)
+        connection.broken = True
+        self.assertIsNot(connection_pool.getconn(FakeConnection), connection)
+        self.assertTrue(connection.closed)
+
+    def test_discarded_on_return(self):
+        for options, discard, broken in (
+            ({}, True, False),
+            ({"max_lifetime": 0}, False, False),
+            ({}, False, True),
+        ):
+            with self.subTest(options=options, discard=discard):
+                connection_pool = self.make_pool(**options)
+                connection = connection_pool.getconn(FakeConnection)
+                connection.broken = broken
+                connection_pool.putconn(connection, discard=discard)
+                self.assertTrue(connection.closed)
+                stats = connection_pool.get_stats()
+                self.assertEqual((stats["size"], stats["idle"]), (0, 0))
+
+    def test_failed_connect_frees_slot(self):
+        connection_pool = self.make_pool(max_size=1, timeout=0.05)
+        with self.assertRaises(OSError):
+            connection_pool.getconn(mock.Mock(side_effect=OSError))
+        self.assertIsNotNone(connection_pool.getconn(FakeConnection))
+
+    def test_new_pool_after_fork(self):
+        with mock.patch.dict(pool.pools, clear=True):
+            parent = get_pool("test")
+            self.assertIs(get_pool("test"), parent)
+            with mock.patch("os.getpid", return_value=parent.pid + 1):
+                child = get_pool("test")
+            self.assertIsNot(child, parent)
+
+    def test_new_target_closes_old_pool(self):
+        with mock.patch.dict(pool.pools, clear=True):
+            old = get_pool("test", ("db", 5432, "postgres", "postgres"))
+            connection = old.getconn(FakeConnection)
+            old.putconn(connection)
+            new = get_pool("test", ("db", 5432, "test_postgres", "postgres"))
+            self.assertIsNot(new, old)
+            self.assertTrue(connection.closed)
+            self.assertIsNot(new.getconn(FakeConnection), connection)
+
+    def test_close_pool(self):
+        with mock.patch.dict(pool.pools, clear=True):
+            connection_pool = get_pool("test")
+            connection = connection_pool.getconn(FakeConnection)
+            connection_pool.putconn(connection)
+            close_pool("test")
+            self.assertTrue(connection.closed)
+            self.assertNotIn("test", pool.pools)
@@ -0,0 +1,122 @@
+"""
+Пути, которые есть только в PostgreSQL: триггер поискового вектора,
+GIN-индекс recipe_tag_bits, конкурентные INSERT ... ON CONFLICT ...
+RETURNING и бэкенд с пулом соединений. В SQLite тесты пропускаются.
+"""
+import threading
+import unittest
+from concurrent.futures import ThreadPoolExecutor
+
+from core.db.pool import get_pools_stats
+from django.db import connection
+from recipes.models import Recipe, ShoppingCart
+from rest_framework.test import APITestCase, APITransactionTestCase
+
+from .base import MediaRootMixin, create_recipe, create_tag, create_user
+
+postgresql_only = unittest.skipUnless(
+    connection.vendor == "postgresql", "нужен PostgreSQL"
+)
+
+
+@postgresql_only
+class PostgresqlQueriesTest(MediaRootMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user("author")
+        cls.breakfast = create_tag("breakfast", "#E26C2D")
+        cls.dinner = create_tag("dinner", "#8775D2")
+        cls.soup = create_recipe(
+            cls.author, tags=(cls.dinner,), name="Борщ с пампушками"
+        )
+        cls.porridge = create_recipe(
+            cls.author, tags=(cls.breakfast,), name="Каша"
+        )
+        Recipe.objects.filter(pk=cls.porridge.pk).update(
+            text="Сварить на молоке, как борщи не варят"
+        )
+
+    def test_trigger_fills_search_vector(self):
+        vectors = Recipe.objects.values_list("search_vector", flat=True)
+        self.assertTrue(all(vectors))
+
+    def test_search_ranks_name_above_text(self):
+        found = list(
+            Recipe.objects.search("борщ").values_list("pk", flat=True)
+        )
+        self.assertEqual(found, [self.soup.pk, self.porridge.pk])
+
+    def test_search_vector_follows_updates(self):
+        Recipe.objects.filter(pk=self.soup.pk).update(name="Солянка")
+        found = Recipe.objects.search("солянка")
+        self.assertEqual(list(found), [self.soup])
+
+    def test_with_any_tags(self):
+        found = Recipe.objects.with_any_tags([self.breakfast])
+        self.assertEqual(list(found), [self.porridge])
+        found = Recipe.objects.with_any_tags([self.breakfast, self.dinner])
+        self.assertEqual(found.count(), 2)
+
+    def test_tag_filter_uses_gin_index(self):
+        queryset = Recipe.objects.with_any_tags([self.breakfast])
+        with connection.cursor() as cursor:
+            cursor.execute("SET LOCAL enable_seqscan = off")
+            plan = queryset.explain()
+        self.assertIn("recipe_tag_bits_gin", plan)
+
+
+@postgresql_only
+class PostgresqlConcurrencyTest(MediaRootMixin, APITransactionTestCase):
+    def setUp(self):
+        self.author = create_user("author")
+        self.reader = create_user("reader")
+        self.recipe = create_recipe(self.author)
+
+    def run_in_threads(self, target, count=4):
+        """target() одновременно в count потоках со своими соединениями"""
+        barrier = threading.Barrier(count)
+
+        def run(_):
+            barrier.wait()
+            try:
+                return target()
+            finally:
+                connection.close()
+
+        with ThreadPoolExecutor(count) as executor:
+            return list(executor.map(run, range(count)))
+
+    def test_concurrent_add_counted_once(self):
+        results = self.run_in_threads(
+            lambda: ShoppingCart.objects.add_recipes(
+                self.reader.id, [self.recipe.id]
+            )
+        )
+        added = [result for result, _ in results if result]
+        self.assertEqual(added, [{self.recipe.id}])
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.shopping_cart_count, 1)
+
+    def test_concurrent_remove_counted_once(self):
+        ShoppingCart.objects.add_recipes(self.reader.id, [self.recipe.id])
+        results = self.run_in_threads(
+            lambda: ShoppingCart.objects.remove_recipes(
+                self.reader.id, [self.recipe.id]
+            )
+        )
+        removed = [result for result in results if result]
+        self.assertEqual(removed, [{self.recipe.id}])
+        self.recipe.refresh_from_db()
+        self.assertEqual(self.recipe.shopping_cart_count, 0)
+
+    @unittest.skipUnless(
+        connection.settings_dict["ENGINE"] == "core.db.backends.postgresql",
+        "пул соединений отключён",
+    )
+    def test_pooled_backend_reuses_connections(self):
+        connection.ensure_connection()
+        raw = connection.connection
+        connection.close()
+        self.assertGreaterEqual(get_pools_stats()["default"]["idle"], 1)
+        connection.ensure_connection()
+        self.assertIs(connection.connection, raw)
@@ -0,0 +1,53 @@
+"""Подсказки по индексам из планов запросов фильтров рецептов"""
+from django.db import connection
+from recipes.models import Favorite
+from rest_framework.test import APITestCase
+
+from api.query_plans import (advise_indexes, explain_filters,
+                             get_filter_columns, get_queryset)
+
+from .base import (MediaRootMixin, create_ingredient, create_recipe,
+                   create_tag, create_user)
+
+AUTHOR_INDEX = (
+    "recipes_recipe",
+    'models.Index(fields=("author", "-pub_date"), '
+    'name="recipe_author_pub_date_idx")',
+)
+
+
+class IndexAdviceTest(MediaRootMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.user = create_user("reader")
+        authors = [create_user(f"author{number}") for number in range(3)]
+        tags = [
+            create_tag("breakfast", "#E26C2D"),
+            create_tag("dinner", "#8775D2"),
+        ]
+        ingredient = create_ingredient("соль")
+        for number in range(12):
+            recipe = create_recipe(
+                authors[number % 3],
+                ingredients=((ingredient, number + 1),),
+                tags=(tags[number % 2],),
+                name=f"Суп номер {number}",
+            )
+            if number % 4 == 0:
+                Favorite.objects.create(user=cls.user, favorite_recipe=recipe)
+
+    def test_shipped_indexes_leave_no_advice(self):
+        self.assertEqual(advise_indexes(explain_filters(self.user)), [])
+
+    def test_missing_index_is_suggested_from_plan(self):
+        with connection.cursor() as cursor:
+            cursor.execute("DROP INDEX recipe_author_pub_date_idx")
+        self.assertIn(
+            AUTHOR_INDEX, advise_indexes(explain_filters(self.user))
+        )
+
+    def test_join_columns_come_from_joined_table(self):
+        query = get_queryset(self.user, {"is_favorited": ["1"]}).query
+        self.assertEqual(
+            get_filter_columns(query.where), {"recipes_favorite": ["user_id"]}
+        )
@@ -0,0 +1,123 @@
+"""Список покупок следует за корзиной и составом рецептов"""
+from recipes.models import IngredientRecipe, ShoppingCart, ShoppingListItem
+from rest_framework.test import APITestCase
+
+from .base import (MediaRootMixin, create_ingredient, create_recipe,
+                   create_tag, create_user, get_client)
+
+
+class ShoppingListTest(MediaRootMixin, APITestCase):
+    @classmethod
+    def setUpTestData(cls):
+        cls.author = create_user("author")
+        cls.buyer = create_user("buyer")
+        cls.tag = create_tag("lunch", "#49B64E")
+        cls.flour = create_ingredient("мука")
+        cls.milk = create_ingredient("молоко", "мл")
+        cls.recipe = create_recipe(
+            cls.author, ingredients=((cls.flour, 100),), tags=(cls.tag,)
+        )
+        cls.other = create_recipe(
+            cls.author,
+            ingredients=((cls.flour, 50),),
+            tags=(cls.tag,),
+            name="Другой рецепт",
+        )
+
+    def get_list(self, user=None):
+        return dict(
+            ShoppingListItem.objects.filter(
+                user=user or self.buyer
+            ).values_list("ingredient_id", "amount")
+        )
+
+    def add_to_cart(self, recipe, user=None):
+        with self.captureOnCommitCallbacks(execute=True):
+            ShoppingCart.objects.create(user=user or self.buyer, recipe=recipe)
+
+    def remove_from_cart(self, recipe):
+        with self.captureOnCommitCallbacks(execute=True):
+            ShoppingCart.objects.filter(
+                user=self.buyer, recipe=recipe
+            ).delete()
+
+    def test_cart_adds_and_removes_amounts(self):
+        self.add_to_cart(self.recipe)
+        self.add_to_cart(self.other)
+        self.assertEqual(self.get_list(), {self.flour.id: 150})
+        self.remove_from_cart(self.recipe)
+        self.assertEqual(self.get_list(), {self.flour.id: 50})
+        self.remove_from_cart(self.other)
+        self.assertEqual(self.get_list(), {})
+
+    def test_orm_amount_change(self):
+        self.add_to_cart(self.recipe)
+        row = IngredientRecipe.objects.get(recipe=self.recipe)
+        row.amount = 90
+        with self.captureOnCommitCallbacks(execute=True):
+            row.save()
+        self.assertEqual(self.get_list(), {self.flour.id: 90})
+        self.remove_from_cart(self.recipe)
+        self.assertEqual(self.get_list(), {})
+
+    def test_orm_ingredient_replaced(self):
+        self.add_to_cart(self.recipe)
+        self.add_to_cart(self.other)
+        row = IngredientRecipe.objects.get(recipe=self.recipe)
+        row.ingredient = self.milk
+        with self.captureOnCommitCallbacks(execute=True):
+            row.save()
+        self.assertEqual(
+            self.get_list(), {self.flour.id: 50, self.milk.id: 100}
+        )
+
+    def test_orm_rows_added_and_deleted(self):
+        self.add_to_cart(self.recipe)
+        with self.captureOnCommitCallbacks(execute=True):
+            row = IngredientRecipe.objects.create(
+                recipe=self.recipe, ingredient=self.milk, amount=200
+            )
+        self.assertEqual(
+            self.get_list(), {self.flour.id: 100, self.milk.id: 200}
+        )
+        with self.captureOnCommitCallbacks(execute=True):
+            row.delete()
+        self.assertEqual(self.get_list(), {self.flour.id: 100})
+
+    def test_only_cart_holders_change(self):
+        self.add_to_cart(self.recipe)
+        self.add_to_cart(self.other, self.author)
+        with self.captureOnCommitCallbacks(execute=True):
+            IngredientRecipe.objects.get(recipe=self.recipe).delete()
+        self.assertEqual(self.get_list(), {})
+        self.assertEqual(self.get_list(self.author), {self.flour.id: 50})
+
+    def test_api_update_changes_lists_by_difference(self):
+        self.add_to_cart(self.recipe)
+        data = {
+            "name": "Рецепт",
+            "text": "Описание",
+            "cooking_time": 10,
+            "tags": [self.tag.id],
+            "ingredients": [
+                {"id": self.flour.id, "amount": 90},
+                {"id": self.milk.id, "amount": 30},
+            ],
+        }
+        with self.captureOnCommitCallbacks(execute=True):
+            response = get_client(self.author).patch(
+                f"/api/recipes/{self.recipe.id}/", data, format="json"
+            )
+        self.assertEqual(response.status_code, 200, response.data)
+        self.assertEqual(
+            self.get_list(), {self.flour.id: 90, self.milk.id: 30}
+        )
+        self.remove_from_cart(self.recipe)
+        self.assertEqual(self.get_list(), {})
+
+    def test_recipe_delete_clears_lists(self):
+        self.add_to_cart(self.recipe)
+        self.add_to_cart(self.other)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.recipe.delete()
+        self.assertEqual(self.get_list(), {self.flour.id: 50})
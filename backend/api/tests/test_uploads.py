@@ -0,0 +1,108 @@
+"""Загрузка изображений рецептов по токену"""
+import os
+import time
+
+from django.core.files.storage import default_storage
+from django.core.management import call_command
+from django.db import transaction
+from recipes.models import Recipe
+from recipes.uploads import (
+    claim_upload,
+    get_upload_name,
+    store_upload,
+    upload_exists,
+)
+from rest_framework.test import APITestCase
+
+from .base import (
+    MediaRootMixin,
+    create_ingredient,
+    create_tag,
+    create_user,
+    get_client,
+    make_image,
+)
+
+
+class UploadTest(MediaRootMixin, APITestCase):
+    def setUp(self):
+        self.user = create_user("cook")
+        self.client = get_client(self.user)
+        self.ingredient = create_ingredient("Мука")
+        self.tag = create_tag("breakfast", "#E26C2D")
+
+    def upload(self):
+        response = self.client.post(
+            "/api/recipes/upload_image/",
+            make_image().read(),
+            content_type="image/png",
+        )
+        self.assertEqual(response.status_code, 201)
+        return response.data["image_token"]
+
+    def create_recipe(self, token):
+        return self.client.post(
+            "/api/recipes/",
+            {
+                "name": "Блины",
+                "text": "Описание",
+                "cooking_time": 20,
+                "image_token": token,
+                "tags": [self.tag.id],
+                "ingredients": [{"id": self.ingredient.id, "amount": 200}],
+            },
+            format="json",
+        )
+
+    def expire(self, token):
+        path = default_storage.path(get_upload_name(self.user.id, token))
+        old = time.time() - 2 * 24 * 60 * 60
+        os.utime(path, (old, old))
+
+    def test_upload_moved_after_commit(self):
+        token = self.upload()
+        with self.captureOnCommitCallbacks() as callbacks:
+            response = self.create_recipe(token)
+        self.assertEqual(response.status_code, 201)
+        image_name = Recipe.objects.get().image.name
+        self.assertFalse(default_storage.exists(image_name))
+        self.assertTrue(upload_exists(self.user.id, token))
+        for callback in callbacks:
+            callback()
+        self.assertTrue(default_storage.exists(image_name))
+        self.assertFalse(upload_exists(self.user.id, token))
+
+    def test_rollback_keeps_upload(self):
+        token = self.upload()
+        with self.captureOnCommitCallbacks(execute=True) as callbacks:
+            with self.assertRaises(RuntimeError):
+                with transaction.atomic():
+                    image_name = claim_upload(self.user.id, token)
+                    raise RuntimeError
+        self.assertEqual(callbacks, [])
+        self.assertFalse(default_storage.exists(image_name))
+        self.assertTrue(upload_exists(self.user.id, token))
+        self.assertEqual(self.create_recipe(token).status_code, 201)
+
+    def test_expired_upload_rejected(self):
+        token = self.upload()
+        self.expire(token)
+        self.assertFalse(upload_exists(self.user.id, token))
+        self.assertEqual(self.create_recipe(token).status_code, 400)
+
+    def test_expired_uploads_deleted(self):
+        expired, fresh = self.upload(), self.upload()
+        self.expire(expired)
+        call_command("clear_expired_uploads", stdout=open(os.devnull, "w"))
+        self.assertFalse(
+            default_storage.exists(get_upload_name(self.user.id, expired))
+        )
+        self.assertTrue(upload_exists(self.user.id, fresh))
+
+    def test_new_upload_deletes_expired(self):
+        expired = self.upload()
+        self.expire(expired)
+        store_upload(self.user.id, [make_image().read()])
+        self.assertFalse(
+            default_storage.exists(get_upload_name(self.user.id, expired))
+        )
@@ -3,8 +3,8 @@ from django.urls import include, path
 from rest_framework.routers import DefaultRouter
 
 from .views import (CustomUserViewSet, FavoriteViewSet, IngredientViewSet,
-                    RecipesViewSet, ShoppingCartViewSet, SubscriptionViewSet,
-                    TagViewSet)
+                    MetricsView, RecipesViewSet, ShoppingCartViewSet,
+                    SubscriptionViewSet, TagViewSet)
 
 app_name = 'api'
 
@@ -31,6 +31,7 @@ router.register(
 
 
 urlpatterns = [
+    path('metrics/', MetricsView.as_view(), name='metrics'),
     path('', include(router.urls)),
     path('', include('djoser.urls.base')),
     path('auth/', include('djoser.urls.authtoken')),
@@ -1,40 +1,124 @@
 """Вспомогательные функции"""
-from django.db.models import F, Sum
-from django.http import HttpResponse
+import csv
+import os
+from tempfile import SpooledTemporaryFile
 
-from recipes.models import Ingredient
+from django.conf import settings
+from django.http import FileResponse, StreamingHttpResponse
+from recipes.models import ShoppingListItem
+from rest_framework import status
+from rest_framework.response import Response
+
+SHOPPING_LIST_SEPARATOR = "____________________________"
+
+
+class Echo:
+    """Псевдо-файл для csv.writer: строка возвращается, а не копится"""
+
+    def write(self, value):
+        return value
+
+
+def get_shopping_items(user):
+    """Готовый список покупок: одна строка на ингредиент"""
+    return (
+        ShoppingListItem.objects.filter(user=user)
+        .order_by("ingredient__name")
+        .values_list(
+            "ingredient__name", "ingredient__measurement_unit", "amount"
+        )
+        .iterator()
+    )
+
+
+def shopping_list_text(user):
+    """Построчная генерация текстового списка покупок"""
+    yield "Список покупок:\n"
+    yield f"{user.first_name} {user.last_name}\n"
+    yield f"{SHOPPING_LIST_SEPARATOR}\n"
+    for name, measurement, amount in get_shopping_items(user):
+        yield f"- {name}: {amount} {measurement}\n"
+    yield f"{SHOPPING_LIST_SEPARATOR}\nЗа покупками!\n"
+
+
+def shopping_list_csv(user):
+    """Построчная генерация списка покупок в CSV"""
+    writer = csv.writer(Echo())
+    yield writer.writerow(("Ингредиент", "Количество", "Единица измерения"))
+    for name, measurement, amount in get_shopping_items(user):
+        yield writer.writerow((name, amount, measurement))
+
+
+def shopping_list_pdf(user):
+    """
+    PDF пишется постранично во временный файл: в памяти держится
+    не больше SHOPPING_LIST_SPOOL_SIZE байт, остальное уходит на диск.
+    """
+    from reportlab.lib.pagesizes import A4
+    from reportlab.pdfbase import pdfmetrics
+    from reportlab.pdfbase.ttfonts import TTFont
+    from reportlab.pdfgen import canvas
+
+    font = "Helvetica"
+    if os.path.exists(settings.SHOPPING_LIST_PDF_FONT):
+        font = "ShoppingListFont"
+        pdfmetrics.registerFont(
+            TTFont(font, settings.SHOPPING_LIST_PDF_FONT)
+        )
+    buffer = SpooledTemporaryFile(max_size=settings.SHOPPING_LIST_SPOOL_SIZE)
+    pdf = canvas.Canvas(buffer, pagesize=A4)
+    width, height = A4
+    margin, line_height = 50, 18
+    y = height - margin
+
+    def write_line(text, size=12):
+        nonlocal y
+        if y < margin:
+            pdf.showPage()
+            y = height - margin
+        pdf.setFont(font, size)
+        pdf.drawString(margin, y, text)
+        y -= line_height
+
+    write_line("Список покупок:", size=16)
+    write_line(f"{user.first_name} {user.last_name}")
+    write_line(SHOPPING_LIST_SEPARATOR)
+    for name, measurement, amount in get_shopping_items(user):
+        write_line(f"- {name}: {amount} {measurement}")
+    write_line(SHOPPING_LIST_SEPARATOR)
+    write_line("За покупками!")
+    pdf.save()
+    buffer.seek(0)
+    return buffer
 
 
 def get_shopping_list(self, request):
-    """Выгрузка текстового файла со списком покупок.
-    Подсчёт суммы ингредиентов по всем рецептам из корзины.
+    """Выгрузка списка покупок из готовой таблицы ShoppingListItem.
+    Формат задаётся параметром format: txt (по умолчанию), csv или pdf.
     Адрес: */recipes/download_shopping_cart/.
     """
     user = self.request.user
-    filename = f"{user.username}_shopping_list.txt"
-    shopping_list = [
-        f"Список покупок:\n"
-        f"{user.first_name} {user.last_name}\n"
-        f"____________________________"
-    ]
-
-    ingredients = (
-        Ingredient.objects.filter(
-            amount__recipe__shopping_cart_recipe__user=user
+    file_format = request.query_params.get("format", "txt")
+    filename = f"{user.username}_shopping_list.{file_format}"
+    if file_format == "pdf":
+        return FileResponse(
+            shopping_list_pdf(user),
+            as_attachment=True,
+            filename=filename,
+            content_type="application/pdf",
         )
-        .values("name", measurement=F("measurement_unit"))
-        .annotate(amount=Sum("amount__amount"))
-    )
-
-    for ing in ingredients:
-        shopping_list.append(
-            f'- {ing["name"]}: {ing["amount"]} {ing["measurement"]}'
+    if file_format == "csv":
+        response = StreamingHttpResponse(
+            shopping_list_csv(user), content_type="text/csv; charset=utf-8"
+        )
+    elif file_format == "txt":
+        response = StreamingHttpResponse(
+            shopping_list_text(user), content_type="text/plain; charset=utf-8"
+        )
+    else:
+        return Response(
+            "Доступные форматы: txt, csv, pdf.",
+            status=status.HTTP_400_BAD_REQUEST,
         )
-
-    shopping_list.append("____________________________\n" "За покупками!\n")
-    shopping_list = "\n".join(shopping_list)
-    response = HttpResponse(
-        shopping_list, content_type="text.txt; charset=utf-8"
-    )
     response["Content-Disposition"] = f"attachment; filename={filename}"
     return response
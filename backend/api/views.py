@@ -1,26 +1,38 @@
 """Основная логика проекта"""
+from functools import partial
+
 from django.contrib.auth import get_user_model
+from django.db import transaction
+from django.db.models import Prefetch, prefetch_related_objects
+from django.http import HttpResponse
 from django.shortcuts import get_object_or_404
 from django_filters.rest_framework import DjangoFilterBackend
 from djoser.views import UserViewSet
+from prometheus_client import CONTENT_TYPE_LATEST
+from recipes.ingredient_index import get_ingredient_index
 from recipes.models import Favorite, Ingredient, Recipe, ShoppingCart, Tag
+from recipes.uploads import UPLOAD_CHUNK_SIZE, UploadError, store_upload
 from rest_framework import status
 from rest_framework.decorators import action
-from rest_framework.permissions import IsAuthenticated
+from rest_framework.parsers import MultiPartParser
+from rest_framework.permissions import IsAdminUser, IsAuthenticated
 from rest_framework.response import Response
+from rest_framework.views import APIView
 from rest_framework.viewsets import ModelViewSet, ReadOnlyModelViewSet
 from users.models import Subscriptions
 
 from .filters import IngredientSearchFilter, RecipeFilter
-from .mixins import CreateDestroyViewSet, ListSubscriptionViewSet
+from .metrics import render_metrics
+from .mixins import (AnonymousCacheMixin, ConditionalGetMixin,
+                     CreateDestroyViewSet, ListSubscriptionViewSet)
 from .paginators import PageLimitPagination
 from .permissions import AuthorAdminOrReadOnly, IsAdminOrReadOnly
-from .serializers import (CreateRecipeSerializer, CustomPasswordSerializer,
-                          CustomUserCreateSerializer, CustomUserSerializer,
-                          FavoriteSerializer, GetRecipeSerializer,
-                          IngredientSerializer, ShoppingCartSerializer,
-                          SubscribeSerializer, TagSerializer,
-                          UserSubscribeSerializer)
+from .serializers import (BulkRecipesSerializer, CreateRecipeSerializer,
+                          CustomPasswordSerializer, CustomUserCreateSerializer,
+                          CustomUserSerializer, FavoriteSerializer,
+                          GetRecipeSerializer, IngredientSerializer,
+                          ShoppingCartSerializer, SubscribeSerializer,
+                          TagSerializer, UserSubscribeSerializer)
 from .utils import get_shopping_list
 
 User = get_user_model()
@@ -56,15 +68,12 @@ class CustomUserViewSet(UserViewSet):
         """Подписка и отписка на/от пользователя"""
         user = request.user
         author = get_object_or_404(User, pk=id)
-        serializer = SubscribeSerializer(
-            data={
-                "user": user.id,
-                "author": author.id,
-            }
-        )
         if request.method == "POST":
+            serializer = SubscribeSerializer(
+                data={}, context={"user": user, "author": author}
+            )
             serializer.is_valid(raise_exception=True)
-            serializer.save()
+            serializer.save(user=user, author=author)
             serializer_show = UserSubscribeSerializer(
                 author,
                 context={"recipes_limit": request.GET.get("recipes_limit")},
@@ -82,54 +91,87 @@ class CustomUserViewSet(UserViewSet):
                     status=status.HTTP_400_BAD_REQUEST,
                 )
             subscription.delete()
-            return Response(
-                "Подписка удалена", status=status.HTTP_204_NO_CONTENT
-            )
+            return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class SubscriptionViewSet(ListSubscriptionViewSet):
     """Представление списка подписок текущего пользователя"""
 
     pagination_class = PageLimitPagination
+    cursor_ordering = ("username", "id")
     serializer_class = UserSubscribeSerializer
     permission_classes = (IsAuthenticated,)
 
     def get_queryset(self):
         return User.objects.filter(subscription__user=self.request.user)
 
+    def paginate_queryset(self, queryset):
+        """Рецепты всех авторов страницы выбираются одним запросом"""
+        page = super().paginate_queryset(queryset)
+        if page:
+            limit = self.request.query_params.get("recipes_limit", "")
+            prefetch_related_objects(
+                page,
+                Prefetch(
+                    "recipes",
+                    queryset=Recipe.objects.latest_per_author(
+                        [author.pk for author in page],
+                        int(limit) if limit.isdigit() else None,
+                    ),
+                    to_attr="latest_recipes",
+                ),
+            )
+        return page
+
 
-class TagViewSet(ReadOnlyModelViewSet):
+class TagViewSet(ConditionalGetMixin, ReadOnlyModelViewSet):
     """Получение тега или списка всех тегов"""
 
+    version_key = "tags"
     queryset = Tag.objects.all()
     serializer_class = TagSerializer
     permission_classes = (IsAdminOrReadOnly,)
 
 
-class IngredientViewSet(ReadOnlyModelViewSet):
+class IngredientViewSet(ConditionalGetMixin, ReadOnlyModelViewSet):
     """
     Получение ингредиента или списка всех ингредиентов,
     поиск по частичному вхождению в начале названия ингредиента.
     """
 
+    version_key = "ingredients"
     queryset = Ingredient.objects.all()
     serializer_class = IngredientSerializer
     permission_classes = (IsAdminOrReadOnly,)
     filter_backends = (IngredientSearchFilter,)
     search_fields = ("^name",)
 
+    def filter_queryset(self, queryset):
+        """Список и поиск по ?name= отдаются из индекса в памяти, без БД"""
+        if self.action == "list":
+            index = get_ingredient_index()
+            if index is not None:
+                return index.search(self.request.query_params.get("name", ""))
+        return super().filter_queryset(queryset)
 
-class RecipesViewSet(ModelViewSet):
+
+class RecipesViewSet(AnonymousCacheMixin, ModelViewSet):
     """Получение, создание и частичное изменение, а так же удаления рецептов.
     Реализована фильтрация по тегам, автору,
     присутствию рецептов в избранном и списке покупок.
+    Ответы анонимным пользователям кэшируются.
     """
 
+    cache_version_keys = ("recipes", "tags", "users")
     queryset = Recipe.objects.all()
     permissions = (AuthorAdminOrReadOnly,)
     filter_backends = (DjangoFilterBackend,)
     filterset_class = RecipeFilter
     pagination_class = PageLimitPagination
+    cursor_ordering = ("-pub_date", "-id")
+
+    def get_queryset(self):
+        return Recipe.objects.with_related()
 
     def get_serializer_class(self):
         method = self.request.method
@@ -142,6 +184,112 @@ class RecipesViewSet(ModelViewSet):
         context.update({"request": self.request})
         return context
 
+    def perform_content_negotiation(self, request, force=False):
+        """У выгрузки списка покупок ?format= выбирает формат файла"""
+        if self.action == "download_shopping_cart":
+            force = True
+        return super().perform_content_negotiation(request, force)
+
+    @action(
+        detail=False,
+        methods=("get",),
+        permission_classes=(IsAuthenticated,),
+    )
+    def feed(self, request):
+        """Лента рецептов авторов, на которых подписан пользователь"""
+        queryset = (
+            self.get_queryset()
+            .filter(feed_items__user=request.user)
+            .order_by("-feed_items__pub_date", "-pk")
+        )
+        page = self.paginate_queryset(queryset)
+        serializer = self.get_serializer(page, many=True)
+        return self.get_paginated_response(serializer.data)
+
+    @action(
+        detail=False,
+        methods=("post",),
+        permission_classes=(IsAuthenticated,),
+        parser_classes=(MultiPartParser,),
+    )
+    def upload_image(self, request):
+        """
+        Загрузка изображения для рецепта: multipart с полем image
+        или само изображение в теле запроса (Content-Type: image/*).
+        Возвращает токен для поля image_token при создании рецепта.
+        """
+        if request.content_type.startswith("image/"):
+            stream = request.stream
+            chunks = (
+                iter(partial(stream.read, UPLOAD_CHUNK_SIZE), b"")
+                if stream is not None
+                else ()
+            )
+        elif request.content_type.startswith("multipart/"):
+            image = request.FILES.get("image")
+            if image is None:
+                return Response(
+                    "Передайте файл в поле image.",
+                    status=status.HTTP_400_BAD_REQUEST,
+                )
+            chunks = image.chunks(UPLOAD_CHUNK_SIZE)
+        else:
+            return Response(
+                "Ожидается multipart/form-data или image/*.",
+                status=status.HTTP_415_UNSUPPORTED_MEDIA_TYPE,
+            )
+        try:
+            token = store_upload(request.user.id, chunks)
+        except UploadError as error:
+            return Response(str(error), status=status.HTTP_400_BAD_REQUEST)
+        return Response({"image_token": token}, status=status.HTTP_201_CREATED)
+
+    @action(
+        detail=False,
+        methods=("post", "delete"),
+        url_path="favorite",
+        permission_classes=(IsAuthenticated,),
+    )
+    def bulk_favorite(self, request):
+        """Добавление и удаление списка рецептов в/из избранного"""
+        return self.bulk_change(request, Favorite)
+
+    @action(
+        detail=False,
+        methods=("post", "delete"),
+        url_path="shopping_cart",
+        permission_classes=(IsAuthenticated,),
+    )
+    def bulk_shopping_cart(self, request):
+        """Добавление и удаление списка рецептов в/из корзины"""
+        return self.bulk_change(request, ShoppingCart)
+
+    def bulk_change(self, request, model):
+        """
+        Тело запроса {"recipes": [id, ...]}, ответ со статусом каждого id:
+        added/exists/not_found при добавлении, removed/not_found при удалении.
+        """
+        serializer = BulkRecipesSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        recipe_ids = list(dict.fromkeys(serializer.validated_data["recipes"]))
+        if request.method == "POST":
+            added, existing = model.objects.add_recipes(
+                request.user.id, recipe_ids
+            )
+            statuses = dict.fromkeys(added, "added")
+            statuses.update(dict.fromkeys(existing, "exists"))
+        else:
+            removed = model.objects.remove_recipes(request.user.id, recipe_ids)
+            statuses = dict.fromkeys(removed, "removed")
+        return Response(
+            {
+                "recipes": [
+                    {"id": pk, "status": statuses.get(pk, "not_found")}
+                    for pk in recipe_ids
+                ]
+            }
+        )
+
     @action(
         detail=False,
         methods=["GET"],
@@ -165,18 +313,11 @@ class FavoriteViewSet(CreateDestroyViewSet):
     queryset = Favorite.objects.all()
     serializer_class = FavoriteSerializer
 
-    def get_serializer_context(self):
-        context = super().get_serializer_context()
-        context["recipe_id"] = self.kwargs.get("recipe_id")
-        return context
-
     def perform_create(self, serializer):
         """Добавление рецепта в избранное"""
         serializer.save(
             user=self.request.user,
-            favorite_recipe=get_object_or_404(
-                Recipe, id=self.kwargs.get("recipe_id")
-            ),
+            favorite_recipe_id=self.kwargs.get("recipe_id"),
         )
 
     @action(methods=("delete",), detail=True)
@@ -185,9 +326,7 @@ class FavoriteViewSet(CreateDestroyViewSet):
         get_object_or_404(
             Favorite, user=request.user, favorite_recipe_id=recipe_id
         ).delete()
-        return Response(
-            "Рецепт удален из избранного", status=status.HTTP_204_NO_CONTENT
-        )
+        return Response(status=status.HTTP_204_NO_CONTENT)
 
 
 class ShoppingCartViewSet(CreateDestroyViewSet):
@@ -196,24 +335,27 @@ class ShoppingCartViewSet(CreateDestroyViewSet):
     queryset = ShoppingCart.objects.all()
     serializer_class = ShoppingCartSerializer
 
-    def get_serializer_context(self):
-        context = super().get_serializer_context()
-        context["recipe_id"] = self.kwargs.get("recipe_id")
-        return context
-
     def perform_create(self, serializer):
         """Добавление рецепта в корзину"""
         serializer.save(
             user=self.request.user,
-            recipe=get_object_or_404(Recipe, id=self.kwargs.get("recipe_id")),
+            recipe_id=self.kwargs.get("recipe_id"),
         )
 
     @action(methods=("delete",), detail=True)
+    @transaction.atomic
     def delete(self, request, recipe_id):
         """Удаление рецепта из корзины"""
         get_object_or_404(
             ShoppingCart, user=request.user, recipe_id=recipe_id
         ).delete()
-        return Response(
-            "Рецепт удален из корзины", status=status.HTTP_204_NO_CONTENT
-        )
+        return Response(status=status.HTTP_204_NO_CONTENT)
+
+
+class MetricsView(APIView):
+    """Метрики всех воркеров в текстовом формате Prometheus для персонала"""
+
+    permission_classes = (IsAdminUser,)
+
+    def get(self, request):
+        return HttpResponse(render_metrics(), content_type=CONTENT_TYPE_LATEST)
@@ -1,5 +1,6 @@
 """Основные настройки проекта"""
 import os
+import tempfile
 
 from dotenv import load_dotenv
 
@@ -34,6 +35,7 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    "api.metrics.metrics_middleware",
     "django.middleware.security.SecurityMiddleware",
     "django.contrib.sessions.middleware.SessionMiddleware",
     "django.middleware.common.CommonMiddleware",
@@ -43,7 +45,7 @@ MIDDLEWARE = [
     "django.middleware.clickjacking.XFrameOptionsMiddleware",
 ]
 
-ROOT_URLCONF = "backend.urls"
+ROOT_URLCONF = os.getenv("ROOT_URLCONF", default="backend.urls")
 
 TEMPLATES = [
     {
@@ -74,6 +76,46 @@ DATABASES = {
         "PASSWORD": os.getenv("POSTGRES_PASSWORD", default="postgres"),
         "HOST": os.getenv("DB_HOST", default="db"),
         "PORT": os.getenv("DB_PORT", default=5432),
+        "CONN_MAX_AGE": int(os.getenv("DB_CONN_MAX_AGE", default=0)),
+        "POOL": {
+            "MIN_SIZE": int(os.getenv("DB_POOL_MIN_SIZE", default=1)),
+            "MAX_SIZE": int(os.getenv("DB_POOL_MAX_SIZE", default=10)),
+            "TIMEOUT": float(os.getenv("DB_POOL_TIMEOUT", default=30)),
+            "MAX_LIFETIME": float(
+                os.getenv("DB_POOL_MAX_LIFETIME", default=3600)
+            ),
+            "CHECK_INTERVAL": float(
+                os.getenv("DB_POOL_CHECK_INTERVAL", default=30)
+            ),
+        },
+    },
+}
+
+# пул соединений процесса; DB_POOL_MAX_SIZE=0 его отключает
+if (
+    DATABASES["default"]["ENGINE"] == "django.db.backends.postgresql"
+    and DATABASES["default"]["POOL"]["MAX_SIZE"] > 0
+):
+    DATABASES["default"]["ENGINE"] = "core.db.backends.postgresql"
+
+CACHES = {
+    "default": {
+        "BACKEND": os.getenv(
+            "CACHE_BACKEND",
+            default="django.core.cache.backends.locmem.LocMemCache",
+        ),
+        "LOCATION": os.getenv("CACHE_LOCATION", default="foodgram"),
+    },
+    "tokens": {
+        "BACKEND": os.getenv(
+            "TOKEN_CACHE_BACKEND",
+            default="django.core.cache.backends.dummy.DummyCache",
+        ),
+        "LOCATION": os.getenv("TOKEN_CACHE_LOCATION", default="tokens"),
+        "TIMEOUT": int(os.getenv("TOKEN_CACHE_TIMEOUT", default=300)),
+        "OPTIONS": {
+            "MAX_ENTRIES": int(os.getenv("TOKEN_CACHE_SIZE", default=10000)),
+        },
     },
 }
 
@@ -97,7 +139,7 @@ REST_FRAMEWORK = {
         "rest_framework.permissions.IsAuthenticatedOrReadOnly",
     ],
     "DEFAULT_AUTHENTICATION_CLASSES": [
-        "rest_framework.authentication.TokenAuthentication",
+        "api.authentication.CachedTokenAuthentication",
     ],
 }
 
@@ -130,7 +172,9 @@ STATIC_URL = "/static/"
 STATIC_ROOT = os.path.join(BASE_DIR, "static/")
 
 MEDIA_URL = "/media/"
-MEDIA_ROOT = os.path.join(BASE_DIR, "media")
+MEDIA_ROOT = os.getenv(
+    "MEDIA_ROOT", default=os.path.join(BASE_DIR, "media")
+)
 
 NUM_SHOW = 3
 NAME_LEN = 15
@@ -139,6 +183,27 @@ MIN_COOKING_TIME = 1
 MAX_AMOUNT = 24768
 MIN_AMOUNT = 1
 DATE_TIME_FORMAT = "%d/%m/%Y %H:%M"
+FEED_BATCH_SIZE = 1000
+MAX_TAGS = 63
+BULK_RECIPES_LIMIT = 100
+TOKEN_CACHE_ALIAS = "tokens"
+ASYNC_DB_THREADS = int(os.getenv("ASYNC_DB_THREADS", default=8))
+SHOPPING_LIST_PDF_FONT = os.getenv(
+    "SHOPPING_LIST_PDF_FONT",
+    default="/usr/share/fonts/truetype/dejavu/DejaVuSans.ttf",
+)
+SHOPPING_LIST_SPOOL_SIZE = 1024 * 1024
+CATALOG_CACHE_MAX_AGE = 60
+RECIPES_CACHE_ALIAS = "default"
+RECIPES_CACHE_TIMEOUT = 300
+RECIPE_IMAGE_VARIANTS = {"thumbnail": 150, "card": 480, "full": 1200}
+RECIPE_IMAGE_QUALITY = 80
+RECIPE_IMAGE_MAX_UPLOAD_SIZE = 10 * 1024 * 1024
+RECIPE_UPLOAD_MAX_AGE = 24 * 60 * 60
+INGREDIENT_INDEX_PATH = os.getenv(
+    "INGREDIENT_INDEX_PATH",
+    default=os.path.join(tempfile.gettempdir(), "foodgram_ingredients.idx"),
+)
 
 AUTH_USER_MODEL = "users.User"
 DEFAULT_AUTO_FIELD = "django.db.models.BigAutoField"
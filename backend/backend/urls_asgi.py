@@ -0,0 +1,24 @@
+"""
+Урлы для ASGI: горячие эндпоинты чтения обслуживают асинхронные
+представления, остальные маршруты те же, что в backend.urls.
+"""
+from api.async_views import (download_shopping_cart, ingredient_list,
+                             recipe_detail, recipe_list, subscription_list,
+                             tag_detail, tag_list)
+from django.urls import path
+
+from .urls import urlpatterns as sync_urlpatterns
+
+urlpatterns = [
+    path('api/recipes/', recipe_list),
+    path('api/recipes/<int:pk>/', recipe_detail),
+    path(
+        'api/recipes/download_shopping_cart/',
+        download_shopping_cart,
+    ),
+    path('api/ingredients/', ingredient_list),
+    path('api/tags/', tag_list),
+    path('api/tags/<int:pk>/', tag_detail),
+    path('api/users/subscriptions/', subscription_list),
+    *sync_urlpatterns,
+]
@@ -0,0 +1,24 @@
+"""Денормализованные счётчики"""
+from django.db.models import Count, F, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce, Greatest
+
+
+def change_counter(model, pk, field, delta):
+    """Атомарное изменение счётчика одним UPDATE, без чтения строки"""
+    model.objects.filter(pk=pk).update(
+        **{field: Greatest(F(field) + delta, Value(0))}
+    )
+
+
+def recount_counter(model, field, related_model, related_field):
+    """Пересчёт счётчика во всех строках model одним UPDATE"""
+    counts = (
+        related_model.objects.filter(**{related_field: OuterRef("pk")})
+        .order_by()
+        .values(related_field)
+        .annotate(total=Count("pk"))
+        .values("total")
+    )
+    return model.objects.update(
+        **{field: Coalesce(Subquery(counts), Value(0))}
+    )
@@ -0,0 +1,50 @@
+"""
+PostgreSQL с пулом соединений процесса.
+
+Django по-прежнему открывает и закрывает соединение по CONN_MAX_AGE,
+но вместо подключения к серверу берёт его из пула, а при закрытии
+возвращает обратно. Параметры пула — в DATABASES[alias]["POOL"].
+"""
+from functools import partial
+
+from django.db.backends.postgresql import base
+from django.utils.asyncio import async_unsafe
+
+from core.db.pool import get_pool
+
+from .creation import DatabaseCreation
+
+TARGET_SETTINGS = ("HOST", "PORT", "NAME", "USER")
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    """Бэкенд postgresql, соединения которого живут в пуле"""
+
+    creation_class = DatabaseCreation
+
+    def get_pool(self):
+        options = self.settings_dict.get("POOL") or {}
+        return get_pool(
+            self.alias,
+            tuple(self.settings_dict[key] for key in TARGET_SETTINGS),
+            **{key.lower(): value for key, value in options.items()},
+        )
+
+    @async_unsafe
+    def get_new_connection(self, conn_params):
+        connection = self.get_pool().getconn(
+            partial(super().get_new_connection, conn_params)
+        )
+        # новое соединение задаёт isolation_level в get_new_connection
+        self.isolation_level = self.settings_dict["OPTIONS"].get(
+            "isolation_level", connection.isolation_level
+        )
+        return connection
+
+    def _close(self):
+        if self.connection is not None:
+            with self.wrap_database_errors:
+                # закрытое внутри atomic соединение остаётся у Django
+                self.get_pool().putconn(
+                    self.connection, discard=self.in_atomic_block
+                )
@@ -0,0 +1,19 @@
+"""Тестовые БД бэкенда с пулом соединений"""
+from django.db.backends.postgresql import creation
+
+from core.db.pool import close_pool
+
+
+class DatabaseCreation(creation.DatabaseCreation):
+    """
+    Свободные соединения пула держат тестовую БД открытой, и PostgreSQL
+    не даёт её удалить или скопировать: перед этим пул закрывается.
+    """
+
+    def _clone_test_db(self, suffix, verbosity, keepdb=False):
+        close_pool(self.connection.alias)
+        super()._clone_test_db(suffix, verbosity, keepdb)
+
+    def _destroy_test_db(self, test_database_name, verbosity):
+        close_pool(self.connection.alias)
+        super()._destroy_test_db(test_database_name, verbosity)
@@ -0,0 +1,242 @@
+"""
+Пул соединений с БД внутри процесса.
+
+Пул общий для всех потоков процесса: потоков WSGI-воркера или пула
+ASYNC_DB_THREADS под ASGI. Не больше max_size соединений открыто
+одновременно; если все заняты, поток ждёт свободное не дольше timeout.
+Соединение, простоявшее без дела дольше check_interval, перед выдачей
+проверяется запросом SELECT 1, а прожившее дольше max_lifetime
+закрывается при возврате. Пулы привязаны к pid: после fork (gunicorn
+с --preload) процесс получает новый пул и не трогает сокеты родителя.
+Пул привязан и к адресу БД: если настройки alias сменились (тестовая
+БД), соединения прежнего пула закрываются и не выдаются.
+"""
+import os
+import threading
+import time
+from collections import deque
+
+from django.db import OperationalError
+
+
+class PoolTimeout(OperationalError):
+    """Свободное соединение не появилось за timeout секунд"""
+
+
+class PooledConnection:
+    """Соединение и время его открытия и последнего возврата"""
+
+    def __init__(self, connection):
+        self.connection = connection
+        self.created = self.returned = time.monotonic()
+
+
+class ConnectionPool:
+    """Потокобезопасный пул соединений"""
+
+    def __init__(
+        self,
+        min_size=0,
+        max_size=10,
+        timeout=30,
+        max_lifetime=3600,
+        check_interval=30,
+        target=None,
+    ):
+        self.target = target
+        self.min_size = min_size
+        self.max_size = max_size
+        self.timeout = timeout
+        self.max_lifetime = max_lifetime
+        self.check_interval = check_interval
+        self.pid = os.getpid()
+        self.condition = threading.Condition()
+        self.idle = deque()
+        self.in_use = {}
+        self.size = 0
+        self.stats = dict.fromkeys(
+            ("checkouts", "created", "closed", "waits", "timeouts"), 0
+        )
+        self.stats["wait_seconds"] = 0.0
+
+    def reserve(self, deadline):
+        """Свободное соединение или None, если можно открыть новое"""
+        waited = False
+        started = time.monotonic()
+        with self.condition:
+            while not self.idle and self.size >= self.max_size:
+                remaining = deadline - time.monotonic()
+                if remaining <= 0:
+                    self.stats["timeouts"] += 1
+                    raise PoolTimeout(
+                        f"Нет свободных соединений за {self.timeout} с "
+                        f"(max_size={self.max_size})"
+                    )
+                waited = True
+                self.condition.wait(remaining)
+            if waited:
+                self.stats["waits"] += 1
+                self.stats["wait_seconds"] += time.monotonic() - started
+            if self.idle:
+                return self.idle.pop()
+            self.size += 1
+            return None
+
+    def open(self, connect):
+        """Новое соединение на уже зарезервированное место"""
+        try:
+            item = PooledConnection(connect())
+        except Exception:
+            with self.condition:
+                self.size -= 1
+                self.condition.notify()
+            raise
+        with self.condition:
+            self.stats["created"] += 1
+        return item
+
+    def getconn(self, connect):
+        """
+        Соединение из пула; connect() открывает новое, если свободных
+        нет и max_size не достигнут.
+        """
+        deadline = time.monotonic() + self.timeout
+        while True:
+            item = self.reserve(deadline)
+            if item is None:
+                item = self.open(connect)
+                self.fill(connect)
+            elif not self.is_healthy(item):
+                self.discard(item)
+                continue
+            with self.condition:
+                self.in_use[id(item.connection)] = item
+                self.stats["checkouts"] += 1
+            return item.connection
+
+    def putconn(self, connection, discard=False):
+        """Возврат соединения; discard=True — закрыть, а не сохранять"""
+        with self.condition:
+            item = self.in_use.pop(id(connection), None)
+        if item is None:
+            connection.close()
+            return
+        if (
+            discard
+            or self.is_expired(item)
+            or not self.reset(connection)
+        ):
+            self.discard(item)
+            return
+        item.returned = time.monotonic()
+        with self.condition:
+            self.idle.append(item)
+            self.condition.notify()
+
+    def fill(self, connect):
+        """Дополнение пула свободными соединениями до min_size"""
+        while True:
+            with self.condition:
+                if self.size >= self.min_size:
+                    return
+                self.size += 1
+            try:
+                item = self.open(connect)
+            except Exception:
+                # соединение для запроса уже выдано, прогрев подождёт
+                return
+            with self.condition:
+                self.idle.appendleft(item)
+                self.condition.notify()
+
+    def discard(self, item):
+        try:
+            item.connection.close()
+        except Exception:
+            pass
+        with self.condition:
+            self.size -= 1
+            self.stats["closed"] += 1
+            self.condition.notify()
+
+    def is_expired(self, item):
+        return (
+            self.max_lifetime is not None
+            and time.monotonic() - item.created > self.max_lifetime
+        )
+
+    def is_healthy(self, item):
+        connection = item.connection
+        if connection.closed or self.is_expired(item):
+            return False
+        if time.monotonic() - item.returned < self.check_interval:
+            return True
+        try:
+            with connection.cursor() as cursor:
+                cursor.execute("SELECT 1")
+            connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    def reset(self, connection):
+        """Откат незавершённой транзакции; False — соединение негодно"""
+        if connection.closed:
+            return False
+        try:
+            connection.rollback()
+        except Exception:
+            return False
+        return True
+
+    def close(self):
+        with self.condition:
+            items = list(self.idle)
+            self.idle.clear()
+        for item in items:
+            self.discard(item)
+
+    def get_stats(self):
+        with self.condition:
+            return {
+                "size": self.size,
+                "idle": len(self.idle),
+                "in_use": len(self.in_use),
+                "max_size": self.max_size,
+                **self.stats,
+            }
+
+
+pools = {}
+pools_lock = threading.Lock()
+
+
+def get_pool(alias, target=None, **options):
+    """Пул для alias в текущем процессе; target — адрес БД"""
+    with pools_lock:
+        current = pools.get(alias)
+        if current is None or current.pid != os.getpid():
+            # соединения родителя после fork не закрываются: сокеты общие
+            pools[alias] = ConnectionPool(target=target, **options)
+        elif current.target != target:
+            current.close()
+            pools[alias] = ConnectionPool(target=target, **options)
+        return pools[alias]
+
+
+def close_pool(alias):
+    """Закрытие свободных соединений пула alias текущего процесса"""
+    with pools_lock:
+        pool = pools.pop(alias, None)
+    if pool is not None and pool.pid == os.getpid():
+        pool.close()
+
+
+def get_pools_stats():
+    with pools_lock:
+        items = [
+            (alias, pool)
+            for alias, pool in pools.items()
+            if pool.pid == os.getpid()
+        ]
+    return {alias: pool.get_stats() for alias, pool in items}
@@ -1,5 +1,7 @@
 """Модель для приложения Core"""
-from django.db.models import DateTimeField, Model
+from django.db.models import (CharField, DateTimeField, F, Model,
+                              PositiveBigIntegerField, QuerySet)
+from django.utils.timezone import now
 
 
 class CoreModel(Model):
@@ -11,3 +13,43 @@ class CoreModel(Model):
 
     class Meta:
         abstract = True
+
+
+class ContentVersionQuerySet(QuerySet):
+    """Счётчики версий данных для условных запросов и кэша"""
+
+    def get_version(self, key):
+        """Текущая версия и время её изменения"""
+        content_version, _ = self.get_or_create(key=key)
+        return content_version.version, content_version.updated
+
+    def get_versions(self, keys):
+        """Версии нескольких наборов данных одним запросом"""
+        versions = dict(
+            self.filter(key__in=keys).values_list("key", "version")
+        )
+        return tuple(versions.get(key, 0) for key in keys)
+
+    def bump(self, key):
+        """Увеличение версии одним UPDATE, строка создаётся при отсутствии"""
+        if not self.filter(key=key).update(
+            version=F("version") + 1, updated=now()
+        ):
+            self.get_or_create(key=key)
+
+
+class ContentVersion(Model):
+    """Версия набора данных, увеличивается при каждом изменении"""
+
+    key = CharField("Ключ", max_length=50, primary_key=True)
+    version = PositiveBigIntegerField("Версия", default=1)
+    updated = DateTimeField("Дата изменения", default=now)
+
+    objects = ContentVersionQuerySet.as_manager()
+
+    class Meta:
+        verbose_name = "Версия данных"
+        verbose_name_plural = "Версии данных"
+
+    def __str__(self):
+        return f"{self.key}: {self.version}"
@@ -0,0 +1,36 @@
+"""
+Настройки gunicorn: метрики Prometheus со всех воркеров.
+
+Воркеры пишут метрики в файлы каталога PROMETHEUS_MULTIPROC_DIR,
+/api/metrics/ суммирует их. Если переменная не задана, на время
+работы сервера создаётся временный каталог. Файлы прошлого запуска
+удаляются до старта воркеров, завершившийся воркер убирается
+из суммы живых значений.
+"""
+import os
+import shutil
+import tempfile
+
+METRICS_DIR = "PROMETHEUS_MULTIPROC_DIR"
+
+
+def on_starting(server):
+    directory = os.environ.get(METRICS_DIR)
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
+        os.makedirs(directory)
+    else:
+        os.environ[METRICS_DIR] = tempfile.mkdtemp(prefix="foodgram-metrics-")
+        server.temporary_metrics_dir = os.environ[METRICS_DIR]
+
+
+def child_exit(server, worker):
+    from prometheus_client import multiprocess
+
+    multiprocess.mark_process_dead(worker.pid)
+
+
+def on_exit(server):
+    directory = getattr(server, "temporary_metrics_dir", None)
+    if directory:
+        shutil.rmtree(directory, ignore_errors=True)
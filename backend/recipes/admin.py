@@ -54,12 +54,12 @@ class IngredientAdmin(ModelAdmin):
 class RecipeAdmin(ModelAdmin):
     """Админ панель для рецептов"""
 
-    def favorite_recipes_count(self, obj):
-        """Количество в избранном рецепте"""
-        return obj.favorite_recipes.count()
-
-    favorite_recipes_count.short_description = "Сколько в избранном"
-    list_display = ("name", "author", "favorite_recipes_count")
+    list_display = (
+        "name",
+        "author",
+        "favorites_count",
+        "shopping_cart_count",
+    )
     list_filter = (
         "name",
         "author__username",
@@ -6,3 +6,6 @@ class RecipesConfig(AppConfig):
     """Конфиг приложения Recipes"""
 
     name = 'recipes'
+
+    def ready(self):
+        import recipes.signals  # noqa: F401
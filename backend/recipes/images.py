@@ -0,0 +1,87 @@
+"""Уменьшенные копии изображений рецептов (JPEG и WebP)"""
+import logging
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from PIL import Image, ImageOps
+
+logger = logging.getLogger(__name__)
+
+VARIANTS_DIR = "recipe_images/variants"
+FORMATS = {"jpeg": ("JPEG", "jpg"), "webp": ("WEBP", "webp")}
+
+
+def get_variant_name(image_name, variant, image_format):
+    """Имя файла копии однозначно определяется именем оригинала"""
+    stem = os.path.splitext(os.path.basename(image_name))[0]
+    extension = FORMATS[image_format][1]
+    return f"{VARIANTS_DIR}/{stem}_{variant}.{extension}"
+
+
+def get_variant_names(image_name):
+    for variant in settings.RECIPE_IMAGE_VARIANTS:
+        for image_format in FORMATS:
+            yield get_variant_name(image_name, variant, image_format)
+
+
+def make_variants(image_name, storage=default_storage):
+    """
+    Создание всех копий: ширина по RECIPE_IMAGE_VARIANTS, без увеличения.
+    Возвращает перечень копий {вариант: {формат: имя файла}}.
+    """
+    with storage.open(image_name, "rb") as image_file:
+        source = Image.open(image_file)
+        source.load()
+    source = ImageOps.exif_transpose(source).convert("RGB")
+    variants = {}
+    for variant, width in settings.RECIPE_IMAGE_VARIANTS.items():
+        resized = source.copy()
+        resized.thumbnail((width, width * 4), Image.LANCZOS)
+        for image_format, (pil_format, _) in FORMATS.items():
+            buffer = BytesIO()
+            resized.save(
+                buffer,
+                pil_format,
+                quality=settings.RECIPE_IMAGE_QUALITY,
+                optimize=True,
+            )
+            name = get_variant_name(image_name, variant, image_format)
+            storage.delete(name)
+            variants.setdefault(variant, {})[image_format] = storage.save(
+                name, ContentFile(buffer.getvalue())
+            )
+    return variants
+
+
+def build_variants(image_name):
+    """Перечень созданных копий; если изображение не читается — пустой"""
+    try:
+        return make_variants(image_name)
+    except (OSError, ValueError):
+        logger.exception("Не удалось обработать изображение %s", image_name)
+        return {}
+
+
+def delete_variants(image_name, storage=default_storage):
+    for name in get_variant_names(image_name):
+        storage.delete(name)
+
+
+def get_variant_urls(variants, request=None):
+    """
+    Адреса копий из перечня Recipe.image_variants: {вариант: {формат:
+    url}}. Хранилище не опрашивается; без копий — None.
+    """
+    if not variants:
+        return None
+    urls = {}
+    for variant, names in variants.items():
+        for image_format, name in names.items():
+            url = default_storage.url(name)
+            if request is not None:
+                url = request.build_absolute_uri(url)
+            urls.setdefault(variant, {})[image_format] = url
+    return urls
@@ -0,0 +1,110 @@
+"""
+Потоковая загрузка каталога ингредиентов из CSV или JSON.
+
+Файл читается по частям, строки собираются в пачки фиксированного
+размера и вставляются через bulk_create(ignore_conflicts=True): уже
+существующие пары (name, measurement_unit) пропускает ограничение
+unique_for_ingredient, их id не меняются. Память ограничена размером
+пачки и не зависит от размера файла.
+"""
+import csv
+import json
+from itertools import islice
+
+from django.db import transaction
+
+from .models import Ingredient
+
+READ_SIZE = 64 * 1024
+
+
+def read_csv(file):
+    """Строки «название,единица измерения»"""
+    for row in csv.reader(file):
+        if row:
+            yield row[0], row[1] if len(row) > 1 else ""
+
+
+def read_json(file):
+    """
+    Объекты {"name": ..., "measurement_unit": ...} из JSON-массива
+    или по одному на строку (JSON Lines), без чтения файла целиком.
+    """
+    decoder = json.JSONDecoder()
+    buffer = ""
+    position = 0
+    finished = False
+    while True:
+        # разделители между объектами массива
+        while position < len(buffer) and buffer[position] in "[],\r\n\t ":
+            position += 1
+        try:
+            item, position = decoder.raw_decode(buffer, position)
+        except json.JSONDecodeError:
+            if finished:
+                if buffer[position:].strip():
+                    raise
+                return
+            chunk = file.read(READ_SIZE)
+            finished = not chunk
+            buffer = buffer[position:] + chunk
+            position = 0
+            continue
+        yield item.get("name", ""), item.get("measurement_unit", "")
+
+
+READERS = {"csv": read_csv, "json": read_json}
+
+
+def get_format(path, file_format=None):
+    """Формат файла: явно указанный или по расширению"""
+    file_format = file_format or str(path).rsplit(".", 1)[-1].lower()
+    if file_format == "jsonl":
+        return "json"
+    if file_format not in READERS:
+        raise ValueError(f"Неизвестный формат файла: {file_format}")
+    return file_format
+
+
+def clean_rows(rows):
+    """Обрезка пробелов; пустые и слишком длинные значения — None"""
+    max_lengths = (
+        Ingredient._meta.get_field("name").max_length,
+        Ingredient._meta.get_field("measurement_unit").max_length,
+    )
+    for row in rows:
+        values = tuple(str(value).strip() for value in row)
+        if all(
+            0 < len(value) <= max_length
+            for value, max_length in zip(values, max_lengths)
+        ):
+            yield values
+        else:
+            yield None
+
+
+def load_ingredients(path, file_format=None, batch_size=5000):
+    """
+    Загрузка ингредиентов пачками. После каждой пачки отдаёт
+    (прочитано строк, пропущено некорректных).
+    """
+    reader = READERS[get_format(path, file_format)]
+    read = skipped = 0
+    with open(path, encoding="utf-8", newline="") as file:
+        rows = clean_rows(reader(file))
+        while True:
+            batch = list(islice(rows, batch_size))
+            if not batch:
+                return
+            read += len(batch)
+            ingredients = [
+                Ingredient(name=row[0], measurement_unit=row[1])
+                for row in batch
+                if row is not None
+            ]
+            skipped += len(batch) - len(ingredients)
+            with transaction.atomic():
+                Ingredient.objects.bulk_create(
+                    ingredients, ignore_conflicts=True
+                )
+            yield read, skipped
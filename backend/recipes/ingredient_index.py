@@ -0,0 +1,161 @@
+"""
+Индекс ингредиентов для поиска по началу названия без запросов к БД.
+
+Индекс хранится в одном файле: заголовок, массив смещений uint32 и
+записи «ключ\\0id\\0название\\0единица» в UTF-8, отсортированные по
+ключу (название в casefold). Файл отображается в память через mmap,
+поэтому все воркеры gunicorn делят одну копию в page cache. Поиск —
+бинарный по ключам, порядок байт UTF-8 совпадает с порядком символов.
+При изменении ингредиентов файл пересобирается и атомарно заменяется,
+остальные процессы замечают замену по stat() и переоткрывают его.
+"""
+import bisect
+import logging
+import mmap
+import os
+import struct
+import threading
+from collections import namedtuple
+
+from django.conf import settings
+
+logger = logging.getLogger(__name__)
+
+MAGIC = b"IGX1"
+HEADER = struct.Struct("<4sI")
+OFFSET = struct.Struct("<I")
+SEPARATOR = b"\0"
+
+IndexedIngredient = namedtuple(
+    "IndexedIngredient", ("id", "name", "measurement_unit")
+)
+
+
+def make_key(text):
+    """Ключ поиска: регистр не учитывается"""
+    return text.strip().casefold().encode("utf-8")
+
+
+def build_index(path=None):
+    """Сборка файла индекса из таблицы ингредиентов"""
+    from .models import Ingredient
+
+    path = path or settings.INGREDIENT_INDEX_PATH
+    records = sorted(
+        SEPARATOR.join(
+            (
+                make_key(name),
+                str(pk).encode(),
+                name.encode("utf-8"),
+                unit.encode("utf-8"),
+            )
+        )
+        for pk, name, unit in Ingredient.objects.order_by().values_list(
+            "id", "name", "measurement_unit"
+        ).iterator()
+    )
+    offsets, position = [], 0
+    for record in records:
+        offsets.append(position)
+        position += len(record)
+    offsets.append(position)
+
+    tmp_path = f"{path}.{os.getpid()}.tmp"
+    with open(tmp_path, "wb") as index_file:
+        index_file.write(HEADER.pack(MAGIC, len(records)))
+        index_file.write(struct.pack(f"<{len(offsets)}I", *offsets))
+        for record in records:
+            index_file.write(record)
+    os.replace(tmp_path, path)
+    return len(records)
+
+
+class _Snapshot:
+    """Одна версия файла индекса: записи и их ключи для bisect"""
+
+    def __init__(self, index_map):
+        magic, self.count = HEADER.unpack_from(index_map, 0)
+        if magic != MAGIC:
+            raise OSError("Файл не является индексом ингредиентов")
+        self.map = index_map
+        self.data_start = HEADER.size + OFFSET.size * (self.count + 1)
+
+    def __len__(self):
+        return self.count
+
+    def __getitem__(self, number):
+        record = self.record(number)
+        return record[: record.index(SEPARATOR)]
+
+    def _offset(self, number):
+        return OFFSET.unpack_from(
+            self.map, HEADER.size + OFFSET.size * number
+        )[0]
+
+    def record(self, number):
+        start = self.data_start + self._offset(number)
+        return self.map[start: self.data_start + self._offset(number + 1)]
+
+
+class IngredientIndex:
+    """Файл индекса, отображённый в память"""
+
+    def __init__(self, path):
+        self.path = path
+        self._snapshot = None
+        self._stat = None
+        self._lock = threading.Lock()
+
+    def refresh(self):
+        """Переоткрытие файла, если его заменили после последнего чтения"""
+        stat = os.stat(self.path)
+        signature = (stat.st_ino, stat.st_mtime_ns, stat.st_size)
+        if signature == self._stat:
+            return
+        with self._lock:
+            with open(self.path, "rb") as index_file:
+                index_map = mmap.mmap(
+                    index_file.fileno(), 0, access=mmap.ACCESS_READ
+                )
+            self._snapshot = _Snapshot(index_map)
+            self._stat = signature
+
+    def search(self, prefix="", limit=None):
+        """Ингредиенты, название которых начинается с prefix"""
+        snapshot = self._snapshot
+        prefix = make_key(prefix)
+        number = bisect.bisect_left(snapshot, prefix)
+        results = []
+        while number < snapshot.count and (
+            limit is None or len(results) < limit
+        ):
+            key, pk, name, unit = snapshot.record(number).split(SEPARATOR)
+            if not key.startswith(prefix):
+                break
+            results.append(
+                IndexedIngredient(int(pk), name.decode(), unit.decode())
+            )
+            number += 1
+        return results
+
+
+_index = None
+
+
+def get_ingredient_index():
+    """
+    Индекс текущего процесса; при первом обращении файл собирается,
+    если его ещё нет. None, если индекс недоступен: тогда поиск идёт в БД.
+    """
+    global _index
+    path = settings.INGREDIENT_INDEX_PATH
+    try:
+        if not os.path.exists(path):
+            build_index(path)
+        if _index is None or _index.path != path:
+            _index = IngredientIndex(path)
+        _index.refresh()
+    except OSError:
+        logger.exception("Индекс ингредиентов недоступен")
+        return None
+    return _index
@@ -0,0 +1,14 @@
+"""Удаление невостребованных загрузок изображений"""
+from django.core.management.base import BaseCommand
+from recipes.uploads import delete_expired_uploads
+
+
+class Command(BaseCommand):
+    """Команда для периодической очистки media/recipe_uploads"""
+
+    help = "Удаляем загрузки старше RECIPE_UPLOAD_MAX_AGE секунд"
+
+    def handle(self, **options):
+        """Обход каталогов загрузок всех пользователей"""
+        deleted = delete_expired_uploads()
+        self.stdout.write(f"Удалено загрузок: {deleted}")
@@ -1,22 +1,58 @@
 """Загружаем данные ингредиентов из файла"""
-import csv
+import time
 
-from django.core.management.base import BaseCommand
+from core.models import ContentVersion
+from django.core.management.base import BaseCommand, CommandError
+from recipes.ingredient_import import READERS, get_format, load_ingredients
+from recipes.ingredient_index import build_index
 from recipes.models import Ingredient
 
 
 class Command(BaseCommand):
-    """Команда для загрузки ингредиентов из файла"""
+    """
+    Команда для загрузки ингредиентов из CSV или JSON.
+    Повторный запуск безопасен: существующие ингредиенты не меняются.
+    """
 
     help = "Загружаем данные ингредиентов из файла"
 
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "path",
+            nargs="?",
+            default="data/ingredients.csv",
+            help="Файл CSV (название,единица) или JSON/JSON Lines",
+        )
+        parser.add_argument("--format", choices=tuple(READERS))
+        parser.add_argument("--batch-size", type=int, default=5000)
+
     def handle(self, **options):
         """Загружаем данные ингредиентов из файла"""
-        with open("data/ingredients.csv", encoding="utf-8") as csv_file:
-            reader = csv.reader(csv_file, delimiter=",")
-            Ingredient.objects.bulk_create(
-                [
-                    Ingredient(id=num, name=line[0], measurement_unit=line[1])
-                    for num, line in enumerate(reader)
-                ]
-            )
+        path = options["path"]
+        try:
+            get_format(path, options["format"])
+        except ValueError as error:
+            raise CommandError(error)
+        before = Ingredient.objects.count()
+        started = time.perf_counter()
+        read = skipped = 0
+        try:
+            for read, skipped in load_ingredients(
+                path, options["format"], options["batch_size"]
+            ):
+                elapsed = time.perf_counter() - started
+                self.stdout.write(
+                    f"Прочитано {read} строк, "
+                    f"{read / elapsed:.0f} строк/с"
+                )
+        except (OSError, ValueError) as error:
+            raise CommandError(error)
+        added = Ingredient.objects.count() - before
+        elapsed = time.perf_counter() - started
+        self.stdout.write(
+            f"Готово за {elapsed:.1f} с: прочитано {read}, добавлено {added}, "
+            f"повторов {read - skipped - added}, пропущено {skipped}"
+        )
+        # bulk_create не вызывает сигналы ингредиентов
+        build_index()
+        ContentVersion.objects.bump("ingredients")
@@ -0,0 +1,34 @@
+"""Создание уменьшенных копий для уже загруженных изображений"""
+from core.models import ContentVersion
+from django.core.management.base import BaseCommand
+from recipes.images import build_variants
+from recipes.models import Recipe
+
+
+class Command(BaseCommand):
+    """Команда для заполнения media/recipe_images/variants"""
+
+    help = "Создаём копии изображений рецептов (thumbnail, card, full)"
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            "--force",
+            action="store_true",
+            help="Пересоздать копии, даже если они уже есть в перечне",
+        )
+
+    def handle(self, **options):
+        """Обход рецептов с изображениями"""
+        created = 0
+        recipes = Recipe.objects.exclude(image="").only(
+            "id", "image", "image_variants"
+        )
+        if not options["force"]:
+            recipes = recipes.filter(image_variants={})
+        for recipe in recipes.iterator():
+            variants = build_variants(recipe.image.name)
+            Recipe.objects.filter(pk=recipe.pk).update(image_variants=variants)
+            created += bool(variants)
+        if created:
+            ContentVersion.objects.bump("recipes")
+        self.stdout.write(f"Обработано изображений: {created}")
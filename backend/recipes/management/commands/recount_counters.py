@@ -0,0 +1,56 @@
+"""Пересчёт денормализованных счётчиков и списков покупок"""
+from core.counters import recount_counter
+from django.contrib.auth import get_user_model
+from django.core.management.base import BaseCommand
+from django.db import transaction
+from recipes.models import Favorite, Recipe, ShoppingCart, ShoppingListItem
+from users.models import Subscriptions
+
+User = get_user_model()
+
+COUNTERS = (
+    (Recipe, "favorites_count", Favorite, "favorite_recipe"),
+    (Recipe, "shopping_cart_count", ShoppingCart, "recipe"),
+    (User, "recipes_count", Recipe, "author"),
+    (User, "followers_count", Subscriptions, "author"),
+)
+BATCH_SIZE = 1000
+
+
+class Command(BaseCommand):
+    """Команда для исправления расхождений в счётчиках"""
+
+    help = (
+        "Пересчитываем счётчики избранного, покупок, рецептов и подписчиков "
+        "и списки покупок"
+    )
+
+    @transaction.atomic
+    def handle(self, **options):
+        """Каждый счётчик пересчитывается одним UPDATE"""
+        for model, field, related_model, related_field in COUNTERS:
+            updated = recount_counter(
+                model, field, related_model, related_field
+            )
+            self.stdout.write(
+                f"{model._meta.verbose_name_plural}.{field}: "
+                f"обновлено строк {updated}"
+            )
+        # списки собираются по корзинам и тем, у кого корзина уже пуста
+        user_ids = sorted(
+            set(
+                ShoppingCart.objects.order_by()
+                .values_list("user_id", flat=True)
+                .distinct()
+            )
+            | set(
+                ShoppingListItem.objects.order_by()
+                .values_list("user_id", flat=True)
+                .distinct()
+            )
+        )
+        for start in range(0, len(user_ids), BATCH_SIZE):
+            ShoppingListItem.objects.rebuild(
+                user_ids[start:start + BATCH_SIZE]
+            )
+        self.stdout.write(f"Списки покупок пересобраны: {len(user_ids)}")
@@ -0,0 +1,56 @@
+# Generated by Django 3.2 on 2026-10-18 19:13
+
+from django.db import migrations, models
+from django.db.models import Count, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def recount_counter(model, field, related_model, related_field):
+    counts = (
+        related_model.objects.filter(**{related_field: OuterRef('pk')})
+        .order_by()
+        .values(related_field)
+        .annotate(total=Count('pk'))
+        .values('total')
+    )
+    model.objects.update(**{field: Coalesce(Subquery(counts), Value(0))})
+
+
+def fill_counters(apps, schema_editor):
+    Recipe = apps.get_model('recipes', 'Recipe')
+    User = apps.get_model('users', 'User')
+    recount_counter(
+        Recipe, 'favorites_count', apps.get_model('recipes', 'Favorite'),
+        'favorite_recipe',
+    )
+    recount_counter(
+        Recipe, 'shopping_cart_count',
+        apps.get_model('recipes', 'ShoppingCart'), 'recipe',
+    )
+    recount_counter(User, 'recipes_count', Recipe, 'author')
+    recount_counter(
+        User, 'followers_count', apps.get_model('users', 'Subscriptions'),
+        'author',
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0006_feeditem'),
+        ('users', '0003_counters'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='favorites_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сколько в избранном'),
+        ),
+        migrations.AddField(
+            model_name='recipe',
+            name='shopping_cart_count',
+            field=models.PositiveIntegerField(default=0, editable=False, verbose_name='Сколько в списках покупок'),
+        ),
+        migrations.RunPython(fill_counters, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,50 @@
+# Generated by Django 3.2 on 2026-10-18 19:41
+
+import django.core.validators
+from django.db import migrations, models
+
+
+def fill_tags_mask(apps, schema_editor):
+    Tag = apps.get_model('recipes', 'Tag')
+    Recipe = apps.get_model('recipes', 'Recipe')
+    TagRecipe = apps.get_model('recipes', 'TagRecipe')
+    tags = list(Tag.objects.order_by('id'))
+    for bit_index, tag in enumerate(tags):
+        tag.bit_index = bit_index
+    Tag.objects.bulk_update(tags, ['bit_index'])
+    masks = {}
+    for recipe_id, bit_index in TagRecipe.objects.values_list(
+        'recipe_id', 'tag__bit_index'
+    ):
+        masks[recipe_id] = masks.get(recipe_id, 0) | 1 << bit_index
+    Recipe.objects.bulk_update(
+        [Recipe(pk=pk, tags_mask=mask) for pk, mask in masks.items()],
+        ['tags_mask'],
+        batch_size=1000,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0010_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='tags_mask',
+            field=models.BigIntegerField(default=0, editable=False, verbose_name='Маска тегов'),
+        ),
+        migrations.AddField(
+            model_name='tag',
+            name='bit_index',
+            field=models.PositiveSmallIntegerField(editable=False, null=True, unique=True, validators=[django.core.validators.MaxValueValidator(62)], verbose_name='Номер бита в маске тегов рецепта'),
+        ),
+        migrations.RunPython(fill_tags_mask, migrations.RunPython.noop),
+        migrations.AlterField(
+            model_name='tag',
+            name='bit_index',
+            field=models.PositiveSmallIntegerField(editable=False, unique=True, validators=[django.core.validators.MaxValueValidator(62)], verbose_name='Номер бита в маске тегов рецепта'),
+        ),
+    ]
@@ -0,0 +1,48 @@
+# Generated by Django 3.2 on 2026-10-18 21:05
+
+from django.db import migrations
+
+# номера установленных битов маски: GIN-индекс по массиву отвечает
+# на пересечение && без просмотра строк
+POSTGRESQL_INSTALL = (
+    """
+    CREATE OR REPLACE FUNCTION recipe_tag_bits(mask bigint)
+    RETURNS integer[] AS $$
+        SELECT coalesce(array_agg(position), '{}')
+        FROM generate_series(0, 62) AS position
+        WHERE mask & (1::bigint << position) <> 0
+    $$ LANGUAGE sql IMMUTABLE PARALLEL SAFE
+    """,
+    """
+    CREATE INDEX IF NOT EXISTS recipe_tag_bits_gin
+    ON recipes_recipe USING gin (recipe_tag_bits(tags_mask))
+    """,
+)
+POSTGRESQL_REMOVE = (
+    'DROP INDEX IF EXISTS recipe_tag_bits_gin',
+    'DROP FUNCTION IF EXISTS recipe_tag_bits(bigint)',
+)
+
+
+def run_postgresql(statements):
+    def run(apps, schema_editor):
+        if schema_editor.connection.vendor != 'postgresql':
+            return
+        for statement in statements:
+            schema_editor.execute(statement)
+
+    return run
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0011_tags_mask'),
+    ]
+
+    operations = [
+        migrations.RunPython(
+            run_postgresql(POSTGRESQL_INSTALL),
+            run_postgresql(POSTGRESQL_REMOVE),
+        ),
+    ]
@@ -0,0 +1,25 @@
+# Generated by Django 3.2 on 2026-10-18 21:20
+
+from django.db import migrations
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0012_tags_mask_gin'),
+    ]
+
+    operations = [
+        migrations.RemoveIndex(
+            model_name='favorite',
+            name='favorite_user_date_added_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='shoppingcart',
+            name='cart_user_date_added_idx',
+        ),
+        migrations.RemoveIndex(
+            model_name='tagrecipe',
+            name='tagrecipe_tag_recipe_idx',
+        ),
+    ]
@@ -0,0 +1,44 @@
+# Generated by Django 3.2 on 2026-10-18 21:35
+
+import os
+
+from django.conf import settings
+from django.core.files.storage import default_storage
+from django.db import migrations, models
+
+VARIANTS_DIR = 'recipe_images/variants'
+EXTENSIONS = {'jpeg': 'jpg', 'webp': 'webp'}
+
+
+def fill_image_variants(apps, schema_editor):
+    """Перечень копий, уже созданных на диске до этой миграции"""
+    Recipe = apps.get_model('recipes', 'Recipe')
+    recipes = Recipe.objects.exclude(image='').only('id', 'image')
+    for recipe in recipes.iterator():
+        stem = os.path.splitext(os.path.basename(recipe.image.name))[0]
+        variants = {}
+        for variant in settings.RECIPE_IMAGE_VARIANTS:
+            for image_format, extension in EXTENSIONS.items():
+                name = f'{VARIANTS_DIR}/{stem}_{variant}.{extension}'
+                if default_storage.exists(name):
+                    variants.setdefault(variant, {})[image_format] = name
+        if variants:
+            Recipe.objects.filter(pk=recipe.pk).update(
+                image_variants=variants
+            )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('recipes', '0013_drop_unused_filter_indexes'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='recipe',
+            name='image_variants',
+            field=models.JSONField(default=dict, editable=False, verbose_name='Копии изображения'),
+        ),
+        migrations.RunPython(fill_image_variants, migrations.RunPython.noop),
+    ]
@@ -1,15 +1,28 @@
 """Модели тегов, рецептов, ингредиентов и взаимозависимостей"""
 import textwrap
+from functools import partial
 
 from core.models import CoreModel
 from core.validators import hex_color_validator
 from django.contrib.auth import get_user_model
+from django.contrib.postgres.fields import ArrayField
+from django.contrib.postgres.search import (SearchQuery, SearchRank,
+                                            SearchVectorField)
+from django.core.exceptions import ValidationError
 from django.core.validators import MaxValueValidator, MinValueValidator
-from django.db import models
-from django.db.models.functions import Length
+from django.db import connections, models, transaction
+from django.db.models import (F, OuterRef, Prefetch, Subquery, Sum, Value,
+                              Window)
+from django.db.models.expressions import RawSQL
+from django.db.models.functions import Greatest, Length, RowNumber
+from django.utils import timezone
+from users.models import Subscriptions
 
-from backend.settings import (MAX_AMOUNT, MAX_COOKING_TIME, MIN_AMOUNT,
-                              MIN_COOKING_TIME, NAME_LEN)
+from backend.settings import (FEED_BATCH_SIZE, MAX_AMOUNT, MAX_COOKING_TIME,
+                              MAX_TAGS, MIN_AMOUNT, MIN_COOKING_TIME,
+                              NAME_LEN)
+
+from .search import FTS_TABLE, RECIPE_TABLE, SEARCH_CONFIG, get_fts_query
 
 User = get_user_model()
 
@@ -34,6 +47,12 @@ class Tag(models.Model):
         max_length=200,
         unique=True,
     )
+    bit_index = models.PositiveSmallIntegerField(
+        verbose_name="Номер бита в маске тегов рецепта",
+        unique=True,
+        editable=False,
+        validators=(MaxValueValidator(MAX_TAGS - 1),),
+    )
 
     class Meta:
         verbose_name = "Тег"
@@ -42,11 +61,31 @@ class Tag(models.Model):
     def __str__(self):
         return self.name[:NAME_LEN]
 
+    @property
+    def bit(self):
+        return 1 << self.bit_index
+
+    @staticmethod
+    def get_free_bit_index():
+        """Младший свободный бит маски; тегов не больше MAX_TAGS"""
+        used = set(Tag.objects.values_list("bit_index", flat=True))
+        for bit_index in range(MAX_TAGS):
+            if bit_index not in used:
+                return bit_index
+        raise ValidationError(f"Нельзя создать больше {MAX_TAGS} тегов.")
+
     def clean(self):
         """Обработка полей"""
         self.color = hex_color_validator(self.color)
+        if self.bit_index is None:
+            self.bit_index = self.get_free_bit_index()
         return super().clean()
 
+    def save(self, *args, **kwargs):
+        if self.bit_index is None:
+            self.bit_index = self.get_free_bit_index()
+        super().save(*args, **kwargs)
+
 
 class Ingredient(models.Model):
     """Модель для ингредиентов"""
@@ -85,6 +124,132 @@ class Ingredient(models.Model):
         return f"{self.name[:NAME_LEN]}, измеряется в: {self.measurement_unit}"
 
 
+class TagBits(models.Func):
+    """Номера установленных битов маски тегов (функция из миграции 0012)"""
+
+    function = "recipe_tag_bits"
+    output_field = ArrayField(models.IntegerField())
+
+
+class RecipeQuerySet(models.QuerySet):
+    """Запросы рецептов с заранее загруженными связанными данными"""
+
+    def with_related(self):
+        """
+        Автор, теги и ингредиенты за фиксированное число запросов.
+        Поисковый вектор для выдачи не нужен и не загружается.
+        """
+        return (
+            self.defer("search_vector")
+            .select_related("author")
+            .prefetch_related(
+                "tags",
+                Prefetch(
+                    "ingredient",
+                    queryset=IngredientRecipe.objects.select_related(
+                        "ingredient"
+                    ),
+                ),
+            )
+        )
+
+    def with_any_tags(self, tags):
+        """
+        Рецепты хотя бы с одним из тегов, без JOIN. В PostgreSQL —
+        пересечение массива битов маски по GIN-индексу recipe_tag_bits_gin,
+        в SQLite — побитовая проверка маски при просмотре строк.
+        """
+        if connections[self.db].vendor == "postgresql":
+            return self.alias(tag_bits=TagBits("tags_mask")).filter(
+                tag_bits__overlap=[tag.bit_index for tag in tags]
+            )
+        mask = 0
+        for tag in tags:
+            mask |= tag.bit
+        return self.alias(matched_tags=F("tags_mask").bitand(mask)).filter(
+            matched_tags__gt=0
+        )
+
+    def refresh_tags_mask(self, recipe_ids=None):
+        """
+        Пересчёт маски тегов по TagRecipe: для указанных рецептов
+        из запроса, если recipe_ids не передан. Возвращает новые маски.
+        """
+        if recipe_ids is None:
+            masks = dict.fromkeys(self.values_list("pk", flat=True), 0)
+            links = TagRecipe.objects.filter(recipe__in=self.values("pk"))
+        else:
+            masks = dict.fromkeys(recipe_ids, 0)
+            links = TagRecipe.objects.filter(recipe_id__in=masks)
+        for recipe_id, bit_index in links.values_list(
+            "recipe_id", "tag__bit_index"
+        ):
+            masks[recipe_id] |= 1 << bit_index
+        self.bulk_update(
+            [Recipe(pk=pk, tags_mask=mask) for pk, mask in masks.items()],
+            ("tags_mask",),
+            batch_size=FEED_BATCH_SIZE,
+        )
+        return masks
+
+    def latest_per_author(self, author_ids, limit=None):
+        """
+        Последние limit рецептов каждого из авторов одним запросом:
+        номер строки в окне по автору, отбор по номеру во внешнем запросе.
+        """
+        queryset = self.filter(author_id__in=author_ids).defer("search_vector")
+        ordering = (F("pub_date").desc(), F("id").desc())
+        if limit is None:
+            return queryset.order_by(*ordering)
+        ranked = (
+            queryset.annotate(
+                recipe_rank=Window(
+                    RowNumber(), partition_by=F("author_id"), order_by=ordering
+                )
+            )
+            .order_by()
+            .values("id", "recipe_rank")
+        )
+        sql, params = ranked.query.sql_with_params()
+        return queryset.filter(
+            pk__in=RawSQL(
+                f"SELECT id FROM ({sql}) ranked WHERE recipe_rank <= %s",
+                (*params, limit),
+            )
+        ).order_by(*ordering)
+
+    def search(self, text):
+        """
+        Поиск по названию и описанию, сначала самые релевантные.
+        Название весит больше описания.
+        """
+        if connections[self.db].vendor == "postgresql":
+            query = SearchQuery(
+                text, config=SEARCH_CONFIG, search_type="websearch"
+            )
+            return (
+                self.filter(search_vector=query)
+                .annotate(search_rank=SearchRank(F("search_vector"), query))
+                .order_by("-search_rank", "-pub_date")
+            )
+        query = get_fts_query(text)
+        if not query:
+            return self.none()
+        match = f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s"
+        return (
+            self.filter(pk__in=RawSQL(match, (query,)))
+            .annotate(
+                search_rank=RawSQL(
+                    f"SELECT -bm25({FTS_TABLE}, 10.0, 1.0) FROM {FTS_TABLE} "
+                    f"WHERE {FTS_TABLE} MATCH %s "
+                    f"AND rowid = {RECIPE_TABLE}.id",
+                    (query,),
+                )
+            )
+            .order_by("-search_rank", "-pub_date")
+        )
+
+
 class Recipe(models.Model):
     """Модель Рецептов"""
 
@@ -133,6 +298,33 @@ class Recipe(models.Model):
         auto_now_add=True,
         db_index=True,
     )
+    favorites_count = models.PositiveIntegerField(
+        "Сколько в избранном",
+        default=0,
+        editable=False,
+    )
+    shopping_cart_count = models.PositiveIntegerField(
+        "Сколько в списках покупок",
+        default=0,
+        editable=False,
+    )
+    tags_mask = models.BigIntegerField(
+        "Маска тегов",
+        default=0,
+        editable=False,
+    )
+    search_vector = SearchVectorField(
+        "Поисковый вектор",
+        null=True,
+        editable=False,
+    )
+    image_variants = models.JSONField(
+        "Копии изображения",
+        default=dict,
+        editable=False,
+    )
+
+    objects = RecipeQuerySet.as_manager()
 
     class Meta:
         """Проверка полей"""
@@ -146,6 +338,12 @@ class Recipe(models.Model):
                 name="unique_recipe_author",
             ),
         )
+        indexes = (
+            models.Index(
+                fields=("author", "-pub_date"),
+                name="recipe_author_pub_date_idx",
+            ),
+        )
 
     def __str__(self):
         return (
@@ -230,6 +428,119 @@ class IngredientRecipe(models.Model):
         )
 
 
+class UserRecipeQuerySet(models.QuerySet):
+    """
+    Массовое добавление и удаление рецептов пользователя (избранное,
+    корзина): один INSERT и один DELETE на весь список. Сигналы
+    отдельных строк при этом не срабатывают, поэтому счётчик рецептов
+    меняется здесь же одним UPDATE. Изменёнными считаются строки,
+    которые вернул сам запрос (RETURNING): строку, добавленную или
+    удалённую параллельным запросом, второй раз не посчитаем.
+    """
+
+    recipe_field = "recipe"
+    counter_field = None
+
+    def change_counters(self, recipe_ids, delta):
+        Recipe.objects.filter(pk__in=recipe_ids).update(
+            **{
+                self.counter_field: Greatest(
+                    F(self.counter_field) + delta, Value(0)
+                )
+            }
+        )
+
+    def _fetch_ids(self, sql, params):
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+            return {row[0] for row in cursor.fetchall()}
+
+    def _columns(self):
+        quote = connections[self.db].ops.quote_name
+        return (
+            quote(self.model._meta.db_table),
+            quote(self.model._meta.get_field("user").column),
+            quote(self.model._meta.get_field(self.recipe_field).column),
+        )
+
+    def add_recipes(self, user_id, recipe_ids):
+        """Добавление рецептов; возвращает (добавленные, уже бывшие)"""
+        if not recipe_ids:
+            return set(), set()
+        ops = connections[self.db].ops
+        table, user_column, recipe_column = self._columns()
+        date_column = ops.quote_name(
+            self.model._meta.get_field("date_added").column
+        )
+        placeholders = ", ".join(["%s"] * len(recipe_ids))
+        with transaction.atomic(using=self.db):
+            added = self._fetch_ids(
+                f"INSERT INTO {table} "
+                f"({user_column}, {recipe_column}, {date_column}) "
+                f"SELECT %s, id, %s "
+                f"FROM {ops.quote_name(Recipe._meta.db_table)} "
+                f"WHERE id IN ({placeholders}) "
+                f"ON CONFLICT DO NOTHING RETURNING {recipe_column}",
+                [
+                    user_id,
+                    ops.adapt_datetimefield_value(timezone.now()),
+                    *recipe_ids,
+                ],
+            )
+            existing = (
+                set(
+                    self.filter(
+                        user_id=user_id,
+                        **{f"{self.recipe_field}_id__in": recipe_ids},
+                    ).values_list(f"{self.recipe_field}_id", flat=True)
+                )
+                - added
+            )
+            self.change_counters(added, 1)
+            self.after_add(user_id, added)
+        return added, existing
+
+    def remove_recipes(self, user_id, recipe_ids):
+        """Удаление рецептов; возвращает удалённые"""
+        if not recipe_ids:
+            return set()
+        table, user_column, recipe_column = self._columns()
+        placeholders = ", ".join(["%s"] * len(recipe_ids))
+        with transaction.atomic(using=self.db):
+            removed = self._fetch_ids(
+                f"DELETE FROM {table} WHERE {user_column} = %s "
+                f"AND {recipe_column} IN ({placeholders}) "
+                f"RETURNING {recipe_column}",
+                [user_id, *recipe_ids],
+            )
+            self.change_counters(removed, -1)
+            self.after_remove(user_id, removed)
+        return removed
+
+    def after_add(self, user_id, recipe_ids):
+        pass
+
+    def after_remove(self, user_id, recipe_ids):
+        pass
+
+
+class FavoriteQuerySet(UserRecipeQuerySet):
+    recipe_field = "favorite_recipe"
+    counter_field = "favorites_count"
+
+
+class ShoppingCartQuerySet(UserRecipeQuerySet):
+    """Вместе с корзиной меняется список покупок"""
+
+    counter_field = "shopping_cart_count"
+
+    def after_add(self, user_id, recipe_ids):
+        ShoppingListItem.objects.add_recipes(user_id, list(recipe_ids))
+
+    def after_remove(self, user_id, recipe_ids):
+        ShoppingListItem.objects.remove_recipes(user_id, list(recipe_ids))
+
+
 class Favorite(CoreModel):
     """Модель для добавления рецепта в избранное"""
 
@@ -246,6 +557,8 @@ class Favorite(CoreModel):
         verbose_name="Избранный рецепт",
     )
 
+    objects = FavoriteQuerySet.as_manager()
+
     class Meta:
         """Проверка полей"""
 
@@ -281,6 +594,8 @@ class ShoppingCart(CoreModel):
         verbose_name="Рецепт",
     )
 
+    objects = ShoppingCartQuerySet.as_manager()
+
     class Meta:
         """Проверка полей"""
 
@@ -297,3 +612,253 @@ class ShoppingCart(CoreModel):
             f"Пользователь: {self.user.username}, "
             f"для покупок: {self.recipe.name}"
         )
+
+
+class FeedItemQuerySet(models.QuerySet):
+    """Поддержка ленты подписок в актуальном состоянии"""
+
+    def fan_out(self, recipe):
+        """Добавление нового рецепта в ленты всех подписчиков автора"""
+        subscribers = Subscriptions.objects.filter(
+            author_id=recipe.author_id
+        ).values_list("user_id", flat=True)
+        return self.bulk_create(
+            (
+                self.model(
+                    user_id=user_id,
+                    recipe=recipe,
+                    author_id=recipe.author_id,
+                    pub_date=recipe.pub_date,
+                )
+                for user_id in subscribers.iterator()
+            ),
+            batch_size=FEED_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    def backfill(self, user_id, author_id):
+        """Добавление в ленту рецептов автора после подписки"""
+        recipes = Recipe.objects.filter(author_id=author_id).values_list(
+            "id", "pub_date"
+        )
+        return self.bulk_create(
+            (
+                self.model(
+                    user_id=user_id,
+                    recipe_id=recipe_id,
+                    author_id=author_id,
+                    pub_date=pub_date,
+                )
+                for recipe_id, pub_date in recipes.iterator()
+            ),
+            batch_size=FEED_BATCH_SIZE,
+            ignore_conflicts=True,
+        )
+
+    def trim(self, user_id, author_id):
+        """Удаление рецептов автора из ленты после отписки"""
+        return self.filter(user_id=user_id, author_id=author_id).delete()
+
+
+class FeedItem(models.Model):
+    """Запись в ленте подписок, создаётся при публикации рецепта"""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="feed",
+        verbose_name="Подписчик",
+    )
+    recipe = models.ForeignKey(
+        Recipe,
+        on_delete=models.CASCADE,
+        related_name="feed_items",
+        verbose_name="Рецепт",
+    )
+    author = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Автор рецепта",
+    )
+    pub_date = models.DateTimeField("Дата публикации рецепта")
+
+    objects = FeedItemQuerySet.as_manager()
+
+    class Meta:
+        """Проверка полей"""
+
+        ordering = ("-pub_date",)
+        verbose_name = "Запись ленты"
+        verbose_name_plural = "Лента подписок"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user", "recipe"), name="unique_feed_item"
+            ),
+        )
+        indexes = (
+            models.Index(
+                fields=("user", "-pub_date"), name="feed_user_pub_date_idx"
+            ),
+        )
+
+    def __str__(self):
+        return f"Лента {self.user_id}: рецепт {self.recipe_id}"
+
+
+class ShoppingListItemQuerySet(models.QuerySet):
+    """
+    Изменение списка покупок разницей (дельтой) при добавлении
+    и удалении рецептов из корзины и при изменении состава рецепта,
+    без пересчёта всей корзины.
+    """
+
+    def _execute(self, sql, params):
+        with connections[self.db].cursor() as cursor:
+            cursor.execute(sql, params)
+
+    def _tables(self):
+        quote = connections[self.db].ops.quote_name
+        return (
+            quote(self.model._meta.db_table),
+            quote(IngredientRecipe._meta.db_table),
+            quote(ShoppingCart._meta.db_table),
+        )
+
+    def add_recipes(self, user_id, recipe_ids):
+        """Прибавление ингредиентов рецептов к списку одним запросом"""
+        if not recipe_ids:
+            return
+        table, ingredients, _ = self._tables()
+        placeholders = ", ".join(["%s"] * len(recipe_ids))
+        self._execute(
+            f"INSERT INTO {table} (user_id, ingredient_id, amount) "
+            f"SELECT %s, ingredient_id, SUM(amount) FROM {ingredients} "
+            f"WHERE recipe_id IN ({placeholders}) GROUP BY ingredient_id "
+            f"ON CONFLICT (user_id, ingredient_id) "
+            f"DO UPDATE SET amount = {table}.amount + excluded.amount",
+            [user_id, *recipe_ids],
+        )
+
+    def remove_recipes(self, user_id, recipe_ids):
+        """Вычитание ингредиентов рецептов, пустые строки удаляются"""
+        if not recipe_ids:
+            return
+        totals = (
+            IngredientRecipe.objects.filter(
+                recipe_id__in=recipe_ids, ingredient_id=OuterRef("ingredient")
+            )
+            .order_by()
+            .values("ingredient")
+            .annotate(total=Sum("amount"))
+            .values("total")
+        )
+        items = self.filter(user_id=user_id)
+        items.filter(
+            ingredient__in=IngredientRecipe.objects.filter(
+                recipe_id__in=recipe_ids
+            ).values("ingredient")
+        ).update(amount=Greatest(F("amount") - Subquery(totals), Value(0)))
+        items.filter(amount=0).delete()
+
+    def change_amounts(self, recipe_id, deltas):
+        """
+        Изменение состава рецепта {ингредиент: разница количеств}
+        в списках всех, у кого рецепт в корзине.
+        """
+        table, _, cart = self._tables()
+        users = ShoppingCart.objects.filter(recipe_id=recipe_id).values("user")
+        decreased = []
+        with transaction.atomic(using=self.db):
+            for ingredient_id, delta in deltas.items():
+                if delta > 0:
+                    self._execute(
+                        f"INSERT INTO {table} "
+                        f"(user_id, ingredient_id, amount) "
+                        f"SELECT user_id, %s, %s FROM {cart} "
+                        f"WHERE recipe_id = %s "
+                        f"ON CONFLICT (user_id, ingredient_id) "
+                        f"DO UPDATE SET amount = {table}.amount "
+                        f"+ excluded.amount",
+                        [ingredient_id, delta, recipe_id],
+                    )
+                elif delta < 0:
+                    decreased.append(ingredient_id)
+                    self.filter(
+                        user__in=users, ingredient_id=ingredient_id
+                    ).update(amount=Greatest(F("amount") + delta, Value(0)))
+            if decreased:
+                self.filter(
+                    user__in=users, ingredient__in=decreased, amount=0
+                ).delete()
+
+    def change_amounts_on_commit(self, recipe_id, deltas):
+        """
+        change_amounts после фиксации транзакции: владельцы корзин
+        берутся на момент фиксации, когда состав рецепта окончательный.
+        Строки IngredientRecipe меняют списки через сигналы; bulk_create
+        и bulk_update сигналов не шлют, их разницу передают сюда сами.
+        """
+        deltas = {
+            ingredient_id: delta
+            for ingredient_id, delta in deltas.items()
+            if delta
+        }
+        if deltas:
+            transaction.on_commit(
+                partial(self.change_amounts, recipe_id, deltas),
+                using=self.db,
+            )
+
+    def rebuild(self, user_ids):
+        """Полный пересчёт списков пользователей из их корзин"""
+        user_ids = list(user_ids)
+        if not user_ids:
+            return
+        self.filter(user_id__in=user_ids).delete()
+        table, ingredients, cart = self._tables()
+        placeholders = ", ".join(["%s"] * len(user_ids))
+        self._execute(
+            f"INSERT INTO {table} (user_id, ingredient_id, amount) "
+            f"SELECT cart.user_id, ir.ingredient_id, SUM(ir.amount) "
+            f"FROM {cart} cart JOIN {ingredients} ir "
+            f"ON ir.recipe_id = cart.recipe_id "
+            f"WHERE cart.user_id IN ({placeholders}) "
+            f"GROUP BY cart.user_id, ir.ingredient_id",
+            user_ids,
+        )
+
+
+class ShoppingListItem(models.Model):
+    """Суммарное количество ингредиента в списке покупок пользователя"""
+
+    user = models.ForeignKey(
+        User,
+        on_delete=models.CASCADE,
+        related_name="shopping_list",
+        verbose_name="Пользователь",
+    )
+    ingredient = models.ForeignKey(
+        Ingredient,
+        on_delete=models.CASCADE,
+        related_name="+",
+        verbose_name="Ингредиент",
+    )
+    amount = models.PositiveIntegerField("Количество", default=0)
+
+    objects = ShoppingListItemQuerySet.as_manager()
+
+    class Meta:
+        """Проверка полей"""
+
+        verbose_name = "Ингредиент списка покупок"
+        verbose_name_plural = "Списки покупок по ингредиентам"
+        constraints = (
+            models.UniqueConstraint(
+                fields=("user", "ingredient"),
+                name="unique_shopping_list_ingredient",
+            ),
+        )
+
+    def __str__(self):
+        return f"{self.user_id}: {self.ingredient_id} x {self.amount}"
@@ -0,0 +1,130 @@
+"""
+Полнотекстовый поиск рецептов по названию и описанию.
+
+В PostgreSQL вектор хранится в поле Recipe.search_vector: его заполняет
+триггер при изменении name или text, по нему построен GIN-индекс.
+В SQLite (локальный запуск и тесты) используется таблица FTS5 с внешним
+содержимым, которую поддерживают триггеры на recipes_recipe.
+"""
+import re
+
+SEARCH_CONFIG = "russian"
+FTS_TABLE = "recipes_recipe_fts"
+RECIPE_TABLE = "recipes_recipe"
+
+POSTGRESQL_INSTALL = (
+    f"""
+    CREATE OR REPLACE FUNCTION recipes_recipe_search_vector_update()
+    RETURNS trigger AS $$
+    BEGIN
+        NEW.search_vector :=
+            setweight(
+                to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.name, '')), 'A'
+            )
+            || setweight(
+                to_tsvector('{SEARCH_CONFIG}', coalesce(NEW.text, '')), 'B'
+            );
+        RETURN NEW;
+    END
+    $$ LANGUAGE plpgsql
+    """,
+    f"""
+    DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger
+    ON {RECIPE_TABLE}
+    """,
+    f"""
+    CREATE TRIGGER recipes_recipe_search_vector_trigger
+    BEFORE INSERT OR UPDATE OF name, text, search_vector ON {RECIPE_TABLE}
+    FOR EACH ROW EXECUTE PROCEDURE recipes_recipe_search_vector_update()
+    """,
+    f"UPDATE {RECIPE_TABLE} SET search_vector = NULL",
+    f"""
+    CREATE INDEX IF NOT EXISTS recipes_recipe_search_vector_gin
+    ON {RECIPE_TABLE} USING gin (search_vector)
+    """,
+)
+POSTGRESQL_REMOVE = (
+    "DROP INDEX IF EXISTS recipes_recipe_search_vector_gin",
+    f"""
+    DROP TRIGGER IF EXISTS recipes_recipe_search_vector_trigger
+    ON {RECIPE_TABLE}
+    """,
+    "DROP FUNCTION IF EXISTS recipes_recipe_search_vector_update()",
+)
+SQLITE_INSTALL = (
+    f"""
+    CREATE VIRTUAL TABLE IF NOT EXISTS {FTS_TABLE} USING fts5(
+        name, text, content='{RECIPE_TABLE}', content_rowid='id',
+        tokenize='unicode61 remove_diacritics 2'
+    )
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_insert
+    AFTER INSERT ON {RECIPE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_delete
+    AFTER DELETE ON {RECIPE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+    END
+    """,
+    f"""
+    CREATE TRIGGER IF NOT EXISTS {FTS_TABLE}_update
+    AFTER UPDATE OF name, text ON {RECIPE_TABLE} BEGIN
+        INSERT INTO {FTS_TABLE}({FTS_TABLE}, rowid, name, text)
+        VALUES ('delete', old.id, old.name, old.text);
+        INSERT INTO {FTS_TABLE}(rowid, name, text)
+        VALUES (new.id, new.name, new.text);
+    END
+    """,
+    f"INSERT INTO {FTS_TABLE}({FTS_TABLE}) VALUES ('rebuild')",
+)
+SQLITE_REMOVE = (
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_insert",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_delete",
+    f"DROP TRIGGER IF EXISTS {FTS_TABLE}_update",
+    f"DROP TABLE IF EXISTS {FTS_TABLE}",
+)
+
+
+def _execute(connection, statements):
+    with connection.cursor() as cursor:
+        for statement in statements:
+            cursor.execute(statement)
+
+
+def install_search(connection):
+    """Триггеры и индекс поиска; повторный вызов ничего не ломает"""
+    if connection.vendor == "postgresql":
+        _execute(connection, POSTGRESQL_INSTALL)
+    elif connection.vendor == "sqlite":
+        _execute(connection, SQLITE_INSTALL)
+
+
+def remove_search(connection):
+    if connection.vendor == "postgresql":
+        _execute(connection, POSTGRESQL_REMOVE)
+    elif connection.vendor == "sqlite":
+        _execute(connection, SQLITE_REMOVE)
+
+
+def has_sqlite_triggers(connection):
+    with connection.cursor() as cursor:
+        cursor.execute(
+            "SELECT count(*) FROM sqlite_master "
+            "WHERE type = 'trigger' AND name LIKE %s",
+            (f"{FTS_TABLE}_%",),
+        )
+        return cursor.fetchone()[0] == 3
+
+
+def get_fts_query(text):
+    """
+    Запрос FTS5: каждое слово ищется по началу, все слова обязательны.
+    Стемминга в unicode61 нет, поиск по префиксу заменяет его.
+    """
+    return " ".join(f'"{word}"*' for word in re.findall(r"\w+", text))
@@ -0,0 +1,249 @@
+"""Сигналы для поддержки денормализованных данных рецептов"""
+from collections import defaultdict
+from functools import partial
+
+from core.counters import change_counter
+from core.models import ContentVersion
+from django.contrib.auth import get_user_model
+from django.core.files.storage import default_storage
+from django.db import connections, transaction
+from django.db.models.signals import (m2m_changed, post_delete, post_migrate,
+                                      post_save, pre_delete, pre_save)
+from django.dispatch import receiver
+from users.models import Subscriptions
+
+from .images import build_variants, delete_variants
+from .ingredient_index import build_index
+from .models import (Favorite, FeedItem, Ingredient, IngredientRecipe,
+                     Recipe, ShoppingCart, ShoppingListItem, Tag, TagRecipe)
+from .search import has_sqlite_triggers, install_search
+
+User = get_user_model()
+
+
+@receiver(post_save, sender=Recipe)
+def fan_out_recipe(sender, instance, created, **kwargs):
+    """Новый рецепт попадает в ленты подписчиков автора"""
+    if created:
+        FeedItem.objects.fan_out(instance)
+        change_counter(User, instance.author_id, "recipes_count", 1)
+
+
+@receiver(post_delete, sender=Recipe)
+def decrease_recipes_count(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, "recipes_count", -1)
+
+
+@receiver(post_save, sender=Favorite)
+def increase_favorites_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(
+            Recipe, instance.favorite_recipe_id, "favorites_count", 1
+        )
+
+
+@receiver(post_delete, sender=Favorite)
+def decrease_favorites_count(sender, instance, **kwargs):
+    change_counter(Recipe, instance.favorite_recipe_id, "favorites_count", -1)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def increase_shopping_cart_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(Recipe, instance.recipe_id, "shopping_cart_count", 1)
+
+
+@receiver(post_delete, sender=ShoppingCart)
+def decrease_shopping_cart_count(sender, instance, **kwargs):
+    change_counter(Recipe, instance.recipe_id, "shopping_cart_count", -1)
+
+
+@receiver(post_save, sender=Subscriptions)
+def backfill_feed(sender, instance, created, **kwargs):
+    """После подписки в ленту добавляются рецепты автора"""
+    if created:
+        FeedItem.objects.backfill(instance.user_id, instance.author_id)
+
+
+@receiver(post_delete, sender=Subscriptions)
+def trim_feed(sender, instance, **kwargs):
+    """После отписки рецепты автора удаляются из ленты"""
+    FeedItem.objects.trim(instance.user_id, instance.author_id)
+
+
+@receiver(post_save, sender=ShoppingCart)
+def add_to_shopping_list(sender, instance, created, **kwargs):
+    if created:
+        ShoppingListItem.objects.add_recipes(
+            instance.user_id, [instance.recipe_id]
+        )
+
+
+@receiver(pre_delete, sender=ShoppingCart)
+def remove_from_shopping_list(sender, instance, **kwargs):
+    """До удаления, пока ингредиенты рецепта ещё в базе"""
+    ShoppingListItem.objects.remove_recipes(
+        instance.user_id, [instance.recipe_id]
+    )
+
+
+@receiver(pre_save, sender=IngredientRecipe)
+def remember_ingredient_amount(sender, instance, **kwargs):
+    """Прежние ингредиент и количество строки для разницы"""
+    instance.previous_amount = None
+    if instance.pk is not None:
+        instance.previous_amount = (
+            IngredientRecipe.objects.filter(pk=instance.pk)
+            .values_list("ingredient_id", "amount")
+            .first()
+        )
+
+
+@receiver(post_save, sender=IngredientRecipe)
+def add_ingredient_to_shopping_lists(sender, instance, **kwargs):
+    deltas = defaultdict(int)
+    deltas[instance.ingredient_id] += instance.amount
+    previous = getattr(instance, "previous_amount", None)
+    if previous is not None:
+        ingredient_id, amount = previous
+        deltas[ingredient_id] -= amount
+    ShoppingListItem.objects.change_amounts_on_commit(
+        instance.recipe_id, deltas
+    )
+
+
+@receiver(post_delete, sender=IngredientRecipe)
+def remove_ingredient_from_shopping_lists(sender, instance, **kwargs):
+    ShoppingListItem.objects.change_amounts_on_commit(
+        instance.recipe_id, {instance.ingredient_id: -instance.amount}
+    )
+
+
+@receiver(post_save, sender=Ingredient)
+@receiver(post_delete, sender=Ingredient)
+def rebuild_ingredient_index(sender, **kwargs):
+    """Пересборка индекса поиска и новая версия каталога после фиксации"""
+    transaction.on_commit(build_index)
+    transaction.on_commit(lambda: ContentVersion.objects.bump("ingredients"))
+
+
+@receiver(post_save, sender=Tag)
+@receiver(post_delete, sender=Tag)
+def bump_tags_version(sender, **kwargs):
+    transaction.on_commit(lambda: ContentVersion.objects.bump("tags"))
+
+
+@receiver(post_migrate)
+def build_ingredient_index(sender, app_config=None, **kwargs):
+    """Сборка индекса при развёртывании, после применения миграций"""
+    if app_config is not None and app_config.name == "recipes":
+        build_index()
+
+
+@receiver(post_migrate)
+def restore_search_triggers(
+    sender, app_config=None, using="default", **kwargs
+):
+    """
+    SQLite пересоздаёт таблицу при изменении схемы и теряет её триггеры:
+    после миграций триггеры поиска FTS5 восстанавливаются.
+    """
+    connection = connections[using]
+    if (
+        app_config is not None
+        and app_config.name == "recipes"
+        and connection.vendor == "sqlite"
+        and not has_sqlite_triggers(connection)
+    ):
+        install_search(connection)
+
+
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def update_tags_mask(sender, instance, action, reverse, pk_set, **kwargs):
+    """Маска тегов рецепта следует за изменениями связи с тегами"""
+    if action not in ("post_add", "post_remove", "post_clear"):
+        return
+    if not reverse:
+        # рецепт после tags.set() ещё сохраняют целиком
+        masks = Recipe.objects.refresh_tags_mask((instance.pk,))
+        instance.tags_mask = masks[instance.pk]
+    elif action == "post_clear":
+        # связей уже нет, но маски ещё помнят этот тег
+        Recipe.objects.with_any_tags((instance,)).refresh_tags_mask()
+    else:
+        Recipe.objects.refresh_tags_mask(pk_set)
+
+
+@receiver(post_save, sender=TagRecipe)
+@receiver(post_delete, sender=TagRecipe)
+def update_tags_mask_for_link(sender, instance, **kwargs):
+    Recipe.objects.refresh_tags_mask((instance.recipe_id,))
+
+
+@receiver(post_save, sender=Recipe)
+@receiver(post_delete, sender=Recipe)
+@receiver(post_save, sender=IngredientRecipe)
+@receiver(post_delete, sender=IngredientRecipe)
+@receiver(post_save, sender=TagRecipe)
+@receiver(post_delete, sender=TagRecipe)
+@receiver(m2m_changed, sender=Recipe.tags.through)
+def bump_recipes_version(sender, **kwargs):
+    """Новая версия рецептов сбрасывает кэш анонимных ответов"""
+    transaction.on_commit(lambda: ContentVersion.objects.bump("recipes"))
+
+
+@receiver(pre_save, sender=Recipe)
+def delete_replaced_image(sender, instance, update_fields=None, **kwargs):
+    """Прежний файл и его копии удаляются после фиксации замены"""
+    instance.image_changed = False
+    if update_fields is not None and "image" not in update_fields:
+        return
+    if instance.pk is None:
+        instance.image_changed = True
+        return
+    old_name = (
+        Recipe.objects.filter(pk=instance.pk)
+        .values_list("image", flat=True)
+        .first()
+    )
+    if old_name != instance.image.name:
+        instance.image_changed = True
+        instance.image_variants = {}
+        if old_name:
+            transaction.on_commit(partial(delete_image, old_name))
+
+
+@receiver(post_save, sender=Recipe)
+def make_image_variants(sender, instance, **kwargs):
+    """
+    Копии создаются только для нового файла и после фиксации, вне
+    транзакции запроса; имя файла известно после сохранения.
+    """
+    if getattr(instance, "image_changed", False) and instance.image:
+        transaction.on_commit(
+            partial(update_image_variants, instance.pk, instance.image.name)
+        )
+
+
+def update_image_variants(recipe_id, image_name):
+    """Перечень копий сохраняется, если изображение с тех пор не сменили"""
+    variants = build_variants(image_name)
+    updated = Recipe.objects.filter(pk=recipe_id, image=image_name).update(
+        image_variants=variants
+    )
+    if updated:
+        ContentVersion.objects.bump("recipes")
+
+
+def delete_image(image_name):
+    """Файл и его копии, если на них не ссылается другой рецепт"""
+    if not Recipe.objects.filter(image=image_name).exists():
+        default_storage.delete(image_name)
+        delete_variants(image_name)
+
+
+@receiver(post_delete, sender=Recipe)
+def delete_image_files(sender, instance, **kwargs):
+    """Изображение удаляется вместе с рецептом после фиксации"""
+    if instance.image:
+        transaction.on_commit(partial(delete_image, instance.image.name))
@@ -0,0 +1,130 @@
+"""
+Загрузка изображений рецептов отдельным запросом.
+
+Файл принимается потоком кусками по UPLOAD_CHUNK_SIZE байт во временный
+файл на диске, проверяется Pillow и сохраняется в хранилище под
+случайным токеном. При создании рецепта токен заменяет base64-строку.
+Файл переносится к изображениям рецептов только после фиксации
+транзакции; невостребованные загрузки старше RECIPE_UPLOAD_MAX_AGE
+секунд недействительны и удаляются.
+"""
+import re
+import uuid
+from datetime import timedelta
+from functools import partial
+from tempfile import TemporaryFile
+
+from django.conf import settings
+from django.core.files import File
+from django.core.files.storage import default_storage
+from django.db import transaction
+from django.utils import timezone
+from PIL import Image, UnidentifiedImageError
+
+UPLOADS_DIR = "recipe_uploads"
+UPLOAD_CHUNK_SIZE = 64 * 1024
+IMAGE_EXTENSIONS = {"JPEG": "jpg", "PNG": "png", "GIF": "gif", "WEBP": "webp"}
+TOKEN_PATTERN = re.compile(r"^[0-9a-f]{32}$")
+
+
+class UploadError(ValueError):
+    """Загруженный файл не подходит"""
+
+
+def get_upload_name(user_id, token):
+    return f"{UPLOADS_DIR}/{user_id}/{token}"
+
+
+def is_expired(name):
+    max_age = timedelta(seconds=settings.RECIPE_UPLOAD_MAX_AGE)
+    return default_storage.get_modified_time(name) < timezone.now() - max_age
+
+
+def delete_expired_uploads(user_id=None):
+    """Удаление просроченных загрузок пользователя или всех; их число"""
+    if user_id is None:
+        if not default_storage.exists(UPLOADS_DIR):
+            return 0
+        user_dirs = default_storage.listdir(UPLOADS_DIR)[0]
+    else:
+        user_dirs = [str(user_id)]
+    deleted = 0
+    for user_dir in user_dirs:
+        path = f"{UPLOADS_DIR}/{user_dir}"
+        if not default_storage.exists(path):
+            continue
+        for token in default_storage.listdir(path)[1]:
+            name = f"{path}/{token}"
+            if is_expired(name):
+                default_storage.delete(name)
+                deleted += 1
+    return deleted
+
+
+def get_image_extension(image_file):
+    """Расширение по содержимому файла, а не по имени"""
+    try:
+        with Image.open(image_file) as image:
+            image_format = image.format
+            image.verify()
+    except (UnidentifiedImageError, OSError, SyntaxError):
+        raise UploadError("Файл не является изображением.")
+    finally:
+        image_file.seek(0)
+    if image_format not in IMAGE_EXTENSIONS:
+        raise UploadError(
+            "Допустимые форматы: " + ", ".join(IMAGE_EXTENSIONS) + "."
+        )
+    return IMAGE_EXTENSIONS[image_format]
+
+
+def store_upload(user_id, chunks):
+    """Сохранение потока байт; возвращает токен загрузки"""
+    max_size = settings.RECIPE_IMAGE_MAX_UPLOAD_SIZE
+    with TemporaryFile() as upload:
+        size = 0
+        for chunk in chunks:
+            size += len(chunk)
+            if size > max_size:
+                raise UploadError(
+                    f"Размер файла не должен превышать {max_size} байт."
+                )
+            upload.write(chunk)
+        if not size:
+            raise UploadError("Передан пустой файл.")
+        upload.seek(0)
+        get_image_extension(upload)
+        token = uuid.uuid4().hex
+        default_storage.save(get_upload_name(user_id, token), File(upload))
+    delete_expired_uploads(user_id)
+    return token
+
+
+def upload_exists(user_id, token):
+    if not TOKEN_PATTERN.match(token):
+        return False
+    name = get_upload_name(user_id, token)
+    return default_storage.exists(name) and not is_expired(name)
+
+
+def claim_upload(user_id, token):
+    """
+    Имя файла для ImageField по токену загрузки. Сам перенос
+    выполняется после фиксации транзакции: при откате загрузка
+    остаётся на месте, и токен можно использовать снова.
+    """
+    source = get_upload_name(user_id, token)
+    with default_storage.open(source, "rb") as upload:
+        extension = get_image_extension(upload)
+    target = default_storage.get_available_name(
+        f"recipe_images/{token}.{extension}"
+    )
+    transaction.on_commit(partial(move_upload, source, target))
+    return target
+
+
+def move_upload(source, target):
+    """Загрузка сохраняется под именем, уже записанным в рецепт"""
+    with default_storage.open(source, "rb") as upload:
+        default_storage.save(target, File(upload))
+    default_storage.delete(source)
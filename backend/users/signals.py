@@ -0,0 +1,33 @@
+"""Сигналы для счётчиков и версии данных пользователей"""
+from core.counters import change_counter
+from core.models import ContentVersion
+from django.db import transaction
+from django.db.models.signals import post_delete, post_save
+from django.dispatch import receiver
+
+from .models import Subscriptions, User
+
+# поля пользователя, которые API показывает в рецептах и подписках
+PUBLIC_FIELDS = frozenset(("email", "username", "first_name", "last_name"))
+
+
+@receiver(post_save, sender=Subscriptions)
+def increase_followers_count(sender, instance, created, **kwargs):
+    if created:
+        change_counter(User, instance.author_id, "followers_count", 1)
+
+
+@receiver(post_delete, sender=Subscriptions)
+def decrease_followers_count(sender, instance, **kwargs):
+    change_counter(User, instance.author_id, "followers_count", -1)
+
+
+@receiver(post_save, sender=User)
+@receiver(post_delete, sender=User)
+def bump_users_version(sender, instance, update_fields=None, **kwargs):
+    """
+    Правка профиля сбрасывает кэш ответов с данными автора. Сохранение
+    только служебных полей (last_login при входе) версию не меняет.
+    """
+    if update_fields is None or PUBLIC_FIELDS & set(update_fields):
+        transaction.on_commit(lambda: ContentVersion.objects.bump("users"))